@@ -0,0 +1,80 @@
+"""
+确定性审计脚本
+
+此脚本在多个配置（线程数 × 批次大小 × 计算后端 × 进程重启）下并行运行同一批图像，
+比较每张图像输出的哈希值，并报告不一致的图像和配置。
+
+示例:
+    python scripts/audit_determinism.py --images data/test_images --threads 1 2 --batch-sizes 1 16
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.determinism import make_config, audit_determinism, format_report
+
+
+def collect_images(path):
+    """收集目录中的所有jpg/png图像，或返回单个图像路径"""
+    if os.path.isdir(path):
+        image_paths = glob.glob(os.path.join(path, '*.jpg'))
+        image_paths += glob.glob(os.path.join(path, '*.png'))
+        return sorted(image_paths)
+    return [path]
+
+
+def build_configs(threads, batch_sizes, backends, restarts):
+    """根据参数组合生成审计配置，参考配置会额外重复运行restarts次"""
+    configs = [make_config(num_threads=t, batch_size=b, backend=backend)
+               for backend in backends for t in threads for b in batch_sizes]
+    reference = configs[0]
+    for i in range(restarts):
+        configs.append(make_config(reference['num_threads'], reference['batch_size'],
+                                   reference['backend'], name=f"{reference['name']}_restart{i + 1}"))
+    return configs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="在多种配置下并行验证推理确定性")
+    parser.add_argument('--images', default='data', help="图像目录或单个图像路径")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2], help="intra-op线程数")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="批次大小")
+    parser.add_argument('--backends', nargs='+', default=['default'], help="计算后端")
+    parser.add_argument('--restarts', type=int, default=1, help="参考配置额外重启运行的次数")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数")
+    parser.add_argument('--output', default=None, help="保存JSON报告的路径")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print(f"错误: 未在 {args.images} 中找到图像")
+        return 1
+
+    configs = build_configs(args.threads, args.batch_sizes, args.backends, args.restarts)
+    print(f"在 {len(configs)} 个配置下审计 {len(image_paths)} 张图像...")
+
+    report = audit_determinism(image_paths, configs, max_workers=args.workers)
+    print(format_report(report))
+
+    if args.output:
+        Path(args.output).parent.mkdir(exist_ok=True, parents=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"审计报告已保存到: {args.output}")
+
+    return 0 if report['deterministic'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+批次不变性检查脚本
+
+此脚本以批次大小1..N、多种线程设置对同一批图像进行真正的批量推理，
+并报告每张图像的数值漂移和top-1预测不一致。
+
+示例:
+    python scripts/check_batch_invariance.py --images data --max-batch-size 8 --threads 1 2
+"""
+
+import os
+import sys
+import argparse
+
+import torch
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.inference_runner import ImageClassifier
+from src.batch_invariance import check_batch_invariance
+from scripts.audit_determinism import collect_images
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="检查批量推理是否改变预测结果")
+    parser.add_argument('--images', default='data', help="图像目录或单个图像路径")
+    parser.add_argument('--max-batch-size', type=int, default=None, help="最大批次大小，默认为图像数量")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1], help="intra-op线程数")
+    parser.add_argument('--atol', type=float, default=1e-4, help="允许的最大数值漂移")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print(f"错误: 未在 {args.images} 中找到图像")
+        return 1
+
+    classifier = ImageClassifier()
+    inputs = torch.cat([classifier.load_and_preprocess_image(path) for path in image_paths], dim=0)
+    max_batch_size = args.max_batch_size or len(image_paths)
+
+    report = check_batch_invariance(classifier, inputs, batch_sizes=range(1, max_batch_size + 1),
+                                    thread_counts=args.threads, atol=args.atol)
+
+    for run in report['runs']:
+        status = "通过" if run['within_tolerance'] else "失败"
+        print(f"线程数 {run['num_threads']}，批次大小 {run['batch_size']}，补齐 {run['padded']}: "
+              f"{status}，最大漂移 {run['max_drift']:.3e}")
+        for index in run['top1_disagreements']:
+            print(f"    top-1不一致: {image_paths[index]}")
+
+    print(f"总体结论: {'批次不变' if report['invariant'] else '批量推理改变了预测'}")
+    return 0 if report['invariant'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+跨运行回归比较脚本
+
+此脚本把预测结果保存到结果数据库（见src/result_store.py），并比较两次运行之间的top-1变化，
+主要用于发现模型或权重版本之间的回归。包含四个子命令:
+- record: 对一批图像（可选加上扰动）运行推理并保存为一次运行
+- import-sweep: 把分布式扫描队列（scripts/run_sweep.py）中已完成的结果导入为一次运行
+- list: 列出所有运行
+- compare: 比较两次运行，按扰动汇总并列出top-1发生变化的图像
+
+示例:
+    python scripts/compare_runs.py record --db results/results.db --images data/test_images --run-id baseline
+    python scripts/compare_runs.py compare --db results/results.db baseline candidate --limit 20
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.perturbations import PERTURBATIONS, SEVERITIES
+from src.result_store import ResultStore, hash_image_file
+from scripts.audit_determinism import collect_images
+
+
+def record_run(args):
+    import torch
+    from src.errors import ImageLoadError
+    from src.inference_runner import ImageClassifier
+    from src.perturbations import apply_perturbation
+    from src.sweep_queue import task_seed
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print(f"错误: 未在 {args.images} 中找到图像")
+        return 1
+
+    classifier = ImageClassifier()
+    store = ResultStore(args.db)
+    run_id = store.create_run(classifier.model_name, classifier.model_fingerprint(), run_id=args.run_id,
+                              note=args.note)
+    variants = [(name, severity) for name in args.perturbations
+                for severity in ([0] if name == 'identity' else args.severities)]
+
+    num_predictions = 0
+    for path in image_paths:
+        try:
+            input_tensor = classifier.load_and_preprocess_image(path)
+        except (FileNotFoundError, ImageLoadError) as e:
+            print(f"跳过 {path}: {type(e).__name__}: {e}")
+            continue
+        image_hash = hash_image_file(path)
+        batch = torch.cat([
+            apply_perturbation(input_tensor, name, severity, classifier.mean, classifier.std,
+                               seed=task_seed(image_hash, name, severity))
+            for name, severity in variants
+        ])
+        probabilities, top1 = torch.softmax(classifier.run_inference(batch), dim=1).max(dim=1)
+        store.add_images([(image_hash, path)])
+        num_predictions += store.add_predictions(run_id, [
+            (image_hash, name, severity, int(top), float(prob))
+            for (name, severity), top, prob in zip(variants, top1, probabilities)
+        ])
+    store.close()
+
+    print(f"运行 {run_id}（模型版本 {classifier.model_fingerprint()}）已保存 {num_predictions} 条预测结果")
+    return 0
+
+
+def import_sweep(args):
+    from src.sweep_queue import SweepQueue
+
+    queue = SweepQueue(args.sweep_db, journal_mode=args.journal_mode)
+    results = queue.results()
+    queue.close()
+    if not results:
+        print(f"错误: 扫描队列 {args.sweep_db} 中没有已完成的结果")
+        return 1
+
+    models = sorted({result['model'] for result in results})
+    if len(models) > 1:
+        print(f"错误: 扫描包含多个模型 {models}，一次运行只能对应一个模型")
+        return 1
+
+    model_version = args.model_version
+    if model_version is None:
+        # 扫描的工作进程使用该模型的默认权重，按同样的方式构建模型即可得到相同的权重指纹
+        from src.inference_runner import ImageClassifier
+        model_version = ImageClassifier(model_name=models[0]).model_fingerprint()
+        print(f"未指定 --model-version，使用 {models[0]} 默认权重的指纹 {model_version}")
+
+    hashes = {path: hash_image_file(path) for path in {result['image'] for result in results}}
+    store = ResultStore(args.db)
+    run_id = store.create_run(models[0], model_version, run_id=args.run_id, note=args.note)
+    store.add_images(list((image_hash, path) for path, image_hash in hashes.items()))
+    num_predictions = store.add_predictions(run_id, [
+        (hashes[r['image']], r['perturbation'], r['severity'], r['top1'], r['probability']) for r in results
+    ])
+    store.close()
+
+    print(f"已将 {num_predictions} 条扫描结果导入为运行 {run_id}")
+    return 0
+
+
+def list_runs(args):
+    store = ResultStore(args.db)
+    for run in store.list_runs():
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['created_at']))
+        print(f"{run['run_id']}  {created_at}  {run['model_name']}  {run['model_version'] or '-'}  "
+              f"{run['num_predictions']} 条  {run['note'] or ''}")
+    store.close()
+    return 0
+
+
+def compare(args):
+    store = ResultStore(args.db)
+    start = time.perf_counter()
+    summary = store.summarize_changes(args.base_run, args.new_run)
+    changes = store.compare_runs(args.base_run, args.new_run, limit=args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    store.close()
+
+    if not summary:
+        print(f"运行 {args.base_run} 和 {args.new_run} 没有可比较的结果")
+        return 1
+
+    print(f"比较 {args.base_run} -> {args.new_run}（查询耗时 {elapsed_ms:.1f} ms）")
+    for row in summary:
+        print(f"  {row['perturbation']:<16} 严重程度 {row['severity']}: "
+              f"{row['num_changed']}/{row['num_compared']} 变化 ({row['change_rate']:.1%})")
+
+    if changes:
+        print("\ntop-1 发生变化的结果:")
+        for change in changes:
+            print(f"  {change['path'] or change['image_hash']} [{change['perturbation']}:{change['severity']}] "
+                  f"{change['base_top1']} ({change['base_probability']:.1%}) -> "
+                  f"{change['new_top1']} ({change['new_probability']:.1%})")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="保存预测结果并比较不同运行之间的回归")
+    parser.add_argument('--db', default='results/results.db', help="结果数据库路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="运行推理并保存为一次运行")
+    record_parser.add_argument('--images', default='data', help="图像目录或单个图像路径")
+    record_parser.add_argument('--perturbations', nargs='+', default=['identity'],
+                               choices=['identity'] + list(PERTURBATIONS), help="扰动名称")
+    record_parser.add_argument('--severities', type=int, nargs='+', default=SEVERITIES, help="严重程度")
+    record_parser.add_argument('--run-id', default=None, help="运行ID，默认自动生成")
+    record_parser.add_argument('--note', default=None, help="备注")
+    record_parser.set_defaults(func=record_run)
+
+    import_parser = subparsers.add_parser('import-sweep', help="导入分布式扫描的结果")
+    import_parser.add_argument('--sweep-db', required=True, help="扫描队列数据库路径")
+    import_parser.add_argument('--model-version', default=None,
+                               help="扫描使用的模型版本，默认为该模型默认权重的指纹（model_fingerprint）")
+    import_parser.add_argument('--run-id', default=None, help="运行ID，默认自动生成")
+    import_parser.add_argument('--note', default=None, help="备注")
+    import_parser.add_argument('--journal-mode', choices=['WAL', 'DELETE'], default='WAL',
+                               help="扫描队列的SQLite日志模式，与run_sweep.py使用的一致")
+    import_parser.set_defaults(func=import_sweep)
+
+    list_parser = subparsers.add_parser('list', help="列出所有运行")
+    list_parser.set_defaults(func=list_runs)
+
+    compare_parser = subparsers.add_parser('compare', help="比较两次运行")
+    compare_parser.add_argument('base_run', help="基准运行ID")
+    compare_parser.add_argument('new_run', help="新运行ID")
+    compare_parser.add_argument('--limit', type=int, default=50, help="最多列出的变化数量")
+    compare_parser.set_defaults(func=compare)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    Path(args.db).parent.mkdir(exist_ok=True, parents=True)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
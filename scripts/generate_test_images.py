@@ -6,12 +6,20 @@
 - 纯白图像
 - 随机噪声图像
 - 空文本文件（用于非图像文件测试）
+
+生成的图像会记录到 data/dedup_manifest.json 去重清单中，视觉上相同的图像在推理时只运行一次。
 """
 
 import os
+import sys
 import numpy as np
 from PIL import Image
 
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.dedup import DedupIndex, MANIFEST_NAME
+
 def main():
     # 确保data和test_images目录存在
     data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
@@ -43,6 +51,16 @@ def main():
     with open(os.path.join(test_images_dir, 'dummy.txt'), 'w') as f:
         f.write("这不是一个图像文件，用于测试非图像文件的处理逻辑。")
     
+    # 更新去重清单，报告与已有图像视觉上相同的文件
+    manifest_path = os.path.join(data_dir, MANIFEST_NAME)
+    index = DedupIndex.load(manifest_path)
+    for name in ('black.jpg', 'white.jpg', 'noise.jpg'):
+        image_path = os.path.join(test_images_dir, name)
+        canonical = index.add(image_path)
+        if canonical != os.path.normpath(image_path):
+            print(f"{name} 与 {os.path.relpath(canonical, data_dir)} 视觉上相同，推理时将复用其结果")
+    index.save(manifest_path)
+    
     print("所有测试图像和文件已创建完成！")
     print(f"文件位置：{test_images_dir}")
     print("生成的文件：")
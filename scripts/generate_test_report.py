@@ -1,63 +1,339 @@
 """
 生成详细的测试报告
 
-此脚本运行所有测试并生成详细的HTML和文本报告，适合在GitHub上展示
+此脚本只运行一次测试套件，通过pytest插件收集结构化的测试结果（同时输出JUnit XML），
+然后从同一份结果并行渲染HTML、文本和Markdown报告，适合在GitHub上展示。
+
+已有结果文件时，可以只重新渲染报告而不重新运行测试:
+    python scripts/generate_test_report.py --from-results reports/results_20250101_120000.json
 """
 
 import os
 import sys
-import pytest
+import html
+import json
+import argparse
 import datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 报告格式 -> 文件扩展名
+REPORT_FORMATS = {'html': 'html', 'txt': 'txt', 'md': 'md'}
+
+# 结果状态的显示顺序
+OUTCOMES = ['passed', 'failed', 'error', 'skipped', 'xfailed', 'xpassed']
+
+
+class ResultCollector:
+    """
+    收集结构化测试结果的pytest插件
+
+    将每个测试的setup/call/teardown三个阶段合并为一条结果：
+    call阶段失败记为failed，setup或teardown阶段失败记为error，多个阶段失败时保留第一个失败的阶段；
+    跳过记为skipped，标记为xfail的测试按预期失败记为xfailed，意外通过记为xpassed。
+    """
+
+    def __init__(self):
+        self.tests = {}
+        self.collection_errors = []
+        self.started_at = None
+        self.finished_at = None
+
+    def pytest_sessionstart(self, session):
+        self.started_at = datetime.datetime.now()
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.finished_at = datetime.datetime.now()
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.collection_errors.append({'nodeid': report.nodeid, 'message': str(report.longrepr)})
+
+    def pytest_runtest_logreport(self, report):
+        test = self.tests.setdefault(report.nodeid, {
+            'nodeid': report.nodeid,
+            'outcome': 'passed',
+            'duration': 0.0,
+            'message': '',
+        })
+        test['duration'] += report.duration
+
+        if report.failed:
+            # teardown的错误不覆盖call阶段已记录的失败
+            if test['outcome'] not in ('failed', 'error'):
+                test['outcome'] = 'error' if report.when != 'call' else 'failed'
+                test['message'] = str(report.longrepr)
+        elif hasattr(report, 'wasxfail'):
+            # xfail测试失败时报告为skipped，意外通过时报告为passed，两者都带有wasxfail
+            test['outcome'] = 'xfailed' if report.skipped else 'xpassed'
+            test['message'] = report.wasxfail
+        elif report.skipped and test['outcome'] == 'passed':
+            test['outcome'] = 'skipped'
+            # 跳过原因的格式为(文件, 行号, "Skipped: 原因")
+            longrepr = report.longrepr
+            reason = longrepr[2] if isinstance(longrepr, tuple) else str(longrepr)
+            test['message'] = reason[len('Skipped: '):] if reason.startswith('Skipped: ') else reason
+
+    def to_dict(self):
+        """将收集到的结果转换为可序列化的字典"""
+        tests = list(self.tests.values())
+        summary = {outcome: sum(1 for t in tests if t['outcome'] == outcome) for outcome in OUTCOMES}
+        summary['total'] = len(tests)
+        # 无法导入的测试模块不会产生任何测试结果，单独计数，否则报告会只按收集到的测试显示为通过
+        summary['collection_errors'] = len(self.collection_errors)
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+            'duration': (self.finished_at - self.started_at).total_seconds()
+                        if self.started_at and self.finished_at else 0.0,
+            'summary': summary,
+            'collection_errors': self.collection_errors,
+            'tests': tests,
+        }
+
+
+def run_tests(results_path, junit_path=None, pytest_args=None):
+    """
+    运行一次测试套件并保存结构化结果
+
+    参数:
+        results_path (str): 保存JSON结果的路径
+        junit_path (str): 保存JUnit XML的路径，为None时不生成
+        pytest_args (list): 额外传给pytest的参数
+
+    返回:
+        dict: 结构化的测试结果
+    """
+    import pytest
+
+    collector = ResultCollector()
+    args = list(pytest_args or []) + ['-v']
+    if junit_path:
+        args += ['--junitxml', str(junit_path)]
+    exit_code = pytest.main(args, plugins=[collector])
+
+    results = collector.to_dict()
+    results['exit_code'] = int(exit_code)
+    Path(results_path).parent.mkdir(exist_ok=True, parents=True)
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def _collection_errors(results):
+    """返回收集错误列表（旧版本的结果文件中可能没有）"""
+    return results.get('collection_errors') or []
+
+
+def _passed(results):
+    """测试套件是否通过：没有失败、错误和收集错误"""
+    summary = results['summary']
+    return not (summary.get('failed') or summary.get('error') or _collection_errors(results))
+
+
+def _summary_line(results):
+    """生成一行结果摘要，包括收集错误数量和整体状态"""
+    summary = results['summary']
+    parts = [f"{summary[outcome]} {outcome}" for outcome in OUTCOMES if summary.get(outcome)]
+    num_collection_errors = len(_collection_errors(results))
+    if num_collection_errors:
+        parts.append(f"{num_collection_errors} 个收集错误")
+    status = '通过' if _passed(results) else '失败'
+    return (f"{status} - 共 {summary['total']} 个测试: {', '.join(parts) or '无'}，"
+            f"耗时 {results['duration']:.2f} 秒")
+
+
+def render_text(results):
+    """将测试结果渲染为文本报告"""
+    lines = [
+        "=" * 80,
+        "AI模型测试框架 - 测试报告",
+        f"运行时间: {results['started_at']}",
+        "=" * 80,
+        "",
+    ]
+    for test in results['tests']:
+        lines.append(f"{test['nodeid']} {test['outcome'].upper()} ({test['duration']:.2f}s)")
+
+    failures = [t for t in results['tests'] if t['outcome'] in ('failed', 'error')]
+    if failures or _collection_errors(results):
+        lines += ["", "=" * 30 + " 失败详情 " + "=" * 30]
+        for test in failures:
+            lines += ["", f"___ {test['nodeid']} ___", test['message']]
+        for error in _collection_errors(results):
+            lines += ["", f"___ 收集错误: {error['nodeid']} ___", error['message']]
+
+    lines += ["", _summary_line(results), ""]
+    return "\n".join(lines)
+
+
+def render_markdown(results):
+    """将测试结果渲染为Markdown报告"""
+    summary = results['summary']
+    lines = [
+        "# AI模型测试框架 - 测试报告",
+        "",
+        f"- 运行时间: {results['started_at']}",
+        f"- {_summary_line(results)}",
+        "",
+        "| 状态 | 数量 |",
+        "| --- | --- |",
+    ]
+    # 旧版本的结果文件中没有xfailed和xpassed
+    lines += [f"| {outcome} | {summary.get(outcome, 0)} |" for outcome in OUTCOMES]
+    lines.append(f"| collection_errors | {len(_collection_errors(results))} |")
+    lines += ["", "| 测试 | 结果 | 耗时(秒) |", "| --- | --- | --- |"]
+    lines += [f"| `{t['nodeid']}` | {t['outcome']} | {t['duration']:.2f} |" for t in results['tests']]
+
+    failures = [t for t in results['tests'] if t['outcome'] in ('failed', 'error')]
+    if failures:
+        lines += ["", "## 失败详情"]
+        for test in failures:
+            lines += ["", f"### `{test['nodeid']}`", "", "```", test['message'], "```"]
+    if _collection_errors(results):
+        lines += ["", "## 收集错误"]
+        for error in _collection_errors(results):
+            lines += ["", f"### `{error['nodeid']}`", "", "```", error['message'], "```"]
+    return "\n".join(lines) + "\n"
+
+
+def render_html(results):
+    """将测试结果渲染为独立的HTML报告"""
+    colors = {'passed': '#2e7d32', 'failed': '#c62828', 'error': '#c62828', 'skipped': '#f9a825',
+              'xfailed': '#f9a825', 'xpassed': '#ef6c00'}
+    rows = []
+    for test in results['tests']:
+        detail = f"<pre>{html.escape(test['message'])}</pre>" if test['message'] else ""
+        rows.append(
+            f"<tr><td>{html.escape(test['nodeid'])}{detail}</td>"
+            f"<td style=\"color:{colors[test['outcome']]}\">{test['outcome']}</td>"
+            f"<td>{test['duration']:.2f}</td></tr>"
+        )
+    for error in _collection_errors(results):
+        rows.append(
+            f"<tr><td>{html.escape(error['nodeid'])}<pre>{html.escape(error['message'])}</pre></td>"
+            f"<td style=\"color:{colors['error']}\">collection error</td><td></td></tr>"
+        )
+    status_color = colors['passed'] if _passed(results) else colors['failed']
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>AI模型测试框架 - 测试报告</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td, th {{ border: 1px solid #ddd; padding: 6px; text-align: left; vertical-align: top; }}
+pre {{ background: #f5f5f5; padding: 8px; overflow-x: auto; }}
+</style>
+</head>
+<body>
+<h1>AI模型测试框架 - 测试报告</h1>
+<p>运行时间: {html.escape(str(results['started_at']))}</p>
+<p style="color:{status_color}">{html.escape(_summary_line(results))}</p>
+<table>
+<tr><th>测试</th><th>结果</th><th>耗时(秒)</th></tr>
+{chr(10).join(rows)}
+</table>
+</body>
+</html>
+"""
+
+
+RENDERERS = {'html': render_html, 'txt': render_text, 'md': render_markdown}
+
+
+def report_paths(results_path, report_dir=None):
+    """根据结果文件名生成各格式报告的路径，例如results_<时间戳>.json -> test_report_<时间戳>.html"""
+    results_path = Path(results_path)
+    report_dir = Path(report_dir) if report_dir else results_path.parent
+    stem = results_path.stem.replace('results', 'test_report', 1)
+    return {fmt: report_dir / f"{stem}.{ext}" for fmt, ext in REPORT_FORMATS.items()}
+
+
+def render_reports(results_path, report_dir=None, formats=None, force=False):
+    """
+    从结果文件并行渲染报告
+
+    报告文件已存在且比结果文件新时跳过渲染（增量渲染），除非force为True。
+
+    参数:
+        results_path (str): JSON结果文件路径
+        report_dir (str): 报告目录，默认与结果文件相同
+        formats (list): 要渲染的格式，默认为全部（'html'、'txt'、'md'）
+        force (bool): 是否强制重新渲染
+
+    返回:
+        dict: 格式 -> (报告路径, 是否重新渲染)
+    """
+    with open(results_path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+
+    paths = report_paths(results_path, report_dir)
+    results_mtime = os.path.getmtime(results_path)
+    formats = formats or list(RENDERERS)
+
+    def render(fmt):
+        path = paths[fmt]
+        if not force and path.exists() and path.stat().st_mtime >= results_mtime:
+            return fmt, str(path), False
+        path.parent.mkdir(exist_ok=True, parents=True)
+        path.write_text(RENDERERS[fmt](results), encoding='utf-8')
+        return fmt, str(path), True
+
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        rendered = list(executor.map(render, formats))
+    return {fmt: (path, updated) for fmt, path, updated in rendered}
+
 
 def run_tests_with_report():
-    """运行所有测试并生成HTML和文本报告"""
+    """
+    运行一次所有测试，并生成HTML、文本和Markdown报告
+
+    返回:
+        tuple: (HTML报告路径, 文本报告路径, pytest的退出码)
+    """
     # 确保项目根目录下存在reports目录
     report_dir = Path("reports")
     report_dir.mkdir(exist_ok=True)
-    
+
     # 生成时间戳
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # 定义报告文件路径
-    html_report = report_dir / f"test_report_{timestamp}.html"
-    txt_report = report_dir / f"test_report_{timestamp}.txt"
-    
-    # 运行pytest并生成HTML报告
+
+    # 定义结果文件路径
+    results_path = report_dir / f"results_{timestamp}.json"
+    junit_path = report_dir / f"junit_{timestamp}.xml"
+
+    # 只运行一次测试，收集结构化结果
     print(f"正在运行测试并生成报告...")
-    html_args = [
-        "--html", str(html_report),
-        "--self-contained-html",
-        "-v"
-    ]
-    
-    # 运行pytest并重定向输出到文本文件
-    with open(txt_report, 'w', encoding='utf-8') as f:
-        # 将原始输出保存到文本文件
-        stdout_backup = sys.stdout
-        sys.stdout = f
-        
-        # 添加测试报告标题
-        print("=" * 80)
-        print(f"AI模型测试框架 - 测试报告")
-        print(f"生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 80)
-        print("")
-        
-        # 运行测试
-        pytest.main(["-v"])
-        
-        # 恢复标准输出
-        sys.stdout = stdout_backup
-    
-    # 运行HTML报告
-    pytest.main(html_args)
-    
+    results = run_tests(results_path, junit_path=junit_path)
+
+    # 从同一份结果并行渲染所有格式的报告
+    reports = render_reports(results_path, force=True)
+
     print(f"测试报告已生成:")
-    print(f"- HTML报告: {html_report}")
-    print(f"- 文本报告: {txt_report}")
-    
-    return str(html_report), str(txt_report)
+    print(f"- HTML报告: {reports['html'][0]}")
+    print(f"- 文本报告: {reports['txt'][0]}")
+    print(f"- Markdown报告: {reports['md'][0]}")
+    print(f"- JUnit XML: {junit_path}")
+
+    return reports['html'][0], reports['txt'][0], results['exit_code']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="运行测试并生成HTML、文本和Markdown报告")
+    parser.add_argument('--from-results', default=None, help="从已有的JSON结果重新渲染报告，不重新运行测试")
+    parser.add_argument('--formats', nargs='+', choices=sorted(RENDERERS), default=None, help="要渲染的报告格式")
+    parser.add_argument('--force', action='store_true', help="即使报告比结果文件新也重新渲染")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    html_path, txt_path = run_tests_with_report() 
\ No newline at end of file
+    args = parse_args()
+    if args.from_results:
+        for fmt, (path, updated) in render_reports(args.from_results, formats=args.formats,
+                                                   force=args.force).items():
+            print(f"- {fmt}: {path}{'' if updated else ' (已是最新，跳过)'}")
+    else:
+        html_path, txt_path, exit_code = run_tests_with_report()
+        # 把pytest的退出码传给调用方，CI可以据此判断测试是否失败
+        sys.exit(exit_code)
@@ -17,9 +17,7 @@ from pathlib import Path
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(PROJECT_ROOT)
 
-# 修改导入路径
-from scripts.visualize_predictions import visualize_prediction
-from scripts.generate_test_report import run_tests_with_report
+# 可视化和测试报告模块依赖较重的库，在对应步骤中才导入
 
 def check_imagenet_classes_file():
     """检查并下载ImageNet类别文件（如果不存在）"""
@@ -79,6 +77,14 @@ def create_sample_images():
         with open(dummy_path, 'w') as f:
             f.write("This is a dummy text file for testing error handling.")
         print(f"创建伪图像文件: {dummy_path}")
+    
+    # 更新去重清单，与test_images中视觉上相同的图像在推理时只运行一次
+    from src.dedup import DedupIndex, MANIFEST_NAME
+    manifest_path = os.path.join(data_dir, MANIFEST_NAME)
+    index = DedupIndex.load(manifest_path)
+    for image_path in (black_path, white_path, noise_path):
+        index.add(image_path)
+    index.save(manifest_path)
 
 def check_cat_image():
     """检查cat.jpg是否存在，如果不存在则提供下载建议"""
@@ -146,6 +152,7 @@ def run_visualization():
         return None
     
     # 运行可视化
+    from scripts.visualize_predictions import visualize_prediction
     output_path = visualize_prediction(cat_path)
     return output_path
 
@@ -156,7 +163,8 @@ def run_tests():
     print("="*80)
     
     # 运行测试并生成报告
-    html_path, txt_path = run_tests_with_report()
+    from scripts.generate_test_report import run_tests_with_report
+    html_path, txt_path, _ = run_tests_with_report()
     return html_path, txt_path
 
 def main():
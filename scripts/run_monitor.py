@@ -0,0 +1,100 @@
+"""
+持续鲁棒性监控脚本
+
+此脚本以守护进程方式运行：监视一个目录中新到达的流量图像，用蓄水池采样保留固定数量的样本，
+每隔一段时间对样本进行扰动测试，并在本地HTTP端点以Prometheus文本格式导出滚动窗口指标。
+
+示例:
+    python scripts/run_monitor.py --watch incoming/ --interval 60 --port 9108
+    curl http://127.0.0.1:9108/metrics
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.monitor import RobustnessMonitor, DEFAULT_PERTURBATIONS, check_perturbation
+
+# 监视目录时接受的图像扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def scan_new_images(directory, watermark):
+    """
+    返回修改时间晚于watermark的图像，以及新的watermark
+
+    只记录一个时间戳而不是已见过的文件集合，内存占用不随运行时长增长。
+    """
+    new_images = []
+    latest = watermark
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            mtime = entry.stat().st_mtime
+            if mtime > watermark:
+                new_images.append(entry.path)
+                latest = max(latest, mtime)
+    return new_images, latest
+
+
+def parse_perturbation(value):
+    """把'名称:严重程度'解析为元组，在加载模型之前检查扰动是否受支持"""
+    name, _, severity = value.partition(':')
+    severity = int(severity or 3)
+    check_perturbation(name, severity)
+    return name, severity
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="持续监控线上流量图像的扰动鲁棒性")
+    parser.add_argument('--watch', required=True, help="流量图像到达的目录")
+    parser.add_argument('--perturbations', type=parse_perturbation, nargs='+', default=DEFAULT_PERTURBATIONS,
+                        help="要测试的扰动，格式为名称:严重程度，例如brightness:3")
+    parser.add_argument('--sample-size', type=int, default=64, help="每个周期最多评估的图像数量")
+    parser.add_argument('--interval', type=float, default=60.0, help="评估周期（秒）")
+    parser.add_argument('--window', type=float, default=3600.0, help="滚动窗口长度（秒）")
+    parser.add_argument('--bucket', type=float, default=60.0, help="滚动窗口的桶宽（秒）")
+    parser.add_argument('--scan-interval', type=float, default=1.0, help="扫描目录的间隔（秒）")
+    parser.add_argument('--host', default='127.0.0.1', help="指标端点的监听地址")
+    parser.add_argument('--port', type=int, default=9108, help="指标端点的监听端口")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.isdir(args.watch):
+        print(f"错误: 目录不存在: {args.watch}")
+        return 1
+
+    from src.inference_runner import ImageClassifier
+
+    monitor = RobustnessMonitor(ImageClassifier(), perturbations=args.perturbations, sample_size=args.sample_size,
+                                interval=args.interval, window_seconds=args.window, bucket_seconds=args.bucket)
+    server = monitor.serve(args.host, args.port)
+    monitor.start()
+    host, port = server.server_address[:2]
+    print(f"正在监视 {args.watch}，指标端点: http://{host}:{port}/metrics（Ctrl+C 停止）")
+
+    # 只评估启动之后到达的图像
+    watermark = time.time()
+    try:
+        while True:
+            new_images, watermark = scan_new_images(args.watch, watermark)
+            for image_path in new_images:
+                monitor.submit(image_path)
+            time.sleep(args.scan_interval)
+    except KeyboardInterrupt:
+        print("正在停止监控...")
+    finally:
+        monitor.stop()
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
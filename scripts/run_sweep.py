@@ -0,0 +1,140 @@
+"""
+分布式鲁棒性扫描脚本
+
+此脚本管理一个基于SQLite的扫描队列（见src/sweep_queue.py），包含三个子命令:
+- init: 把（图像 × 扰动 × 严重程度 × 模型）的扫描写入队列，重复执行只会补充缺失的任务
+- worker: 启动工作进程领取任务、运行推理并提交结果；可以在任意多台主机上同时运行
+  （多台主机通过网络文件系统共享队列时，所有子命令都要加 --journal-mode DELETE）
+- status: 查看扫描进度
+
+示例:
+    python scripts/run_sweep.py init --db sweeps/suite.db --images data/test_images --severities 1 3 5
+    python scripts/run_sweep.py worker --db sweeps/suite.db --local-workers 4
+    python scripts/run_sweep.py status --db sweeps/suite.db
+
+工作进程崩溃或被中断后，重新运行worker即可继续：已提交的任务不会重做，过期的租约会被重新分配。
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.perturbations import PERTURBATIONS, SEVERITIES
+from src.inference_runner import SUPPORTED_MODELS
+from src.runtime_profile import load_profile
+from src.sweep_queue import (
+    SweepQueue, run_worker, run_local_workers, DEFAULT_LEASE_SIZE, DEFAULT_LEASE_TIMEOUT, SUPPORTED_JOURNAL_MODES
+)
+from scripts.audit_determinism import collect_images
+
+
+def init_sweep(args):
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print(f"错误: 未在 {args.images} 中找到图像")
+        return 1
+
+    Path(args.db).parent.mkdir(exist_ok=True, parents=True)
+    queue = SweepQueue(args.db, journal_mode=args.journal_mode)
+    added = queue.create_sweep(image_paths, args.perturbations, severities=args.severities, models=args.models)
+    progress = queue.progress()
+    queue.close()
+    print(f"新增 {added} 个任务，队列中共 {progress['total']} 个任务")
+    return 0
+
+
+def resolve_local_workers(args):
+    """本机工作进程数量：命令行指定时使用指定值，否则取机器配置中吞吐量最优的进程数，都没有时为1"""
+    if args.local_workers is not None:
+        return args.local_workers
+    if args.runtime_profile:
+        profile = load_profile(None if args.runtime_profile == 'auto' else args.runtime_profile)
+        if profile and 'throughput' in profile.get('objectives', {}):
+            return profile['objectives']['throughput']['num_processes']
+    return 1
+
+
+def start_workers(args):
+    local_workers = resolve_local_workers(args)
+    worker_kwargs = {
+        'max_tasks': args.max_tasks,
+        'lease_timeout': args.lease_timeout,
+        'cache_path': args.cache_db,
+        'journal_mode': args.journal_mode,
+        'runtime_profile': args.runtime_profile,
+    }
+    if local_workers > 1:
+        committed = sum(run_local_workers(args.db, num_workers=local_workers, **worker_kwargs))
+    else:
+        committed = run_worker(args.db, worker_id=args.worker_id, **worker_kwargs)
+    print(f"本次共提交 {committed} 个任务")
+    return show_status(args)
+
+
+def show_status(args):
+    queue = SweepQueue(args.db, journal_mode=args.journal_mode)
+    progress = queue.progress()
+    if getattr(args, 'output', None):
+        Path(args.output).parent.mkdir(exist_ok=True, parents=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(queue.results(), f, ensure_ascii=False, indent=2)
+        print(f"扫描结果已保存到: {args.output}")
+    queue.close()
+
+    done = progress['done'] + progress['failed']
+    print(f"进度: {done}/{progress['total']} "
+          f"(完成 {progress['done']}，失败 {progress['failed']}，"
+          f"处理中 {progress['leased']}，其中租约已过期 {progress['expired']}，待处理 {progress['pending']})")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="基于共享队列的分布式鲁棒性扫描")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = subparsers.add_parser('init', help="把扫描写入队列")
+    init_parser.add_argument('--db', required=True, help="队列数据库路径")
+    init_parser.add_argument('--images', default='data', help="图像目录或单个图像路径")
+    init_parser.add_argument('--perturbations', nargs='+', default=['identity'] + list(PERTURBATIONS),
+                             choices=['identity'] + list(PERTURBATIONS), help="扰动名称")
+    init_parser.add_argument('--severities', type=int, nargs='+', default=SEVERITIES, help="严重程度")
+    init_parser.add_argument('--models', nargs='+', choices=SUPPORTED_MODELS, default=['resnet18'], help="模型名称")
+    init_parser.set_defaults(func=init_sweep)
+
+    worker_parser = subparsers.add_parser('worker', help="启动工作进程")
+    worker_parser.add_argument('--db', required=True, help="队列数据库路径")
+    worker_parser.add_argument('--worker-id', default=None, help="工作进程标识，默认为主机名:进程号")
+    worker_parser.add_argument('--local-workers', type=int, default=None,
+                               help="在本机启动的工作进程数量，默认取机器配置中的进程数（没有机器配置时为1）")
+    worker_parser.add_argument('--runtime-profile', default=None,
+                               help="机器配置文件路径（scripts/tune_runtime.py生成），'auto'表示本机默认路径；"
+                                    "各工作进程按配置设置线程数")
+    worker_parser.add_argument('--max-tasks', type=int, default=DEFAULT_LEASE_SIZE, help="每个租约的最大任务数")
+    worker_parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT, help="租约时长（秒）")
+    worker_parser.add_argument('--cache-db', default=None, help="logits缓存数据库路径，重复的输入不再重复推理")
+    worker_parser.set_defaults(func=start_workers)
+
+    status_parser = subparsers.add_parser('status', help="查看扫描进度")
+    status_parser.add_argument('--db', required=True, help="队列数据库路径")
+    status_parser.add_argument('--output', default=None, help="把已完成的结果保存为JSON")
+    status_parser.set_defaults(func=show_status)
+
+    for subparser in (init_parser, worker_parser, status_parser):
+        subparser.add_argument('--journal-mode', choices=SUPPORTED_JOURNAL_MODES, default='WAL',
+                               help="SQLite日志模式：WAL只适用于单台主机，多台主机通过网络文件系统共享时使用DELETE")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+长时间运行（soak）稳定性测试脚本
+
+此脚本用合成图像长时间重复运行分类器和可视化流程，定期采样常驻内存（RSS）、打开的文件描述符、
+存活张量数量和吞吐量，结束时对预热后的采样做线性回归：内存指标显著持续增长或吞吐量显著持续下降时
+以非零退出码结束，便于在CI或夜间任务中使用。
+
+示例:
+    python scripts/soak_test.py --duration 7200 --interval 30 --report results/soak_report.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.soak import run_soak, DEFAULT_T_THRESHOLD, DEFAULT_MAX_THROUGHPUT_DECAY
+
+
+def create_synthetic_images(directory, count, seed=0):
+    """生成不同尺寸和格式的随机图像，返回路径列表"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        height, width = rng.integers(224, 640, size=2)
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        path = os.path.join(directory, f"synthetic_{i:03d}.{'jpg' if i % 2 == 0 else 'png'}")
+        Image.fromarray(pixels).save(path)
+        paths.append(path)
+    return paths
+
+
+def make_workload(classifier, image_paths, batch_size, visualize_every, output_dir):
+    """
+    返回一个每次处理一批图像的函数
+
+    每批图像依次预处理并做一次批量推理；每visualize_every批对第一张图像生成一次可视化，
+    保存的图片随即删除，避免磁盘占用随运行时长增长。
+    """
+    import torch
+    from scripts.visualize_predictions import visualize_prediction
+
+    state = {'step': 0}
+
+    def step():
+        start = (state['step'] * batch_size) % len(image_paths)
+        paths = [image_paths[(start + i) % len(image_paths)] for i in range(batch_size)]
+        output = classifier.run_inference(torch.cat([classifier.load_and_preprocess_image(p) for p in paths]))
+        state['step'] += 1
+        if visualize_every and state['step'] % visualize_every == 0:
+            output_path = visualize_prediction(paths[0], output_dir=output_dir, classifier=classifier,
+                                               output=output[0])
+            if output_path:
+                os.remove(output_path)
+        return len(paths)
+
+    return step
+
+
+def print_sample(sample):
+    rss = sample['rss_bytes'] / 2 ** 20 if sample['rss_bytes'] is not None else float('nan')
+    throughput = sample['images_per_sec'] or 0.0
+    print(f"[{sample['time']:8.0f}s] RSS {rss:8.1f} MB | fds {sample['num_fds']} | "
+          f"tensors {sample['live_tensors']} | {throughput:7.1f} 图像/秒")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="长时间运行分类器和可视化流程，检测内存泄漏和吞吐量衰减")
+    parser.add_argument('--duration', type=float, default=3600.0, help="总运行时长（秒）")
+    parser.add_argument('--interval', type=float, default=30.0, help="采样间隔（秒）")
+    parser.add_argument('--warmup', type=float, default=120.0, help="预热时长（秒），不参与趋势分析")
+    parser.add_argument('--batch-size', type=int, default=8, help="每批推理的图像数量")
+    parser.add_argument('--num-images', type=int, default=32, help="循环使用的合成图像数量")
+    parser.add_argument('--visualize-every', type=int, default=10,
+                        help="每隔多少批生成一次可视化，0表示不运行可视化流程")
+    parser.add_argument('--t-threshold', type=float, default=DEFAULT_T_THRESHOLD, help="判定趋势显著的t统计量阈值")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=32.0, help="分析区间内RSS的最大容许增长（MB）")
+    parser.add_argument('--max-throughput-decay', type=float, default=DEFAULT_MAX_THROUGHPUT_DECAY,
+                        help="分析区间内吞吐量的最大容许相对下降")
+    parser.add_argument('--report', default=None, help="保存采样和分析结果的JSON文件路径")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from src.inference_runner import ImageClassifier
+
+    classifier = ImageClassifier()
+    work_dir = tempfile.mkdtemp(prefix='soak_')
+    try:
+        image_paths = create_synthetic_images(work_dir, args.num_images)
+        step = make_workload(classifier, image_paths, args.batch_size, args.visualize_every, work_dir)
+        print(f"开始soak测试，时长{args.duration:.0f}秒，采样间隔{args.interval:.0f}秒（预热{args.warmup:.0f}秒）")
+        result = run_soak(step, args.duration, interval=args.interval, warmup=args.warmup, on_sample=print_sample,
+                          t_threshold=args.t_threshold,
+                          growth_tolerances={'rss_bytes': args.max_rss_growth_mb * 2 ** 20},
+                          max_throughput_decay=args.max_throughput_decay)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n共处理{result['total_images']}张图像，{result['num_samples']}个采样参与趋势分析")
+    for metric, fit in result['trends'].items():
+        print(f"- {metric}: 区间内变化 {fit['change']:.1f}，t = {fit['t']:.2f}")
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到: {args.report}")
+
+    if result['passed']:
+        print("soak测试通过：未检测到内存泄漏或吞吐量衰减")
+        return 0
+    for failure in result['failures']:
+        print(f"失败: {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+运行时配置自动调优脚本
+
+此脚本在本机上扫描（进程数 × intra-op线程数 × 批次大小）的组合，
+分别选出吞吐量最高和延迟最低的配置，并保存为机器配置文件。
+之后创建的ImageClassifier会在启动时自动加载并应用该配置。
+
+示例:
+    python scripts/tune_runtime.py --batch-sizes 1 8 32 --iterations 10
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.runtime_profile import tune_runtime, save_profile, get_profile_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="为本机自动调优CPU推理配置")
+    parser.add_argument('--processes', type=int, nargs='+', default=None, help="要扫描的进程数")
+    parser.add_argument('--threads', type=int, nargs='+', default=None, help="要扫描的intra-op线程数")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32], help="要扫描的批次大小")
+    parser.add_argument('--warmup', type=int, default=2, help="每个配置的预热次数")
+    parser.add_argument('--iterations', type=int, default=10, help="每个配置的计时次数")
+    parser.add_argument('--output', default=None, help=f"机器配置文件路径，默认为 {get_profile_path()}")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("开始扫描运行时配置...")
+    profile = tune_runtime(process_counts=args.processes, thread_counts=args.threads,
+                           batch_sizes=args.batch_sizes, warmup=args.warmup,
+                           iterations=args.iterations)
+
+    for objective, config in profile['objectives'].items():
+        print(f"最佳{objective}配置: 进程数 {config['num_processes']}，线程数 {config['num_threads']}，"
+              f"批次大小 {config['batch_size']}，{config['images_per_sec']:.1f} 图像/秒，"
+              f"延迟 {config['latency_ms']:.1f} ms")
+
+    path = save_profile(profile, args.output)
+    print(f"机器配置已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@
 import os
 import sys
 import glob
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -15,8 +16,33 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # 导入可视化预测脚本中的函数
 from .visualize_predictions import visualize_prediction
 
-def visualize_all_images():
-    """加载并可视化原始图片和所有干扰图片的预测结果"""
+def write_selection_report(selected, output_dir, criterion):
+    """将入选的样本及其得分写入Markdown报告"""
+    report_path = os.path.join(output_dir, 'selection_report.md')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"# 信息量最高的样本（排序依据: {criterion}）\n\n")
+        f.write("| 排名 | 图片 | 得分 | top-1类别 |\n| --- | --- | --- | --- |\n")
+        for rank, (img_path, score, top1) in enumerate(selected, start=1):
+            f.write(f"| {rank} | {img_path} | {score:.4f} | {top1} |\n")
+    return report_path
+
+def visualize_all_images(top_n=None, criterion='flip'):
+    """
+    加载并可视化原始图片和所有干扰图片的预测结果
+    
+    所有干扰图片先按去重清单合并视觉上相同的图像，只对规范图像批量推理，结果再分发给所有别名；
+    指定top_n时只可视化信息量最高的top_n张干扰图片。
+    
+    Args:
+        top_n: 只可视化信息量最高的前N张干扰图片，为None时可视化全部
+        criterion: 信息量排序依据，'margin'、'entropy'或'flip'（相对原始图片的预测翻转）
+    """
+    from src.inference_runner import ImageClassifier
+    from src.batch_runner import BatchRunner
+    from src.selection import select_informative
+    from src.dedup import DedupIndex, MANIFEST_NAME, fan_out
+    import torch
+    
     # 设置路径
     original_image_path = 'data/cat.jpg'
     perturbed_images_dir = 'data/test_images'
@@ -25,10 +51,16 @@ def visualize_all_images():
     # 确保输出目录存在
     Path(output_dir).mkdir(exist_ok=True, parents=True)
     
+    # 所有图片共用一个分类器
+    classifier = ImageClassifier()
+    
     # 首先可视化原始图片
+    original_output = None
     print(f"\n处理原始图片: {original_image_path}")
     if os.path.exists(original_image_path):
-        output_path = visualize_prediction(original_image_path, output_dir=output_dir)
+        original_output = classifier.run_inference(classifier.load_and_preprocess_image(original_image_path))
+        output_path = visualize_prediction(original_image_path, output_dir=output_dir,
+                                           classifier=classifier, output=original_output)
         if output_path:
             print(f"原始图片可视化保存到: {output_path}")
     else:
@@ -48,15 +80,59 @@ def visualize_all_images():
         print(f"\n警告: 未找到干扰图片。请先运行 generate_test_images.py")
         return
     
-    # 为每个干扰图片生成可视化
-    for img_path in perturbed_image_paths:
+    # 合并视觉上相同的图片，只对规范图片推理
+    manifest_path = os.path.join('data', MANIFEST_NAME)
+    index = DedupIndex.load(manifest_path)
+    groups = index.group(sorted(perturbed_image_paths))
+    index.save(manifest_path)
+    skipped = len(perturbed_image_paths) - len(groups)
+    if skipped:
+        print(f"\n{len(perturbed_image_paths)}张干扰图片中有{skipped}张与其他图片视觉上相同，跳过{skipped}次前向传播")
+    
+    # 批量推理规范图片，损坏或伪装的文件直接隔离，不进入可视化流程
+    result = BatchRunner(classifier).run(sorted(groups))
+    for entry in result['quarantine']:
+        print(f"\n跳过无效图片 {entry['path']}: [{entry['error_type']}] {entry['message']}")
+    result['outputs'] = fan_out(result['outputs'], groups)
+    
+    paths = sorted(result['outputs'])
+    if not paths:
+        return
+    logits = torch.stack([result['outputs'][path] for path in paths])
+    
+    # 按信息量选出需要可视化的干扰图片
+    if top_n is not None:
+        if criterion == 'flip' and original_output is None:
+            print("警告: 缺少原始图片，改用margin排序")
+            criterion = 'margin'
+        selected = select_informative(logits, top_n, criterion=criterion, reference_logits=original_output)
+        selected = [(paths[index], score) for index, score in selected]
+        report_path = write_selection_report(
+            [(path, score, int(result['outputs'][path].argmax())) for path, score in selected],
+            output_dir, criterion
+        )
+        print(f"\n从{len(paths)}张干扰图片中选出{len(selected)}张，排序报告: {report_path}")
+        paths = [path for path, _ in selected]
+    
+    # 为选中的干扰图片生成可视化
+    for img_path in paths:
         print(f"\n处理干扰图片: {img_path}")
-        output_path = visualize_prediction(img_path, output_dir=output_dir)
+        output_path = visualize_prediction(img_path, output_dir=output_dir,
+                                           classifier=classifier, output=result['outputs'][img_path])
         if output_path:
             print(f"干扰图片可视化保存到: {output_path}")
     
     print(f"\n所有可视化结果已保存到 {output_dir} 目录")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="为原始图片和干扰图片生成可视化预测结果")
+    parser.add_argument('--top-n', type=int, default=None, help="只可视化信息量最高的前N张干扰图片")
+    parser.add_argument('--criterion', choices=['margin', 'entropy', 'flip'], default='flip',
+                        help="信息量排序依据")
+    # 可能通过generate_and_visualize.py调用，忽略其他脚本的命令行参数
+    args, _ = parser.parse_known_args()
+    return args
+
 def main():
     """主函数"""
     # 检查是否已生成干扰图片，如果没有则提示用户
@@ -69,7 +145,8 @@ def main():
     
     # 执行可视化处理
     print("开始为原始图片和所有干扰图片生成可视化预测结果...")
-    visualize_all_images()
+    args = parse_args()
+    visualize_all_images(top_n=args.top_n, criterion=args.criterion)
     print("可视化处理完成！")
 
 if __name__ == "__main__":
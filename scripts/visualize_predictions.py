@@ -6,24 +6,32 @@ This script loads images, runs model predictions, and generates visualizations w
 
 import os
 import sys
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image
-import torch
+import functools
 from pathlib import Path
 
-# 设置matplotlib支持中文
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
-
 # 添加项目根目录到路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# 修改导入路径，使用相对导入
-from src.inference_runner import ImageClassifier
+# matplotlib、PIL和模型相关模块导入较慢，均在第一次使用时才导入
+
+def get_pyplot():
+    """导入matplotlib.pyplot，并在第一次导入时设置中文字体"""
+    import matplotlib.pyplot as plt
+    
+    # 设置matplotlib支持中文
+    plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+    return plt
+
+@functools.lru_cache(maxsize=None)
+def get_default_classifier():
+    """返回进程内共享的默认ImageClassifier，避免每次可视化都重新构建模型"""
+    from src.inference_runner import ImageClassifier
+    return ImageClassifier()
 
+@functools.lru_cache(maxsize=None)
 def load_class_names(file_path='data/imagenet_classes.txt'):
-    """加载ImageNet类别名称"""
+    """加载ImageNet类别名称（每个文件只读取一次）"""
     try:
         with open(file_path, 'r') as f:
             return [line.strip() for line in f.readlines()]
@@ -33,7 +41,22 @@ def load_class_names(file_path='data/imagenet_classes.txt'):
         # 返回1000个空类别名，让可视化继续进行
         return [f"类别 {i}" for i in range(1000)]
 
-def visualize_prediction(image_path, output_dir='results', top_k=5):
+# 支持的显著性图方法
+SALIENCY_METHODS = ['occlusion', 'gradcam']
+
+def compute_saliency(classifier, input_tensor, method, target=None):
+    """计算单张图像的显著性图，返回形状为(H, W)的numpy数组"""
+    if method == 'occlusion':
+        heatmap, _ = classifier.occlusion_sensitivity(input_tensor, target=target)
+    elif method == 'gradcam':
+        heatmap, _ = classifier.grad_cam(input_tensor, target=target)
+        heatmap = heatmap[0]
+    else:
+        raise ValueError(f"不支持的显著性图方法: {method}。支持的方法: {SALIENCY_METHODS}")
+    return heatmap.numpy()
+
+def visualize_prediction(image_path, output_dir='results', top_k=5, classifier=None, output=None,
+                         saliency=None):
     """
     加载图像，运行预测，并生成可视化结果
     
@@ -41,74 +64,100 @@ def visualize_prediction(image_path, output_dir='results', top_k=5):
         image_path: 输入图像路径
         output_dir: 输出目录
         top_k: 显示的top-k预测结果数量
+        classifier: 复用的ImageClassifier实例，为None时使用进程内共享的默认实例
+        output: 已经批量推理得到的模型输出，形状为(1, 1000)或(1000,)，为None时重新推理
+        saliency: 显著性图方法，'occlusion'或'gradcam'，为None时不绘制显著性图
     """
     # 确保输出目录存在
     Path(output_dir).mkdir(exist_ok=True, parents=True)
     
-    # 加载图像
+    from PIL import Image
+    
+    # 加载图像，读入像素后立即关闭文件
     try:
-        pil_image = Image.open(image_path)
+        with Image.open(image_path) as opened:
+            pil_image = opened.copy()
     except Exception as e:
         print(f"无法加载图像 {image_path}: {e}")
         return None
     
-    # 加载分类器模型
-    classifier = ImageClassifier()
+    # 复用分类器模型
+    if classifier is None:
+        classifier = get_default_classifier()
     
     # 加载类别名称
     class_names = load_class_names()
     
-    # 预处理图像并进行推理
-    input_tensor = classifier.load_and_preprocess_image(image_path)
-    output = classifier.run_inference(input_tensor)
+    # 预处理图像并进行推理（已有输出时直接使用）
+    input_tensor = None
+    if output is None or saliency:
+        input_tensor = classifier.load_and_preprocess_image(image_path)
+    if output is None:
+        output = classifier.run_inference(input_tensor)
+    output = output.reshape(1, -1)
     
     # 获取top-k预测结果
     predictions = classifier.get_top_predictions(output, top_k=top_k, class_names=class_names)
     
     # 创建可视化图像
-    plt.figure(figsize=(12, 6))
-    
-    # 左侧显示原始图像
-    plt.subplot(1, 2, 1)
-    plt.imshow(pil_image)
-    plt.title("Input Image")
-    plt.axis('off')
-    
-    # 右侧显示预测结果
-    plt.subplot(1, 2, 2)
-    
-    # 创建水平条形图
-    labels = []
-    probs = []
-    
-    for i, (idx, prob, name) in enumerate(predictions):
-        if name:
-            label = f"{name}"
-        else:
-            label = f"Class {idx}"
-        labels.append(label)
-        probs.append(prob / 100)  # 转为0-1区间概率
-    
-    # 翻转列表以使最高概率在顶部
-    labels.reverse()
-    probs.reverse()
-    
-    # 条形图
-    bars = plt.barh(range(len(probs)), probs, color='skyblue')
-    plt.yticks(range(len(labels)), labels)
-    plt.xlabel('Probability')
-    plt.title('Prediction Results')
-    
-    # 添加概率值标签
-    for i, bar in enumerate(bars):
-        plt.text(bar.get_width() + 0.01, bar.get_y() + bar.get_height()/2, 
-                f'{probs[i]:.1%}', va='center')
-    
-    # 保存图像
-    timestamp = classifier.get_timestamp()
-    output_path = os.path.join(output_dir, f"prediction_vis_{os.path.basename(image_path).split('.')[0]}_{timestamp}.png")
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=200)
+    plt = get_pyplot()
+    num_panels = 3 if saliency else 2
+    fig = plt.figure(figsize=(6 * num_panels, 6))
+    # 长时间运行时未关闭的图形会一直占用内存，保存后无论成功与否都关闭
+    try:
+        # 左侧显示原始图像
+        plt.subplot(1, num_panels, 1)
+        plt.imshow(pil_image)
+        plt.title("Input Image")
+        plt.axis('off')
+
+        # 显著性图叠加在模型实际看到的中心裁剪图像上
+        if saliency:
+            heatmap = compute_saliency(classifier, input_tensor, saliency, target=predictions[0][0])
+            crop = (classifier.normalize(input_tensor) * classifier.std + classifier.mean).clamp(0, 1)[0].permute(1, 2, 0).numpy()
+            plt.subplot(1, num_panels, 2)
+            plt.imshow(crop)
+            plt.imshow(heatmap, cmap='jet', alpha=0.5)
+            plt.title(f"Saliency ({saliency})")
+            plt.axis('off')
+
+        # 右侧显示预测结果
+        plt.subplot(1, num_panels, num_panels)
+
+        # 创建水平条形图
+        labels = []
+        probs = []
+
+        for i, (idx, prob, name) in enumerate(predictions):
+            if name:
+                label = f"{name}"
+            else:
+                label = f"Class {idx}"
+            labels.append(label)
+            probs.append(prob / 100)  # 转为0-1区间概率
+
+        # 翻转列表以使最高概率在顶部
+        labels.reverse()
+        probs.reverse()
+
+        # 条形图
+        bars = plt.barh(range(len(probs)), probs, color='skyblue')
+        plt.yticks(range(len(labels)), labels)
+        plt.xlabel('Probability')
+        plt.title('Prediction Results')
+
+        # 添加概率值标签
+        for i, bar in enumerate(bars):
+            plt.text(bar.get_width() + 0.01, bar.get_y() + bar.get_height()/2, 
+                    f'{probs[i]:.1%}', va='center')
+
+        # 保存图像
+        timestamp = classifier.get_timestamp()
+        output_path = os.path.join(output_dir, f"prediction_vis_{os.path.basename(image_path).split('.')[0]}_{timestamp}.png")
+        plt.tight_layout()
+        plt.savefig(output_path, dpi=200)
+    finally:
+        plt.close(fig)
     
     print(f"Visualization saved to: {output_path}")
     return output_path
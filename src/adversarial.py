@@ -0,0 +1,201 @@
+"""
+对抗扰动模块
+
+此模块提供基于梯度的对抗样本生成功能，用于评估模型的对抗鲁棒性：
+1. FGSM（快速梯度符号法），单步攻击
+2. PGD（投影梯度下降），多步攻击
+3. 支持L∞和L2两种扰动预算
+
+所有攻击均在像素空间（[0, 1]区间）内进行，扰动预算epsilon也以像素空间为单位，
+输入和输出仍然是经过标准化的张量，可直接传入ImageClassifier.run_inference。
+模型参数保持冻结，只对输入计算梯度；批次按chunk_size分块计算，以限制激活值占用的内存。
+"""
+
+import torch
+import torch.nn.functional as F
+
+# 支持的攻击方法和范数
+SUPPORTED_METHODS = ['fgsm', 'pgd']
+SUPPORTED_NORMS = ['linf', 'l2']
+
+
+def _per_sample_l2_norm(tensor):
+    """计算每个样本的L2范数，返回形状为(B, 1, 1, 1)的张量，便于广播"""
+    norms = tensor.flatten(1).norm(p=2, dim=1)
+    return norms.view(-1, 1, 1, 1)
+
+
+def _project(delta, norm, epsilon):
+    """将扰动投影回epsilon球内"""
+    if norm == 'linf':
+        return delta.clamp(-epsilon, epsilon)
+    # L2: 对超出预算的样本按比例缩放
+    norms = _per_sample_l2_norm(delta)
+    factor = torch.clamp(epsilon / (norms + 1e-12), max=1.0)
+    return delta * factor
+
+
+def _gradient_step(grad, norm, step_size):
+    """根据范数类型计算一步梯度上升的更新量"""
+    if norm == 'linf':
+        return step_size * grad.sign()
+    return step_size * grad / (_per_sample_l2_norm(grad) + 1e-12)
+
+
+def _random_start(pixels, norm, epsilon, generator):
+    """在epsilon球内随机初始化扰动"""
+    if norm == 'linf':
+        delta = torch.rand(pixels.shape, generator=generator, dtype=pixels.dtype) * 2 - 1
+        return delta * epsilon
+    # L2: 随机方向，随机半径
+    direction = torch.randn(pixels.shape, generator=generator, dtype=pixels.dtype)
+    direction = direction / (_per_sample_l2_norm(direction) + 1e-12)
+    radius = torch.rand((pixels.shape[0], 1, 1, 1), generator=generator, dtype=pixels.dtype)
+    return direction * radius * epsilon
+
+
+def _attack_chunk(model, pixels, labels, mean, std, method, norm, epsilon,
+                  step_size, steps, random_start, generator):
+    """
+    对一个分块运行攻击
+
+    参数:
+        pixels (torch.Tensor): 像素空间的输入，形状为(b, 3, H, W)，取值范围[0, 1]
+        labels (torch.Tensor): 真实标签，形状为(b,)
+
+    返回:
+        torch.Tensor: 像素空间的对抗样本，形状与pixels相同
+    """
+    if method == 'fgsm':
+        delta = torch.zeros_like(pixels)
+        num_steps = 1
+        step_size = epsilon
+    else:
+        delta = _random_start(pixels, norm, epsilon, generator) if random_start else torch.zeros_like(pixels)
+        # 保证初始点也在合法像素范围内
+        delta = (pixels + delta).clamp(0, 1) - pixels
+        num_steps = steps
+
+    for _ in range(num_steps):
+        # 只对输入扰动计算梯度
+        delta.requires_grad_(True)
+        logits = model((pixels + delta - mean) / std)
+        loss = F.cross_entropy(logits, labels, reduction='sum')
+        grad, = torch.autograd.grad(loss, delta)
+
+        with torch.no_grad():
+            delta = delta + _gradient_step(grad, norm, step_size)
+            delta = _project(delta, norm, epsilon)
+            # 保证对抗样本仍在合法像素范围内
+            delta = (pixels + delta).clamp(0, 1) - pixels
+
+    return (pixels + delta).detach()
+
+
+def generate_adversarial(model, inputs, labels, mean, std, method='fgsm', norm='linf',
+                         epsilon=8 / 255, step_size=None, steps=10, random_start=True,
+                         chunk_size=32, generator=None):
+    """
+    批量生成对抗样本
+
+    参数:
+        model (torch.nn.Module): 处于评估模式的分类模型
+        inputs (torch.Tensor): 标准化后的输入张量，形状为(B, 3, H, W)
+        labels (torch.Tensor): 标签张量，形状为(B,)
+        mean (torch.Tensor): 标准化均值，形状为(1, 3, 1, 1)
+        std (torch.Tensor): 标准化标准差，形状为(1, 3, 1, 1)
+        method (str): 攻击方法，'fgsm'或'pgd'
+        norm (str): 扰动范数，'linf'或'l2'
+        epsilon (float): 像素空间中的扰动预算
+        step_size (float): PGD每一步的步长，默认为2.5 * epsilon / steps
+        steps (int): PGD迭代次数
+        random_start (bool): PGD是否在epsilon球内随机初始化
+        chunk_size (int): 每次前向/反向传播处理的图像数量，用于限制激活内存
+        generator (torch.Generator): 随机初始化使用的随机数生成器，用于复现结果
+
+    返回:
+        torch.Tensor: 标准化后的对抗样本张量，形状与inputs相同
+
+    异常:
+        ValueError: 当攻击方法、范数或参数不合法时抛出
+    """
+    if method not in SUPPORTED_METHODS:
+        raise ValueError(f"不支持的攻击方法: {method}。支持的方法: {SUPPORTED_METHODS}")
+    if norm not in SUPPORTED_NORMS:
+        raise ValueError(f"不支持的范数: {norm}。支持的范数: {SUPPORTED_NORMS}")
+    if epsilon < 0:
+        raise ValueError(f"epsilon必须为非负数，而不是{epsilon}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size必须为正整数，而不是{chunk_size}")
+    if labels.shape[0] != inputs.shape[0]:
+        raise ValueError(f"标签数量({labels.shape[0]})与输入数量({inputs.shape[0]})不一致")
+
+    if step_size is None:
+        step_size = 2.5 * epsilon / max(steps, 1)
+
+    mean = mean.to(inputs.dtype)
+    std = std.to(inputs.dtype)
+
+    adversarial_chunks = []
+    # 临时开启梯度计算，调用方可能处于torch.no_grad()上下文中
+    with torch.enable_grad():
+        for start in range(0, inputs.shape[0], chunk_size):
+            chunk = inputs[start:start + chunk_size].detach()
+            pixels = (chunk * std + mean).clamp(0, 1)
+            adv_pixels = _attack_chunk(
+                model, pixels, labels[start:start + chunk_size], mean, std,
+                method, norm, epsilon, step_size, steps, random_start, generator
+            )
+            adversarial_chunks.append((adv_pixels - mean) / std)
+
+    return torch.cat(adversarial_chunks, dim=0)
+
+
+def evaluate_robustness(model, inputs, labels, mean, std, chunk_size=32, **attack_kwargs):
+    """
+    计算干净准确率和对抗鲁棒准确率
+
+    参数:
+        model (torch.nn.Module): 处于评估模式的分类模型
+        inputs (torch.Tensor): 标准化后的输入张量，形状为(B, 3, H, W)
+        labels (torch.Tensor): 标签张量，形状为(B,)
+        mean (torch.Tensor): 标准化均值
+        std (torch.Tensor): 标准化标准差
+        chunk_size (int): 分块大小
+        **attack_kwargs: 传递给generate_adversarial的攻击参数
+
+    返回:
+        dict: 包含以下键的字典
+            - num_samples: 样本数量
+            - clean_accuracy: 干净样本上的准确率
+            - robust_accuracy: 对抗样本上的准确率
+            - attack_success_rate: 原本分类正确、攻击后分类错误的样本占比
+            - clean_predictions: 干净样本的top-1预测，形状为(B,)
+            - adversarial_predictions: 对抗样本的top-1预测，形状为(B,)
+    """
+    adversarial = generate_adversarial(model, inputs, labels, mean, std,
+                                       chunk_size=chunk_size, **attack_kwargs)
+
+    clean_preds = []
+    adv_preds = []
+    with torch.no_grad():
+        for start in range(0, inputs.shape[0], chunk_size):
+            clean_preds.append(model(inputs[start:start + chunk_size]).argmax(dim=1))
+            adv_preds.append(model(adversarial[start:start + chunk_size]).argmax(dim=1))
+    clean_preds = torch.cat(clean_preds)
+    adv_preds = torch.cat(adv_preds)
+
+    clean_correct = clean_preds == labels
+    adv_correct = adv_preds == labels
+    num_samples = labels.shape[0]
+    num_clean_correct = int(clean_correct.sum())
+
+    return {
+        'num_samples': num_samples,
+        'clean_accuracy': num_clean_correct / num_samples,
+        'robust_accuracy': int(adv_correct.sum()) / num_samples,
+        'attack_success_rate': (int((clean_correct & ~adv_correct).sum()) / num_clean_correct
+                                if num_clean_correct else 0.0),
+        'clean_predictions': clean_preds,
+        'adversarial_predictions': adv_preds,
+    }
@@ -0,0 +1,135 @@
+"""
+批次不变性检查模块
+
+此模块在真实的批量前向传播中验证批次大小不会改变预测结果：
+1. 以批次大小1的逐张推理作为参考
+2. 以多个批次大小、多种线程设置进行真正的批量推理
+3. 覆盖最后一个批次不满（余数批次）以及补齐到完整批次（padding）两种情况
+4. 报告每张图像的数值漂移和top-1预测不一致
+5. 检查期间绕过分类器的logits缓存（见enable_cache），否则各批次大小都只会返回同一份缓存结果
+"""
+
+from contextlib import contextmanager
+
+import torch
+
+
+@contextmanager
+def torch_num_threads(num_threads):
+    """
+    临时设置PyTorch的intra-op线程数，退出时恢复原来的设置
+
+    参数:
+        num_threads (int): 线程数，为None时不做修改
+    """
+    previous = torch.get_num_threads()
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+@contextmanager
+def logit_cache_bypassed(classifier):
+    """
+    临时绕过分类器的logits缓存，退出时恢复
+
+    参数:
+        classifier (ImageClassifier): 图像分类器，未启用缓存时不做修改
+    """
+    cache = getattr(classifier, 'cache', None)
+    classifier.cache = None
+    try:
+        yield
+    finally:
+        classifier.cache = cache
+
+
+def run_batched(classifier, inputs, batch_size, pad_remainder=False):
+    """
+    以固定批次大小进行真正的批量推理，不经过logits缓存
+
+    参数:
+        classifier (ImageClassifier): 图像分类器
+        inputs (torch.Tensor): 预处理后的输入张量，形状为(N, 3, H, W)
+        batch_size (int): 每次前向传播的图像数量
+        pad_remainder (bool): 最后一个批次不满时，是否用全零图像补齐到batch_size
+
+    返回:
+        torch.Tensor: 形状为(N, 1000)的输出，补齐部分的输出会被丢弃
+    """
+    if batch_size < 1:
+        raise ValueError(f"批次大小必须为正整数，而不是{batch_size}")
+
+    outputs = []
+    with logit_cache_bypassed(classifier):
+        for start in range(0, inputs.shape[0], batch_size):
+            batch = inputs[start:start + batch_size]
+            num_valid = batch.shape[0]
+            if pad_remainder and num_valid < batch_size:
+                padding = batch.new_zeros((batch_size - num_valid,) + tuple(batch.shape[1:]))
+                batch = torch.cat([batch, padding], dim=0)
+            outputs.append(classifier.run_inference(batch)[:num_valid])
+    return torch.cat(outputs, dim=0)
+
+
+def check_batch_invariance(classifier, inputs, batch_sizes=None, thread_counts=(1,),
+                           pad_options=(False, True), atol=1e-4):
+    """
+    在多个批次大小和线程设置下检查预测是否保持不变
+
+    参数:
+        classifier (ImageClassifier): 图像分类器
+        inputs (torch.Tensor): 预处理后的输入张量，形状为(N, 3, H, W)
+        batch_sizes (list): 要检查的批次大小，默认为1..N
+        thread_counts (tuple): 要检查的intra-op线程数，第一个值同时用于计算参考输出
+        pad_options (tuple): 余数批次的处理方式，False表示直接运行不满的批次，True表示补齐
+        atol (float): 允许的最大数值漂移
+
+    返回:
+        dict: 包含以下键的字典
+            - num_images: 图像数量
+            - invariant: 所有运行是否都在容差内且top-1预测一致
+            - runs: 每个(线程数, 批次大小, 是否补齐)组合的结果列表，每项包含
+                    num_threads、batch_size、padded、max_drift、per_image_drift、
+                    top1_disagreements（top-1不一致的图像索引）和within_tolerance
+    """
+    num_images = inputs.shape[0]
+    if batch_sizes is None:
+        batch_sizes = range(1, num_images + 1)
+
+    # 参考输出：逐张推理
+    with torch_num_threads(thread_counts[0]):
+        reference = run_batched(classifier, inputs, batch_size=1)
+    reference_top1 = reference.argmax(dim=1)
+
+    runs = []
+    for num_threads in thread_counts:
+        with torch_num_threads(num_threads):
+            for batch_size in batch_sizes:
+                # 能整除时补齐与否没有区别，只运行一次
+                has_remainder = num_images % batch_size != 0
+                for padded in pad_options:
+                    if padded and not has_remainder:
+                        continue
+                    output = run_batched(classifier, inputs, batch_size, pad_remainder=padded)
+                    per_image_drift = (output - reference).abs().amax(dim=1)
+                    disagreements = (output.argmax(dim=1) != reference_top1).nonzero().flatten()
+                    max_drift = float(per_image_drift.max())
+                    runs.append({
+                        'num_threads': num_threads,
+                        'batch_size': batch_size,
+                        'padded': padded,
+                        'max_drift': max_drift,
+                        'per_image_drift': per_image_drift.tolist(),
+                        'top1_disagreements': disagreements.tolist(),
+                        'within_tolerance': max_drift <= atol and len(disagreements) == 0,
+                    })
+
+    return {
+        'num_images': num_images,
+        'invariant': all(run['within_tolerance'] for run in runs),
+        'runs': runs,
+    }
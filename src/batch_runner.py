@@ -0,0 +1,269 @@
+"""
+错误隔离的批量推理模块
+
+此模块用于在含有损坏文件的大批量输入上稳定地运行推理：
+1. 预先并行检查文件的魔数（magic bytes）和图像文件头，不完整解码图像
+2. 不合格的文件连同具体的异常类型一起记入隔离报告（quarantine）
+3. 合格的图像并行解码，按完成顺序打包成完整批次进行推理
+4. 解码耗时超出限制的文件被判定为超时并隔离，不会阻塞整个流水线；
+   所有解码线程都卡在超时的文件上时，其余尚未开始的文件也判定为超时，而不是无限等待
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import torch
+
+from .errors import (
+    ImageLoadError, ImageTooLargeError, UnsupportedImageFormatError,
+    CorruptImageError, DecodeTimeoutError
+)
+
+# 常见图像格式的文件头魔数
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+]
+
+# 识别格式需要读取的字节数（WEBP需要12字节）
+SIGNATURE_LENGTH = 12
+
+# PIL报告的格式 -> 对应的魔数格式。多图JPEG（MPO，很多相机会生成）的文件头与JPEG相同
+FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+# 分类器没有应用机器配置时的默认批次大小
+DEFAULT_BATCH_SIZE = 32
+
+
+def default_batch_size(classifier):
+    """分类器应用了机器配置（runtime_profile）时使用配置中的批次大小，否则为DEFAULT_BATCH_SIZE"""
+    config = getattr(classifier, 'runtime_config', None) or {}
+    return config.get('batch_size', DEFAULT_BATCH_SIZE)
+
+
+def sniff_image_format(image_path):
+    """
+    根据文件头魔数判断图像格式，只读取文件开头的少量字节
+
+    参数:
+        image_path (str): 文件路径
+
+    返回:
+        str: 格式名称（与PIL的Image.format一致），无法识别时返回None
+    """
+    with open(image_path, 'rb') as f:
+        header = f.read(SIGNATURE_LENGTH)
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def validate_image_file(image_path, max_pixels=None):
+    """
+    检查文件是否为可解码的图像，只读取魔数和文件头
+
+    参数:
+        image_path (str): 文件路径
+        max_pixels (int): 像素预算；超出预算且格式无法在解码时缩小（非JPEG）时视为不合格
+
+    返回:
+        dict: 包含path、format和size的字典
+
+    异常:
+        FileNotFoundError: 当文件不存在时抛出
+        UnsupportedImageFormatError: 当魔数不属于任何受支持的图像格式时抛出
+        CorruptImageError: 当文件头无法解析或与魔数不一致时抛出
+        ImageTooLargeError: 当图像超出像素预算且无法在解码时缩小时抛出
+    """
+    from PIL import Image
+
+    image_format = sniff_image_format(image_path)
+    if image_format is None:
+        raise UnsupportedImageFormatError(f"文件'{image_path}'不是受支持的图像格式")
+
+    try:
+        with Image.open(image_path) as image:
+            header_format = image.format
+            size = image.size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(f"图像'{image_path}'像素数过多: {str(e)}")
+    except Exception as e:
+        raise CorruptImageError(f"无法解析图像'{image_path}'的文件头: {str(e)}")
+
+    header_format = FORMAT_ALIASES.get(header_format, header_format)
+    if header_format != image_format:
+        raise CorruptImageError(f"图像'{image_path}'的文件头({header_format})与魔数({image_format})不一致")
+    if max_pixels is not None and size[0] * size[1] > max_pixels and image_format != 'JPEG':
+        raise ImageTooLargeError(f"图像'{image_path}'尺寸为{size[0]}x{size[1]}，超出像素预算{max_pixels}")
+
+    return {'path': image_path, 'format': image_format, 'size': size}
+
+
+def _quarantine_entry(image_path, stage, error):
+    """构造一条隔离记录"""
+    return {
+        'path': image_path,
+        'stage': stage,
+        'error_type': type(error).__name__,
+        'message': str(error),
+    }
+
+
+def validate_files(image_paths, num_workers=4, max_pixels=None):
+    """
+    并行检查一批文件
+
+    参数:
+        image_paths (list): 文件路径列表
+        num_workers (int): 并行线程数
+        max_pixels (int): 像素预算
+
+    返回:
+        tuple: (合格文件路径列表（保持输入顺序）, 隔离记录列表)
+    """
+    def check(image_path):
+        try:
+            validate_image_file(image_path, max_pixels=max_pixels)
+            return None
+        except (ImageLoadError, OSError) as e:
+            return _quarantine_entry(image_path, 'validate', e)
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        entries = list(executor.map(check, image_paths))
+
+    valid = [path for path, entry in zip(image_paths, entries) if entry is None]
+    quarantine = [entry for entry in entries if entry is not None]
+    return valid, quarantine
+
+
+class BatchRunner:
+    """
+    错误隔离的批量推理器
+
+    先并行检查所有文件，再并行解码合格的图像并打包成完整批次推理。
+    任何一个文件的失败或超时都只会进入隔离报告，不会中断或拖慢其他文件的处理。
+    """
+
+    def __init__(self, classifier, batch_size=None, num_workers=4, decode_timeout=10.0, poll_interval=0.05):
+        """
+        初始化批量推理器
+
+        参数:
+            classifier (ImageClassifier): 图像分类器
+            batch_size (int): 每次前向传播的图像数量，默认取分类器机器配置中的批次大小（见default_batch_size）
+            num_workers (int): 检查和解码文件的并行线程数
+            decode_timeout (float): 单个文件解码的超时时间（秒），为None时不限制
+            poll_interval (float): 检查解码超时的时间间隔（秒）
+        """
+        batch_size = default_batch_size(classifier) if batch_size is None else batch_size
+        if batch_size < 1:
+            raise ValueError(f"批次大小必须为正整数，而不是{batch_size}")
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.decode_timeout = decode_timeout
+        self.poll_interval = poll_interval
+        self.quarantine = []
+
+    def _decode(self, image_path, started):
+        """在工作线程中解码并预处理单个图像，记录开始时间用于超时判断"""
+        started[image_path] = time.monotonic()
+        return self.classifier.load_and_preprocess_image(image_path)
+
+    def _collect_timeouts(self, pending, started):
+        """找出已开始执行且超过超时时间的解码任务"""
+        if self.decode_timeout is None:
+            return []
+        now = time.monotonic()
+        return [future for future, image_path in pending.items()
+                if image_path in started and now - started[image_path] > self.decode_timeout]
+
+    def iter_batches(self, image_paths):
+        """
+        检查、解码并批量推理，每完成一个批次就产出一次结果
+
+        参数:
+            image_paths (list): 图像路径列表
+
+        产出:
+            tuple: (批次中的图像路径列表, 形状为(B, 1000)的输出张量)
+        """
+        valid_paths, self.quarantine = validate_files(
+            image_paths, num_workers=self.num_workers, max_pixels=self.classifier.max_pixels
+        )
+
+        started = {}
+        stuck = set()
+        batch_paths, batch_tensors = [], []
+        # 超时的线程无法被强制终止，关闭线程池时不等待它们结束
+        executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        try:
+            pending = {executor.submit(self._decode, path, started): path for path in valid_paths}
+            while pending:
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    image_path = pending.pop(future)
+                    try:
+                        batch_tensors.append(future.result())
+                        batch_paths.append(image_path)
+                    except (ImageLoadError, OSError) as e:
+                        self.quarantine.append(_quarantine_entry(image_path, 'decode', e))
+
+                for future in self._collect_timeouts(pending, started):
+                    image_path = pending.pop(future)
+                    future.cancel()
+                    stuck.add(future)
+                    error = DecodeTimeoutError(f"解码图像'{image_path}'超过{self.decode_timeout}秒")
+                    self.quarantine.append(_quarantine_entry(image_path, 'decode', error))
+                
+                # 超时的线程无法终止，所有线程都被占用时剩余的文件永远不会开始解码
+                stuck = {future for future in stuck if not future.done()}
+                if pending and len(stuck) >= self.num_workers:
+                    for future, image_path in pending.items():
+                        future.cancel()
+                        error = DecodeTimeoutError(f"所有解码线程都卡在超时的文件上，图像'{image_path}'未能开始解码")
+                        self.quarantine.append(_quarantine_entry(image_path, 'decode', error))
+                    pending.clear()
+
+                # 只要凑够完整批次就立即推理
+                while len(batch_tensors) >= self.batch_size:
+                    paths = batch_paths[:self.batch_size]
+                    batch = torch.cat(batch_tensors[:self.batch_size], dim=0)
+                    del batch_paths[:self.batch_size], batch_tensors[:self.batch_size]
+                    yield paths, self.classifier.run_inference(batch)
+
+            # 最后一个不满的批次
+            if batch_tensors:
+                yield batch_paths, self.classifier.run_inference(torch.cat(batch_tensors, dim=0))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, image_paths):
+        """
+        对一批文件运行错误隔离的批量推理
+
+        参数:
+            image_paths (list): 图像路径列表
+
+        返回:
+            dict: 包含以下键的字典
+                - outputs: 图像路径 -> 形状为(1000,)的输出张量
+                - quarantine: 隔离记录列表，每项包含path、stage（'validate'或'decode'）、
+                              error_type（异常类名）和message
+                - num_batches: 运行的批次数量
+        """
+        outputs = {}
+        num_batches = 0
+        for paths, batch_output in self.iter_batches(image_paths):
+            num_batches += 1
+            for image_path, row in zip(paths, batch_output):
+                outputs[image_path] = row
+        return {'outputs': outputs, 'quarantine': list(self.quarantine), 'num_batches': num_batches}
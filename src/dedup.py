@@ -0,0 +1,228 @@
+"""
+感知哈希去重模块
+
+此模块在推理之前把视觉上相同的测试图像合并为一个规范（canonical）条目：
+1. 感知哈希由两部分组成：
+   - dHash：把灰度图缩小到(hash_size+1) × hash_size，比较相邻像素的亮度梯度，对JPEG压缩和缩放不敏感
+   - 颜色键：把图像缩小到colour_grid × colour_grid，各颜色通道按colour_step量化。
+     dHash只看梯度，纯黑和纯白图像的dHash相同，颜色键保证它们不会被合并
+2. 哈希从磁盘上的文件解码后计算，因此JPEG编码后像素相同的低强度扰动也会被识别为重复
+3. 清单（manifest）记录每个文件的哈希、规范文件以及文件大小和修改时间；文件变化后旧记录自动失效
+4. 推理只在规范文件上进行，结果再按清单分发给所有别名
+
+清单中的路径相对于清单所在目录保存，项目可以整体移动。
+"""
+
+import json
+import os
+
+import numpy as np
+
+# 默认的哈希参数
+DEFAULT_HASH_SIZE = 16
+DEFAULT_COLOUR_GRID = 4
+DEFAULT_COLOUR_STEP = 8
+
+# 默认的清单文件名
+MANIFEST_NAME = 'dedup_manifest.json'
+
+
+def perceptual_hash(image, hash_size=DEFAULT_HASH_SIZE, colour_grid=DEFAULT_COLOUR_GRID,
+                    colour_step=DEFAULT_COLOUR_STEP):
+    """
+    计算图像的感知哈希
+
+    参数:
+        image (PIL.Image.Image 或 str): 图像或图像路径
+        hash_size (int): dHash的边长，哈希共hash_size²位
+        colour_grid (int): 颜色键的网格边长
+        colour_step (int): 颜色量化步长（0~255的像素值除以该步长后取整）
+
+    返回:
+        str: 形如'<dHash十六进制>-<颜色键十六进制>'的哈希字符串
+    """
+    from PIL import Image
+
+    if isinstance(image, (str, os.PathLike)):
+        with Image.open(image) as opened:
+            # 哈希只需要很小的分辨率，JPEG可以直接以缩小的尺寸解码
+            opened.draft('RGB', (64, 64))
+            return perceptual_hash(opened, hash_size, colour_grid, colour_step)
+
+    rgb = image.convert('RGB')
+    grey = np.asarray(rgb.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    gradient_bits = (grey[:, 1:] > grey[:, :-1]).flatten()
+    dhash = np.packbits(gradient_bits).tobytes().hex()
+
+    colours = np.asarray(rgb.resize((colour_grid, colour_grid), Image.BOX), dtype=np.uint8) // colour_step
+    return f"{dhash}-{colours.tobytes().hex()}"
+
+
+class DedupIndex:
+    """
+    感知哈希去重索引
+
+    第一个出现的图像成为规范文件，之后哈希相同的图像记为它的别名。
+    """
+
+    def __init__(self, root='.', hash_size=DEFAULT_HASH_SIZE, colour_grid=DEFAULT_COLOUR_GRID,
+                 colour_step=DEFAULT_COLOUR_STEP):
+        """
+        参数:
+            root (str): 清单中相对路径的基准目录
+            hash_size (int): dHash的边长
+            colour_grid (int): 颜色键的网格边长
+            colour_step (int): 颜色量化步长
+        """
+        self.root = str(root)
+        self.hash_params = {'hash_size': hash_size, 'colour_grid': colour_grid, 'colour_step': colour_step}
+        self.entries = {}    # 相对路径 -> {'key', 'canonical', 'size', 'mtime'}
+        self.by_key = {}     # 哈希 -> 规范文件的相对路径
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.root)).replace(os.sep, '/')
+
+    def _absolute(self, relative):
+        return os.path.normpath(os.path.join(self.root, relative))
+
+    def _is_current(self, relative):
+        """清单记录与磁盘上的文件是否一致"""
+        entry = self.entries.get(relative)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(self._absolute(relative))
+        except OSError:
+            return False
+        return stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']
+
+    def add(self, path):
+        """
+        把一个图像文件加入索引
+
+        参数:
+            path (str): 图像路径
+
+        返回:
+            str: 该图像的规范文件路径（不是重复图像时就是它自己）
+        """
+        relative = self._relative(path)
+        if self._is_current(relative):
+            canonical = self.entries[relative]['canonical']
+            if self._is_current(canonical):
+                return self._absolute(canonical)
+            # 别名未变但规范文件已改变或被删除：下面重新计算这个别名的哈希并重新查找规范文件
+        self._remove(relative)
+
+        key = perceptual_hash(path, **self.hash_params)
+        canonical = self.by_key.get(key)
+        if canonical is None or not self._is_current(canonical):
+            canonical = relative
+            self.by_key[key] = relative
+        stat = os.stat(path)
+        self.entries[relative] = {'key': key, 'canonical': canonical, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        return self._absolute(canonical)
+
+    def _remove(self, relative):
+        """
+        删除一条过期记录
+
+        指向被删除文件的别名交给该哈希当前的规范文件；该哈希没有其他规范文件时交给下一个别名。
+        """
+        entry = self.entries.pop(relative, None)
+        if entry is None:
+            return
+        if self.by_key.get(entry['key']) == relative:
+            del self.by_key[entry['key']]
+        aliases = sorted(r for r, e in self.entries.items() if e['canonical'] == relative)
+        if not aliases:
+            return
+        heir = self.by_key.setdefault(entry['key'], aliases[0])
+        for alias in aliases:
+            self.entries[alias]['canonical'] = heir
+
+    def canonical_for(self, path):
+        """
+        返回图像的规范文件路径
+
+        图像或它的规范文件不在索引中或已变化时返回None（调用add重新分组）。
+        """
+        relative = self._relative(path)
+        if not self._is_current(relative) or not self._is_current(self.entries[relative]['canonical']):
+            return None
+        return self._absolute(self.entries[relative]['canonical'])
+
+    def group(self, paths):
+        """
+        把一组图像按规范文件分组，不在索引中的图像先加入索引
+
+        无法解码的文件（不存在、损坏或不是图像）单独成组，留给推理流程隔离。
+
+        参数:
+            paths (list): 图像路径列表
+
+        返回:
+            dict: 规范文件路径 -> 该组中所有图像的路径列表（包括规范文件本身，如果它在paths中）
+        """
+        from PIL import Image
+
+        groups = {}
+        for path in paths:
+            try:
+                canonical = self.add(path)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                canonical = path
+            groups.setdefault(canonical, []).append(path)
+        return groups
+
+    def save(self, manifest_path):
+        """保存清单"""
+        manifest = {
+            'version': 1,
+            'hash_params': self.hash_params,
+            'entries': self.entries,
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, manifest_path):
+        """
+        加载清单，清单不存在时返回以清单所在目录为基准的空索引
+
+        参数:
+            manifest_path (str): 清单路径
+
+        返回:
+            DedupIndex: 去重索引
+        """
+        root = os.path.dirname(os.path.abspath(manifest_path))
+        if not os.path.exists(manifest_path):
+            return cls(root)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        index = cls(root, **manifest['hash_params'])
+        index.entries = manifest['entries']
+        for relative, entry in index.entries.items():
+            if entry['canonical'] == relative:
+                index.by_key[entry['key']] = relative
+        return index
+
+
+def fan_out(outputs, groups):
+    """
+    把规范文件的结果分发给所有别名
+
+    参数:
+        outputs (dict): 规范文件路径 -> 结果（缺少的规范文件，例如推理时被隔离的，会被跳过）
+        groups (dict): DedupIndex.group的返回值
+
+    返回:
+        dict: 图像路径 -> 结果
+    """
+    results = {}
+    for canonical, paths in groups.items():
+        if canonical in outputs:
+            for path in paths:
+                results[path] = outputs[canonical]
+    return results
@@ -0,0 +1,268 @@
+"""
+确定性审计模块
+
+此模块用于在大批量图像上验证推理的确定性：
+1. 在不同线程数、批次大小和计算后端下运行同一批图像
+2. 每个配置在单独启动的spawn进程中运行（进程不复用），相当于一次进程重启，
+   前一个配置设置的线程数和确定性算法开关不会影响后一个配置
+3. 为每一行输出计算紧凑的哈希值，子进程只通过队列返回哈希，完整输出写入临时文件；
+   只对哈希不一致的行从文件中读取输出并计算最大绝对误差
+4. 报告具体是哪些图像、哪些配置出现了差异
+"""
+
+import hashlib
+import multiprocessing
+import os
+import queue
+import tempfile
+
+import numpy as np
+import torch
+
+# 支持的计算后端
+SUPPORTED_BACKENDS = ['default', 'no_mkldnn', 'deterministic']
+
+# 每行输出哈希的字节数（8字节即64位，足以区分数千张图像的输出）
+HASH_DIGEST_SIZE = 8
+
+
+def hash_rows(output):
+    """
+    为输出张量的每一行计算紧凑哈希
+
+    参数:
+        output (torch.Tensor 或 numpy.ndarray): 形状为(B, C)的模型输出
+
+    返回:
+        list: 长度为B的十六进制哈希字符串列表
+    """
+    if isinstance(output, torch.Tensor):
+        output = output.detach().cpu().numpy()
+    output = np.ascontiguousarray(output)
+    return [hashlib.blake2b(row.tobytes(), digest_size=HASH_DIGEST_SIZE).hexdigest()
+            for row in output]
+
+
+def make_config(num_threads=1, batch_size=1, backend='default', name=None):
+    """
+    创建一个审计配置
+
+    参数:
+        num_threads (int): 推理时使用的intra-op线程数
+        batch_size (int): 每次前向传播的图像数量
+        backend (str): 计算后端，见SUPPORTED_BACKENDS
+        name (str): 配置名称，默认根据参数自动生成
+
+    返回:
+        dict: 配置字典
+
+    异常:
+        ValueError: 当后端不受支持或参数不合法时抛出
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"不支持的后端: {backend}。支持的后端: {SUPPORTED_BACKENDS}")
+    if num_threads < 1 or batch_size < 1:
+        raise ValueError(f"线程数和批次大小必须为正整数: num_threads={num_threads}, batch_size={batch_size}")
+    if name is None:
+        name = f"threads{num_threads}_bs{batch_size}_{backend}"
+    return {'name': name, 'num_threads': num_threads, 'batch_size': batch_size, 'backend': backend}
+
+
+def _load_batch(classifier, inputs, start, stop):
+    """从张量或图像路径列表中取出一个批次"""
+    if isinstance(inputs, torch.Tensor):
+        return inputs[start:stop]
+    return torch.cat([classifier.load_and_preprocess_image(path) for path in inputs[start:stop]], dim=0)
+
+
+def run_config(inputs, config, model_name='resnet18', output_path=None):
+    """
+    在当前进程中按指定配置运行推理
+
+    参数:
+        inputs (torch.Tensor 或 list): 预处理后的张量(N, 3, H, W)，或图像路径列表
+        config (dict): 由make_config创建的配置
+        model_name (str): 模型名称
+        output_path (str): 完整输出的保存路径（.npy）。指定时返回值中只包含output_path而不包含outputs，
+                           适合在子进程中运行时只把哈希传回父进程
+
+    返回:
+        dict: 包含config、hashes（每行哈希）和outputs（numpy数组，形状为(N, C)）的字典；
+              指定output_path时以output_path和pid（运行的进程号）代替outputs
+    """
+    from .inference_runner import ImageClassifier
+
+    torch.set_num_threads(config['num_threads'])
+    if config['backend'] == 'deterministic':
+        torch.use_deterministic_algorithms(True)
+
+    # 不应用机器配置，线程数完全由审计配置决定
+    classifier = ImageClassifier(model_name=model_name, runtime_profile=None)
+    batch_size = config['batch_size']
+    outputs = []
+    with torch.backends.mkldnn.flags(enabled=config['backend'] != 'no_mkldnn'):
+        for start in range(0, len(inputs), batch_size):
+            batch = _load_batch(classifier, inputs, start, start + batch_size)
+            outputs.append(classifier.run_inference(batch).numpy())
+
+    outputs = np.concatenate(outputs, axis=0)
+    if output_path is not None:
+        np.save(output_path, outputs)
+        return {'config': config, 'hashes': hash_rows(outputs), 'output_path': output_path, 'pid': os.getpid()}
+    return {'config': config, 'hashes': hash_rows(outputs), 'outputs': outputs}
+
+
+def _load_outputs(run):
+    """返回运行结果的完整输出，保存在文件中时以内存映射方式打开，只读取用到的行"""
+    if 'outputs' in run:
+        return run['outputs']
+    return np.load(run['output_path'], mmap_mode='r')
+
+
+def _config_worker(inputs, config, model_name, output_path, index, results):
+    """子进程入口：运行一个配置并把只含哈希的结果放入队列"""
+    results.put((index, run_config(inputs, config, model_name, output_path)))
+
+
+def _run_isolated(inputs, configs, model_name, max_workers, output_dir, poll_interval=0.5):
+    """每个配置启动一个新的spawn进程运行，同时运行的进程不超过max_workers个"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    pending = list(enumerate(configs))
+    running = {}
+    runs = [None] * len(configs)
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                index, config = pending.pop(0)
+                output_path = os.path.join(output_dir, f"config_{index}.npy")
+                process = context.Process(target=_config_worker,
+                                          args=(inputs, config, model_name, output_path, index, results),
+                                          daemon=True)
+                process.start()
+                running[index] = process
+            try:
+                index, run = results.get(timeout=poll_interval)
+            except queue.Empty:
+                # 子进程崩溃（例如内存不足）时抛出异常，而不是永远等待
+                crashed = {i: p.exitcode for i, p in running.items() if p.exitcode not in (None, 0)}
+                if crashed:
+                    names = [configs[i]['name'] for i in crashed]
+                    raise RuntimeError(f"审计进程异常退出，配置: {names}，退出码: {list(crashed.values())}")
+                continue
+            runs[index] = run
+            running.pop(index).join()
+    finally:
+        for process in running.values():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    return runs
+
+
+def compare_runs(reference, candidate, image_ids=None):
+    """
+    将一次运行结果与参考结果逐行比较
+
+    只有哈希不一致的行才会计算最大绝对误差。
+
+    参数:
+        reference (dict): 参考运行结果（run_config的返回值）
+        candidate (dict): 待比较的运行结果
+        image_ids (list): 每行对应的图像标识，默认为行号
+
+    返回:
+        dict: 包含config、deterministic、num_diverged、max_abs_diff和diverged（差异行列表）的字典
+    """
+    diverged = []
+    ref_outputs = cand_outputs = None
+    for index, (ref_hash, cand_hash) in enumerate(zip(reference['hashes'], candidate['hashes'])):
+        if ref_hash == cand_hash:
+            continue
+        if ref_outputs is None:
+            ref_outputs, cand_outputs = _load_outputs(reference), _load_outputs(candidate)
+        ref_row = np.asarray(ref_outputs[index])
+        cand_row = np.asarray(cand_outputs[index])
+        diverged.append({
+            'index': index,
+            'image': image_ids[index] if image_ids is not None else index,
+            'max_abs_diff': float(np.abs(ref_row - cand_row).max()),
+            'top1_reference': int(ref_row.argmax()),
+            'top1': int(cand_row.argmax()),
+        })
+
+    return {
+        'config': candidate['config'],
+        'deterministic': not diverged,
+        'num_diverged': len(diverged),
+        'max_abs_diff': max((row['max_abs_diff'] for row in diverged), default=0.0),
+        'diverged': diverged,
+    }
+
+
+def audit_determinism(inputs, configs, model_name='resnet18', max_workers=None):
+    """
+    在多个配置下并行运行同一批输入，并报告不一致的图像和配置
+
+    每个配置在单独启动的spawn进程中运行（进程不复用，各自重新加载模型），第一个配置作为参考。
+    同一配置出现多次时，即相当于验证进程重启后的确定性。
+
+    参数:
+        inputs (torch.Tensor 或 list): 预处理后的张量(N, 3, H, W)，或图像路径列表
+        configs (list): 配置列表，至少包含一个配置
+        model_name (str): 模型名称
+        max_workers (int): 并行进程数，默认为min(配置数, CPU核心数)
+
+    返回:
+        dict: 包含以下键的字典
+            - num_images: 图像数量
+            - reference: 参考配置
+            - reference_hashes: 参考配置下每行输出的哈希
+            - deterministic: 所有配置是否都与参考结果逐位一致
+            - results: 每个非参考配置的比较结果（见compare_runs）
+    """
+    if not configs:
+        raise ValueError("至少需要提供一个审计配置")
+
+    if max_workers is None:
+        max_workers = min(len(configs), os.cpu_count() or 1)
+
+    image_ids = None if isinstance(inputs, torch.Tensor) else list(inputs)
+
+    # 每个配置一个全新的spawn进程，完整输出只写入临时文件，比较结束后删除
+    with tempfile.TemporaryDirectory(prefix='determinism_') as output_dir:
+        runs = _run_isolated(inputs, configs, model_name, max_workers, output_dir)
+        reference = runs[0]
+        results = [compare_runs(reference, run, image_ids) for run in runs[1:]]
+
+    return {
+        'num_images': len(inputs),
+        'reference': reference['config'],
+        'reference_hashes': reference['hashes'],
+        'deterministic': all(result['deterministic'] for result in results),
+        'results': results,
+    }
+
+
+def format_report(report):
+    """
+    将审计结果格式化为可读文本
+
+    参数:
+        report (dict): audit_determinism的返回值
+
+    返回:
+        str: 报告文本
+    """
+    lines = [
+        f"图像数量: {report['num_images']}",
+        f"参考配置: {report['reference']['name']}",
+        f"总体结论: {'确定性通过' if report['deterministic'] else '存在不一致'}",
+    ]
+    for result in report['results']:
+        status = "一致" if result['deterministic'] else f"{result['num_diverged']}张图像不一致"
+        lines.append(f"- {result['config']['name']}: {status}，最大绝对误差 {result['max_abs_diff']:.3e}")
+        for row in result['diverged']:
+            lines.append(f"    图像 {row['image']}: 最大绝对误差 {row['max_abs_diff']:.3e}，"
+                         f"top-1 {row['top1_reference']} -> {row['top1']}")
+    return "\n".join(lines)
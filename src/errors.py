@@ -0,0 +1,23 @@
+"""
+图像加载相关的异常类型
+"""
+
+
+class ImageLoadError(Exception):
+    """图像加载或预处理失败的基类"""
+
+
+class ImageTooLargeError(ImageLoadError):
+    """图像像素数超出允许的预算，且无法在解码时缩小"""
+
+
+class UnsupportedImageFormatError(ImageLoadError):
+    """文件不是受支持的图像格式（例如文本文件）"""
+
+
+class CorruptImageError(ImageLoadError):
+    """文件头或图像数据损坏，无法解码"""
+
+
+class DecodeTimeoutError(ImageLoadError):
+    """图像解码耗时超出限制"""
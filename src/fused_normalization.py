@@ -0,0 +1,108 @@
+"""
+输入标准化融合模块
+
+此模块把 (x / 255 - mean) / std 的标准化融合进模型的第一个卷积层，使模型可以直接接收uint8像素：
+1. 卷积是线性运算，conv(pad0((x/255 - m)/s), W) = conv(pad0(x), W/(255·s)) - conv(pad0(m/s), W)
+2. 第一项只需把权重按输入通道缩放为 W/(255·s)
+3. 第二项是一个与输入内容无关的偏置图。由于零填充发生在标准化之后，
+   图像边缘处被填充的位置不参与减均值，偏置图在边缘与内部不同，因此按输入尺寸预先计算并缓存，
+   而不是使用一个逐通道的常数偏置，这样融合后的结果与先标准化再卷积完全一致（仅有浮点舍入误差）
+4. 缩放后的权重和偏置图由当前的权重派生：每次前向传播检查权重和偏置的版本号（原地修改、
+   load_state_dict都会增加版本号）、存储和设备，变化后重新计算，不会使用过期的融合参数
+
+融合后的卷积层仍然接受标准化后的float输入（走原来的卷积），因此对抗攻击、显著性图等功能不受影响。
+"""
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class FusedNormalizationConv2d(nn.Conv2d):
+    """
+    融合了输入标准化的卷积层
+
+    输入为uint8张量时按融合后的权重和偏置图计算，其他类型的输入按原卷积计算。
+    参数名与原卷积层相同，缩放后的权重和偏置图不写入state_dict，不影响模型指纹。
+    通过.data绕过自动求导直接修改权重不会增加版本号，此时需要调用invalidate()。
+    """
+
+    def __init__(self, conv, mean, std):
+        """
+        参数:
+            conv (nn.Conv2d): 模型原来的第一个卷积层，其权重会被共享
+            mean (torch.Tensor): 标准化均值，形状为(1, 3, 1, 1)
+            std (torch.Tensor): 标准化标准差，形状为(1, 3, 1, 1)
+        """
+        super().__init__(conv.in_channels, conv.out_channels, conv.kernel_size, stride=conv.stride,
+                         padding=conv.padding, dilation=conv.dilation, groups=conv.groups,
+                         bias=conv.bias is not None, padding_mode=conv.padding_mode)
+        if conv.padding_mode != 'zeros' or conv.groups != 1:
+            raise ValueError("只支持零填充、groups为1的卷积层")
+        self.weight = conv.weight
+        self.bias = conv.bias
+        self.register_buffer('pixel_scale', 1 / (255 * std.view(1, -1, 1, 1)), persistent=False)
+        self.register_buffer('normalized_mean', (mean / std).view(1, -1, 1, 1), persistent=False)
+        self.invalidate()
+
+    def invalidate(self):
+        """丢弃缩放后的权重和偏置图，下一次uint8前向传播时按当前权重重新计算"""
+        self.pixel_weight = None
+        self._bias_maps = {}
+        self._signature = None
+
+    def _parameters_signature(self):
+        """描述当前权重和偏置的版本、存储和设备，任何一项变化都意味着融合参数已经过期"""
+        return tuple(
+            None if param is None else (param.data_ptr(), param._version, param.device, param.dtype)
+            for param in (self.weight, self.bias)
+        )
+
+    def _refresh(self):
+        """权重或偏置变化后重新计算缩放后的权重，并清空偏置图缓存"""
+        signature = self._parameters_signature()
+        if signature != self._signature:
+            with torch.no_grad():
+                self.pixel_weight = self.weight * self.pixel_scale.to(self.weight.dtype)
+            self._bias_maps = {}
+            self._signature = signature
+
+    def _bias_map(self, height, width, dtype):
+        """按输入尺寸计算并缓存偏置图：-conv(零填充的常数图像mean/std, W)（加上原卷积的偏置）"""
+        self._refresh()
+        key = (height, width, dtype)
+        if key not in self._bias_maps:
+            with torch.no_grad():
+                constant = self.normalized_mean.expand(1, -1, height, width).to(dtype)
+                bias_map = -F.conv2d(constant, self.weight.to(dtype), None, self.stride, self.padding, self.dilation)
+                if self.bias is not None:
+                    bias_map = bias_map + self.bias.to(dtype).view(1, -1, 1, 1)
+            self._bias_maps[key] = bias_map
+        return self._bias_maps[key]
+
+    def forward(self, x):
+        if x.dtype != torch.uint8:
+            return super().forward(x)
+        self._refresh()
+        pixels = x.to(self.pixel_weight.dtype)
+        output = F.conv2d(pixels, self.pixel_weight, None, self.stride, self.padding, self.dilation)
+        return output.add_(self._bias_map(x.shape[2], x.shape[3], output.dtype))
+
+
+def fuse_input_normalization(model, mean, std, layer_name='conv1'):
+    """
+    把输入标准化融合进模型的第一个卷积层，使模型可以直接接收uint8像素
+
+    参数:
+        model (nn.Module): 模型，layer_name对应的卷积层会被替换
+        mean (torch.Tensor): 标准化均值，形状为(1, 3, 1, 1)
+        std (torch.Tensor): 标准化标准差，形状为(1, 3, 1, 1)
+        layer_name (str): 第一个卷积层的属性名
+
+    返回:
+        nn.Module: 修改后的模型（原地修改）
+    """
+    conv = getattr(model, layer_name)
+    if not isinstance(conv, FusedNormalizationConv2d):
+        setattr(model, layer_name, FusedNormalizationConv2d(conv, mean, std))
+    return model
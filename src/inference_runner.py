@@ -5,15 +5,118 @@
 1. 加载预训练的ResNet-18模型
 2. 加载和预处理图像
 3. 运行模型推理
+4. 生成对抗样本并评估对抗鲁棒性
 """
 
 import torch
-import torchvision.models as models
-import torchvision.transforms as transforms
-from PIL import Image
 import os
+import hashlib
+import itertools
+import math
+import threading
+import warnings
 import datetime
 
+from .adversarial import generate_adversarial, evaluate_robustness
+from .saliency import occlusion_sensitivity, grad_cam
+from .tta import crop_views, num_views, reduce_views
+from .runtime_profile import load_profile, apply_profile
+from .fused_normalization import fuse_input_normalization
+from .logit_cache import LogitCache, cached_forward, backend_signature, DEFAULT_CAPACITY as DEFAULT_CACHE_CAPACITY
+from .errors import ImageLoadError, ImageTooLargeError, UnsupportedImageFormatError, CorruptImageError
+
+# ImageNet数据集的均值和标准差，用于图像标准化
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# 默认的像素预算（约6000x6000），超出预算的图像会在解码时缩小，以限制内存占用
+DEFAULT_MAX_PIXELS = 36_000_000
+
+# 预处理时短边缩放到的尺寸
+RESIZE_SIZE = 256
+
+# 支持的模型
+SUPPORTED_MODELS = ['resnet18']
+
+# 保护各分类器解码统计信息的锁。BatchRunner等在多个线程中解码时会并发更新统计；
+# 使用模块级的锁而不是实例属性，分类器仍然可以被深拷贝
+_STATS_LOCK = threading.Lock()
+
+# 支持的预处理模式：'float'输出标准化后的float32张量，'uint8'输出未标准化的uint8像素张量
+SUPPORTED_PREPROCESSING = ['float', 'uint8']
+
+def check_pixel_budget(max_pixels):
+    """
+    检查像素预算是否为正数
+
+    返回:
+        像素预算本身
+
+    异常:
+        ValueError: 当像素预算不是正数时抛出
+    """
+    if max_pixels is None or not max_pixels > 0:
+        raise ValueError(f"像素预算必须为正数，而不是{max_pixels!r}")
+    return max_pixels
+
+
+def open_image_within_budget(image_path, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    在像素预算内打开图像并转换为RGB格式
+    
+    先只读取文件头获取图像尺寸；像素数超出预算时，利用解码器的缩小功能
+    （JPEG的DCT缩放）直接解码出短边不小于256的低分辨率图像，
+    不会生成全分辨率的缓冲区。无法在解码时缩小的格式超出预算时直接拒绝。
+    此函数不依赖模型，可以在解码工作进程中单独使用。
+    
+    参数:
+        image_path (str): 图像文件的路径
+        max_pixels (int): 像素预算
+    
+    返回:
+        tuple: (RGB格式的PIL图像, 包含path、original_size、decoded_size、decoded_bytes和reduced的字典)
+    
+    异常:
+        ValueError: 当像素预算不是正数时抛出
+        ImageTooLargeError: 当图像超出像素预算且无法在解码时缩小时抛出
+    """
+    from PIL import Image
+    
+    check_pixel_budget(max_pixels)
+    # 像素预算由本函数负责检查，屏蔽PIL的解压炸弹警告；超出PIL硬上限时仍会抛出异常
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            image = Image.open(image_path)
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeError(f"图像'{image_path}'像素数过多: {str(e)}")
+    
+    original_size = image.size
+    reduced = False
+    if original_size[0] * original_size[1] > max_pixels:
+        # 请求短边不小于RESIZE_SIZE的尺寸，解码器会选择满足要求的最大缩小比例
+        scale = RESIZE_SIZE / min(original_size)
+        requested = (math.ceil(original_size[0] * scale), math.ceil(original_size[1] * scale))
+        reduced = image.draft('RGB', requested) is not None
+        if image.size[0] * image.size[1] > max_pixels:
+            image.close()
+            raise ImageTooLargeError(
+                f"图像'{image_path}'尺寸为{original_size[0]}x{original_size[1]}，"
+                f"超出像素预算{max_pixels}，且该格式无法在解码时缩小"
+            )
+    
+    image = image.convert('RGB')
+    
+    # 解码缓冲区大小（RGB每像素3字节）
+    info = {
+        'path': image_path,
+        'original_size': original_size,
+        'decoded_size': image.size,
+        'decoded_bytes': image.size[0] * image.size[1] * 3,
+        'reduced': reduced,
+    }
+    return image, info
+
 class ImageClassifier:
     """
     图像分类器类
@@ -22,21 +125,62 @@ class ImageClassifier:
     默认使用在ImageNet上预训练的ResNet-18模型。
     """
     
-    def __init__(self, model_name='resnet18'):
+    def __init__(self, model_name='resnet18', runtime_profile=None, profile_objective='throughput',
+                 max_pixels=DEFAULT_MAX_PIXELS, preprocessing='float'):
         """
         初始化图像分类器，加载预训练模型
         
         参数:
             model_name (str): 模型名称，默认为'resnet18'
                               目前支持的选项: 'resnet18'
+            runtime_profile: 机器配置（线程数、批次大小等），默认不应用。应用时会修改进程全局的
+                             PyTorch线程设置，BatchRunner和SharedMemoryRunner默认使用其中的批次大小。可选值:
+                             None - 不应用机器配置，保持PyTorch默认设置（默认）
+                             'auto' - 加载本机的机器配置文件（如果存在）
+                             str - 从指定路径加载机器配置文件（文件不存在时抛出FileNotFoundError，
+                                   无法解析或不是在本机生成时发出警告并忽略）
+                             dict - 直接使用给定的机器配置
+            profile_objective (str): 应用机器配置中的哪个最佳配置，'throughput'或'latency'
+            max_pixels (int): 解码图像的像素预算，超出时在解码阶段缩小图像
+            preprocessing (str): 预处理模式，'float'（默认）或'uint8'。
+                                 'uint8'模式下图像在缩放和裁剪后保持uint8，标准化融合在模型的第一个卷积层中，
+                                 预处理后的张量只有float32的四分之一大小
         
         异常:
-            ValueError: 当提供的模型名称不受支持时抛出
+            ValueError: 当提供的模型名称或预处理模式不受支持，或像素预算不是正数时抛出
+            FileNotFoundError: 当指定的机器配置文件不存在时抛出
         """
-        # 检查模型名称是否支持
-        supported_models = ['resnet18']
-        if model_name not in supported_models:
-            raise ValueError(f"不支持的模型: {model_name}。支持的模型: {supported_models}")
+        # 检查模型名称是否支持，在应用机器配置等有副作用的操作之前完成
+        if model_name not in SUPPORTED_MODELS:
+            raise ValueError(f"不支持的模型: {model_name}。支持的模型: {SUPPORTED_MODELS}")
+        if preprocessing not in SUPPORTED_PREPROCESSING:
+            raise ValueError(f"不支持的预处理模式: {preprocessing}。支持的模式: {SUPPORTED_PREPROCESSING}")
+        self.preprocessing = preprocessing
+        
+        # 加载并应用机器配置（线程数等），需要在模型推理开始之前完成
+        if runtime_profile == 'auto':
+            runtime_profile = load_profile()
+        elif isinstance(runtime_profile, str):
+            profile_path = runtime_profile
+            if not os.path.exists(profile_path):
+                raise FileNotFoundError(f"机器配置文件不存在: {profile_path}")
+            runtime_profile = load_profile(profile_path)
+            if runtime_profile is None:
+                warnings.warn(f"机器配置文件无法解析或不是在本机生成，已忽略: {profile_path}")
+        self.runtime_config = apply_profile(runtime_profile, profile_objective) if runtime_profile else None
+        
+        # 图像加载的像素预算和内存统计
+        self.max_pixels = check_pixel_budget(max_pixels)
+        self.stats = {
+            'images_loaded': 0,
+            'images_reduced': 0,
+            'peak_decoded_bytes': 0,
+            'last_image': None,
+        }
+        
+        # torchvision较重，在创建分类器时才导入，使只导入本模块的命令行工具保持快速启动
+        import torchvision.models as models
+        import torchvision.transforms as transforms
         
         # 根据模型名称加载预训练模型
         if model_name == 'resnet18':
@@ -44,54 +188,195 @@ class ImageClassifier:
             # pretrained=True表示使用在ImageNet上预训练的权重
             self.model = models.resnet18(pretrained=True)
         
+        # 模型名称和权重指纹（调用model_fingerprint时计算，权重变化后重新计算）
+        self.model_name = model_name
+        self._fingerprint = None
+        self._fingerprint_signature = None
+        
+        # logits缓存，默认关闭（见enable_cache）
+        self.cache = None
+        
         # 将模型设置为评估模式，关闭Dropout等训练特有的层
         self.model.eval()
         
+        # 冻结模型参数：推理和对抗攻击都只需要对输入求梯度
+        self.model.requires_grad_(False)
+        
+        # 标准化参数，形状为(1, 3, 1, 1)，便于在像素空间和标准化空间之间转换
+        self.mean = torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)
+        self.std = torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+        
+        # 将标准化融合进第一个卷积层，模型可以直接接收uint8像素（float输入的计算不变）
+        fuse_input_normalization(self.model, self.mean, self.std)
+        
         # 定义图像预处理流程
         # 这些预处理步骤与模型训练时使用的步骤需要一致
-        self.preprocess = transforms.Compose([
-            transforms.Resize(256),              # 将图像缩放到256x256
-            transforms.CenterCrop(224),          # 中心裁剪到224x224
-            transforms.ToTensor(),               # 转换为张量，并将像素值从[0,255]转换到[0,1]
-            transforms.Normalize(                # 标准化，使用ImageNet数据集的均值和标准差
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
+        if preprocessing == 'uint8':
+            self.preprocess = transforms.Compose([
+                transforms.Resize(RESIZE_SIZE),  # 将图像短边缩放到256
+                transforms.CenterCrop(224),      # 中心裁剪到224x224
+                transforms.PILToTensor(),        # 转换为uint8张量，标准化在模型的第一个卷积层中完成
+            ])
+        else:
+            self.preprocess = transforms.Compose([
+                transforms.Resize(RESIZE_SIZE),      # 将图像短边缩放到256
+                transforms.CenterCrop(224),          # 中心裁剪到224x224
+                transforms.ToTensor(),               # 转换为张量，并将像素值从[0,255]转换到[0,1]
+                transforms.Normalize(                # 标准化，使用ImageNet数据集的均值和标准差
+                    mean=IMAGENET_MEAN,
+                    std=IMAGENET_STD
+                )
+            ])
+        
+        # 缩放和裁剪之后的张量转换步骤，测试时增强在自己生成的裁剪视图上使用
+        self.to_tensor = transforms.Compose(self.preprocess.transforms[2:])
+    
+    def open_image(self, image_path, max_pixels=None):
+        """
+        在像素预算内打开图像并转换为RGB格式，并记录解码统计信息（线程安全）
+        
+        参数:
+            image_path (str): 图像文件的路径
+            max_pixels (int): 像素预算，默认为self.max_pixels
+        
+        返回:
+            PIL.Image.Image: RGB格式的图像
+        
+        异常:
+            ImageTooLargeError: 当图像超出像素预算且无法在解码时缩小时抛出
+        """
+        image, info = open_image_within_budget(image_path, self.max_pixels if max_pixels is None else max_pixels)
+        
+        with _STATS_LOCK:
+            self.stats['images_loaded'] += 1
+            self.stats['images_reduced'] += int(info['reduced'])
+            self.stats['peak_decoded_bytes'] = max(self.stats['peak_decoded_bytes'], info['decoded_bytes'])
+            self.stats['last_image'] = info
+        return image
     
-    def load_and_preprocess_image(self, image_path):
+    def get_stats(self):
+        """
+        获取分类器的统计信息
+        
+        返回:
+            dict: 包含images_loaded（加载数量）、images_reduced（解码时缩小的数量）、
+                  peak_decoded_bytes（最大解码缓冲区字节数）、last_image（最近一张图像的信息）
+                  和logit_cache（logits缓存的命中统计，未启用缓存时为None）
+        """
+        with _STATS_LOCK:
+            stats = dict(self.stats)
+        if stats['last_image'] is not None:
+            stats['last_image'] = dict(stats['last_image'])
+        stats['logit_cache'] = self.cache.get_stats() if self.cache is not None else None
+        return stats
+    
+    def enable_cache(self, capacity=DEFAULT_CACHE_CAPACITY, path=None, journal_mode='WAL'):
+        """
+        启用logits缓存，相同的输入张量在之后的run_inference中不再重复前向传播
+        
+        缓存键包含模型权重指纹和计算后端；原地修改权重或load_state_dict后指纹随之改变，旧结果不会命中。
+        
+        参数:
+            capacity (int): 内存LRU最多保存的条目数
+            path (str): 磁盘SQLite存储的路径，为None时只使用内存
+            journal_mode (str): 磁盘存储的SQLite日志模式，多台主机通过网络文件系统共享时使用'DELETE'
+        
+        返回:
+            LogitCache: 启用的缓存
+        """
+        self.disable_cache()
+        self.cache = LogitCache(capacity=capacity, path=path, journal_mode=journal_mode)
+        return self.cache
+    
+    def disable_cache(self):
+        """关闭logits缓存"""
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+    
+    def load_and_preprocess_image(self, image_path, max_pixels=None):
         """
         加载图像并应用预处理
         
         参数:
             image_path (str): 图像文件的路径
-            
+            max_pixels (int): 像素预算，默认为self.max_pixels
+        
         返回:
-            torch.Tensor: 预处理后的图像张量，形状为(1, 3, 224, 224)
-            
+            torch.Tensor: 预处理后的图像张量，形状为(1, 3, 224, 224)；
+                          'float'模式下为标准化后的float32张量，'uint8'模式下为uint8像素张量
+        
         异常:
             FileNotFoundError: 当图像文件不存在时抛出
-            各种PIL异常: 当图像文件格式不支持或损坏时抛出
+            ImageTooLargeError: 当图像超出像素预算且无法在解码时缩小时抛出
+            UnsupportedImageFormatError: 当文件不是受支持的图像格式时抛出
+            CorruptImageError: 当图像文件损坏或预处理失败时抛出
         """
+        # 添加批次维度，将形状从(3, 224, 224)变为(1, 3, 224, 224)
+        # 模型期望的输入是一个批次的图像
+        return self._load_image(image_path, max_pixels, lambda image: self.preprocess(image).unsqueeze(0))
+    
+    def load_tta_views(self, image_path, mode='ten_crop', scales=(1.0,), max_pixels=None, as_list=False):
+        """
+        加载图像并生成测试时增强的视图
+        
+        参数:
+            image_path (str): 图像文件的路径
+            mode (str): 视图模式，'center'、'flip'、'five_crop'或'ten_crop'
+            scales (tuple): 尺度，每个尺度把图像短边缩放到round(256 × scale)后生成裁剪视图
+            max_pixels (int): 像素预算，默认为self.max_pixels
+            as_list (bool): 为True时返回视图列表（大多是不复制数据的切片），便于与其他图像的视图一起拼接
+        
+        返回:
+            torch.Tensor: 形状为(V, 3, 224, 224)的视图张量，V = num_views(mode, scales)
+        
+        异常:
+            ValueError: 当视图模式不受支持或尺度过小（短边小于224）时抛出
+            其他异常与load_and_preprocess_image相同
+        """
+        import torchvision.transforms as transforms
+        
+        # 在加载图像之前检查参数，避免参数错误被当作图像损坏
+        num_views(mode, scales)
+        sizes = [int(round(RESIZE_SIZE * scale)) for scale in scales]
+        if min(sizes) < 224:
+            raise ValueError(f"尺度过小: {scales}，缩放后的短边必须不小于224")
+        
+        def make_views(image):
+            views = []
+            for size in sizes:
+                resized = self.to_tensor(transforms.Resize(size)(image))
+                views += crop_views(resized, mode)
+            return views
+        
+        views = self._load_image(image_path, max_pixels, make_views)
+        return views if as_list else torch.stack(views)
+    
+    def _load_image(self, image_path, max_pixels, transform):
+        """在像素预算内打开图像并应用transform，把各种失败统一转换为ImageLoadError的子类"""
         # 检查文件是否存在
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"图像文件不存在: {image_path}")
         
+        from PIL import UnidentifiedImageError
+        
+        # 无效的像素预算是调用方的错误，不应被当作图像损坏
+        if max_pixels is not None:
+            check_pixel_budget(max_pixels)
+        
         try:
-            # 打开图像并确保是RGB格式
-            image = Image.open(image_path).convert('RGB')
+            # 在像素预算内打开图像并确保是RGB格式
+            image = self.open_image(image_path, max_pixels=max_pixels)
             
             # 应用预处理流程
-            input_tensor = self.preprocess(image)
-            
-            # 添加批次维度，将形状从(3, 224, 224)变为(1, 3, 224, 224)
-            # 模型期望的输入是一个批次的图像
-            input_batch = input_tensor.unsqueeze(0)
-            
-            return input_batch
+            return transform(image)
+        except ImageLoadError:
+            raise
+        except UnidentifiedImageError as e:
+            raise UnsupportedImageFormatError(f"无法识别图像'{image_path}'的格式: {str(e)}")
         except Exception as e:
             # 重新抛出异常，添加更多上下文信息
-            raise Exception(f"处理图像'{image_path}'时发生错误: {str(e)}")
+            raise CorruptImageError(f"处理图像'{image_path}'时发生错误: {str(e)}")
     
     def run_inference(self, input_tensor):
         """
@@ -99,26 +384,27 @@ class ImageClassifier:
         
         参数:
             input_tensor (torch.Tensor): 输入图像张量，形状为(B, 3, 224, 224)，
-                                         其中B是批次大小，通常为1
-            
+                                         其中B是批次大小，通常为1。可以是标准化后的float张量，
+                                         也可以是uint8像素张量（标准化在第一个卷积层中完成）。
+                                         启用缓存（见enable_cache）时只对未命中的行做前向传播
+        
         返回:
             torch.Tensor: 模型输出，形状为(B, 1000)，表示ImageNet 1000个类别的预测分数
-            
+        
         异常:
             RuntimeError: 当输入张量形状不正确或推理过程中出现错误时抛出
         """
-        # 检查输入张量的格式
-        if not isinstance(input_tensor, torch.Tensor):
-            raise TypeError(f"输入必须是PyTorch张量，而不是{type(input_tensor)}")
-        
-        # 检查输入张量的形状
-        if len(input_tensor.shape) != 4 or input_tensor.shape[1] != 3:
-            raise ValueError(f"输入张量形状错误: {input_tensor.shape}，预期形状应为(B, 3, H, W)")
+        # 检查输入张量的格式和形状
+        self._check_input_tensor(input_tensor)
         
         try:
             # 使用torch.no_grad()包裹推理代码，告诉PyTorch不需要计算梯度
             # 这可以减少内存使用并加速推理
             with torch.no_grad():
+                if self.cache is not None:
+                    # 只对缓存未命中的行做前向传播
+                    namespace = f"{self.model_fingerprint()}|{backend_signature()}"
+                    return cached_forward(self.cache, self.model, input_tensor, namespace)
                 output = self.model(input_tensor)
             
             return output
@@ -126,6 +412,140 @@ class ImageClassifier:
             # 重新抛出异常，添加更多上下文信息
             raise RuntimeError(f"模型推理过程中发生错误: {str(e)}")
     
+    def run_tta(self, image_paths, mode='ten_crop', scales=(1.0,), reduction='mean'):
+        """
+        对一批图像运行测试时增强推理
+        
+        所有图像的所有视图拼接成一个张量，只做一次前向传播，再在张量上合并各视图的输出。
+        
+        参数:
+            image_paths (list): 图像路径列表
+            mode (str): 视图模式，'center'、'flip'、'five_crop'或'ten_crop'
+            scales (tuple): 尺度，例如(0.875, 1.0, 1.125)
+            reduction (str): 'mean'（平均logits）或'vote'（top-1票数比例）
+        
+        返回:
+            torch.Tensor: 形状为(B, 1000)的合并结果
+        """
+        views = []
+        for path in image_paths:
+            views += self.load_tta_views(path, mode=mode, scales=scales, as_list=True)
+        return reduce_views(self.run_inference(torch.stack(views)), num_views(mode, scales), reduction)
+    
+    def normalize(self, input_tensor):
+        """
+        将uint8像素张量转换为标准化后的float32张量，其他输入原样返回
+        
+        对抗攻击和显著性图需要在标准化空间中对输入求梯度，使用前先调用本方法。
+        """
+        if input_tensor.dtype != torch.uint8:
+            return input_tensor
+        return input_tensor.float().div_(255).sub_(self.mean).div_(self.std)
+    
+    def _check_input_tensor(self, input_tensor):
+        """检查输入张量的类型和形状"""
+        if not isinstance(input_tensor, torch.Tensor):
+            raise TypeError(f"输入必须是PyTorch张量，而不是{type(input_tensor)}")
+        if len(input_tensor.shape) != 4 or input_tensor.shape[1] != 3:
+            raise ValueError(f"输入张量形状错误: {input_tensor.shape}，预期形状应为(B, 3, H, W)")
+    
+    def _resolve_labels(self, input_tensor, labels, chunk_size):
+        """未提供标签时，使用模型在干净样本上的预测作为标签"""
+        if labels is not None:
+            return torch.as_tensor(labels, dtype=torch.long)
+        predictions = []
+        for start in range(0, input_tensor.shape[0], chunk_size):
+            output = self.run_inference(input_tensor[start:start + chunk_size])
+            predictions.append(output.argmax(dim=1))
+        return torch.cat(predictions)
+    
+    def generate_adversarial_examples(self, input_tensor, labels=None, method='fgsm', norm='linf',
+                                      epsilon=8 / 255, steps=10, step_size=None,
+                                      random_start=True, chunk_size=32, generator=None):
+        """
+        批量生成对抗样本
+        
+        参数:
+            input_tensor (torch.Tensor): 预处理后的图像张量，形状为(B, 3, 224, 224)
+            labels (torch.Tensor): 标签，形状为(B,)；为None时使用模型对干净样本的预测
+            method (str): 攻击方法，'fgsm'或'pgd'
+            norm (str): 扰动范数，'linf'或'l2'
+            epsilon (float): 像素空间（[0, 1]区间）中的扰动预算
+            steps (int): PGD迭代次数
+            step_size (float): PGD步长，默认为2.5 * epsilon / steps
+            random_start (bool): PGD是否随机初始化
+            chunk_size (int): 每次前向/反向传播的图像数量，用于限制内存占用
+            generator (torch.Generator): 随机数生成器，用于复现PGD随机初始化
+        
+        返回:
+            torch.Tensor: 预处理空间中的对抗样本，形状与input_tensor相同
+        """
+        self._check_input_tensor(input_tensor)
+        input_tensor = self.normalize(input_tensor)
+        labels = self._resolve_labels(input_tensor, labels, chunk_size)
+        return generate_adversarial(
+            self.model, input_tensor, labels, self.mean, self.std,
+            method=method, norm=norm, epsilon=epsilon, step_size=step_size, steps=steps,
+            random_start=random_start, chunk_size=chunk_size, generator=generator
+        )
+    
+    def evaluate_adversarial_robustness(self, input_tensor, labels=None, chunk_size=32, **attack_kwargs):
+        """
+        评估模型在对抗扰动下的鲁棒准确率
+        
+        参数:
+            input_tensor (torch.Tensor): 预处理后的图像张量，形状为(B, 3, 224, 224)
+            labels (torch.Tensor): 标签，形状为(B,)；为None时使用模型对干净样本的预测，
+                                   此时干净准确率恒为1，鲁棒准确率即预测保持不变的比例
+            chunk_size (int): 分块大小
+            **attack_kwargs: 攻击参数，见generate_adversarial_examples
+        
+        返回:
+            dict: 包含num_samples、clean_accuracy、robust_accuracy、attack_success_rate、
+                  clean_predictions和adversarial_predictions的字典
+        """
+        self._check_input_tensor(input_tensor)
+        input_tensor = self.normalize(input_tensor)
+        labels = self._resolve_labels(input_tensor, labels, chunk_size)
+        return evaluate_robustness(
+            self.model, input_tensor, labels, self.mean, self.std,
+            chunk_size=chunk_size, **attack_kwargs
+        )
+    
+    def occlusion_sensitivity(self, input_tensor, target=None, window=32, stride=16, batch_size=64):
+        """
+        计算遮挡敏感度图，所有遮挡位置按batch_size分块批量推理
+        
+        参数:
+            input_tensor (torch.Tensor): 预处理后的图像张量，形状为(1, 3, 224, 224)
+            target (int): 目标类别，默认为模型对原图的top-1预测
+            window (int): 遮挡窗口边长（像素）
+            stride (int): 窗口滑动步长（像素）
+            batch_size (int): 每次前向传播的遮挡图像数量
+        
+        返回:
+            tuple: (形状为(224, 224)的敏感度图, 目标类别)
+        """
+        self._check_input_tensor(input_tensor)
+        input_tensor = self.normalize(input_tensor)
+        return occlusion_sensitivity(self.model, input_tensor, target=target, window=window,
+                                     stride=stride, batch_size=batch_size)
+    
+    def grad_cam(self, input_tensor, target=None):
+        """
+        在模型最后一个卷积块(layer4)上计算Grad-CAM类别激活图
+        
+        参数:
+            input_tensor (torch.Tensor): 预处理后的图像张量，形状为(B, 3, 224, 224)
+            target (int 或 torch.Tensor): 目标类别，默认为每张图像的top-1预测
+        
+        返回:
+            tuple: (形状为(B, 224, 224)、取值在[0, 1]之间的激活图, 形状为(B,)的目标类别张量)
+        """
+        self._check_input_tensor(input_tensor)
+        input_tensor = self.normalize(input_tensor)
+        return grad_cam(self.model, self.model.layer4, input_tensor, target=target)
+    
     def get_top_predictions(self, output, top_k=5, class_names=None):
         """
         获取前K个预测结果
@@ -134,7 +554,7 @@ class ImageClassifier:
             output (torch.Tensor): 模型输出，形状为(1, 1000)
             top_k (int): 返回的预测数量，默认为5
             class_names (list): 类别名称列表，默认为None
-            
+        
         返回:
             list: 包含(类别索引, 概率, 类别名称)元组的列表
         """
@@ -161,7 +581,34 @@ class ImageClassifier:
             results.append((idx, prob * 100, name))
         
         return results
+    
+    def model_fingerprint(self):
+        """
+        计算模型权重的指纹，用于区分不同的模型或权重版本
+        
+        指纹覆盖模型的所有参数和缓冲区（包括BatchNorm的统计量）。计算结果按各张量的存储和版本号缓存，
+        原地修改、load_state_dict或移动设备后重新计算；通过.data直接修改权重不会增加版本号，
+        此时需要先调用invalidate_fingerprint()。
         
+        返回:
+            str: 十六进制指纹字符串，形如'resnet18-<16位哈希>'
+        """
+        signature = tuple((tensor.data_ptr(), tensor._version, tensor.device)
+                          for tensor in itertools.chain(self.model.parameters(), self.model.buffers()))
+        if self._fingerprint is None or signature != self._fingerprint_signature:
+            digest = hashlib.blake2b(digest_size=8)
+            for name, tensor in self.model.state_dict().items():
+                tensor = tensor.detach().cpu().contiguous()
+                digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode('utf-8'))
+                digest.update(tensor.numpy().tobytes())
+            self._fingerprint = f"{self.model_name}-{digest.hexdigest()}"
+            self._fingerprint_signature = signature
+        return self._fingerprint
+    
+    def invalidate_fingerprint(self):
+        """丢弃缓存的权重指纹，下一次调用model_fingerprint时重新计算"""
+        self._fingerprint = None
+    
     def get_timestamp(self):
         """
         获取当前时间戳字符串
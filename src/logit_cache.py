@@ -0,0 +1,215 @@
+"""
+模型输出（logits）缓存模块
+
+此模块为ImageClassifier.run_inference提供两级缓存，相同的预处理张量只需做一次前向传播：
+1. 键 - 对输入张量的每一行（一张图像）计算哈希，哈希覆盖张量的dtype、形状和全部字节，
+   再加上命名空间：模型权重指纹（ImageClassifier.model_fingerprint）和计算后端
+   （PyTorch版本、MKLDNN开关、确定性算法开关）。指纹按各参数和缓冲区的版本号重新计算，
+   原地修改权重、load_state_dict或后端变化后旧结果不会命中
+2. 第一级 - 进程内的LRU（OrderedDict），容量固定
+3. 第二级 - 可选的磁盘SQLite存储（WITHOUT ROWID，按键聚簇），跨进程、跨运行复用；
+   从磁盘命中的结果同时放入内存LRU。默认的WAL日志模式只适用于同一台主机上的进程，
+   多台主机通过网络文件系统共享存储时使用journal_mode='DELETE'
+4. 一个批次中只有未命中的行（同一批次内重复的行只算一次）组成新的批次做前向传播
+
+缓存的结果来自当时的批次，与按其他批次大小重新计算的结果可能在最后几位上不同；
+需要检查运行间差异的确定性审计不应启用缓存。
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+import torch
+
+# 缓存键的哈希字节数
+KEY_DIGEST_SIZE = 16
+
+# 默认的内存LRU容量（条目数），ResNet-18每个条目约4 KB
+DEFAULT_CAPACITY = 4096
+
+# 支持的SQLite日志模式
+SUPPORTED_JOURNAL_MODES = ['WAL', 'DELETE']
+
+# 每条SQL查询中最多的键数量（低于SQLite默认的变量数上限）
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logits (
+    key TEXT PRIMARY KEY,
+    num_classes INTEGER NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def backend_signature():
+    """返回影响数值结果的计算后端描述"""
+    return (f"torch{torch.__version__}"
+            f"-mkldnn{int(torch.backends.mkldnn.enabled)}"
+            f"-det{int(torch.are_deterministic_algorithms_enabled())}")
+
+
+def hash_input_rows(input_tensor, namespace=''):
+    """
+    为输入张量的每一行计算缓存键
+
+    参数:
+        input_tensor (torch.Tensor): 形状为(B, ...)的输入张量
+        namespace (str): 加入每个键的命名空间，例如模型指纹和后端描述
+
+    返回:
+        list: 长度为B的十六进制键列表
+    """
+    array = np.ascontiguousarray(input_tensor.detach().cpu().numpy())
+    prefix = f"{namespace}|{array.dtype}|{array.shape[1:]}|".encode('utf-8')
+    keys = []
+    for row in array:
+        digest = hashlib.blake2b(prefix, digest_size=KEY_DIGEST_SIZE)
+        digest.update(row.tobytes())
+        keys.append(digest.hexdigest())
+    return keys
+
+
+class LogitCache:
+    """内存LRU加可选磁盘存储的两级logits缓存"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, path=None, journal_mode='WAL'):
+        """
+        参数:
+            capacity (int): 内存LRU最多保存的条目数
+            path (str): 磁盘SQLite存储的路径，为None时只使用内存
+            journal_mode (str): 磁盘存储的SQLite日志模式，'WAL'（单台主机）或'DELETE'（网络文件系统）
+        """
+        if capacity < 1:
+            raise ValueError(f"缓存容量必须为正整数: {capacity}")
+        if journal_mode not in SUPPORTED_JOURNAL_MODES:
+            raise ValueError(f"不支持的日志模式: {journal_mode}。支持的模式: {SUPPORTED_JOURNAL_MODES}")
+        self.capacity = capacity
+        self.path = None if path is None else str(path)
+        self.memory = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        # 监控服务等场景会在其他线程中推理，连接和LRU由同一把锁保护
+        self.lock = threading.Lock()
+        self.conn = None
+        if self.path is not None:
+            # 多个工作进程可以共享同一个存储，写入冲突时等待而不是立即失败
+            self.conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+            self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        """关闭磁盘存储"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _remember(self, key, row):
+        self.memory[key] = row
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        查找一组键，先查内存LRU，再查磁盘存储
+
+        参数:
+            keys (list): 缓存键列表（可以有重复）
+
+        返回:
+            dict: 命中的键 -> 形状为(C,)的float张量
+        """
+        found = {}
+        counts = Counter(keys)
+        with self.lock:
+            pending = []
+            for key in counts:
+                row = self.memory.get(key)
+                if row is None:
+                    pending.append(key)
+                else:
+                    self.memory.move_to_end(key)
+                    found[key] = row
+                    self.stats['memory_hits'] += counts[key]
+            if pending and self.conn is not None:
+                for start in range(0, len(pending), _QUERY_CHUNK):
+                    chunk = pending[start:start + _QUERY_CHUNK]
+                    rows = self.conn.execute(
+                        f"SELECT key, data FROM logits WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, data in rows:
+                        row = torch.from_numpy(np.frombuffer(data, dtype=np.float32).copy())
+                        self._remember(key, row)
+                        found[key] = row
+                        self.stats['disk_hits'] += counts[key]
+            self.stats['misses'] += sum(n for key, n in counts.items() if key not in found)
+        return found
+
+    def put_many(self, keys, rows):
+        """
+        保存一组结果
+
+        参数:
+            keys (list): 缓存键列表
+            rows (torch.Tensor): 形状为(len(keys), C)的结果
+        """
+        rows = rows.detach().cpu().float()
+        with self.lock:
+            for key, row in zip(keys, rows):
+                # clone使缓存条目不引用整个批次的输出
+                self._remember(key, row.clone())
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO logits (key, num_classes, data) VALUES (?, ?, ?)",
+                        [(key, row.numel(), row.numpy().tobytes()) for key, row in zip(keys, rows)]
+                    )
+
+    def get_stats(self):
+        """
+        返回缓存统计
+
+        返回:
+            dict: 包含memory_hits、disk_hits、misses、lookups（查找的行数）、hit_rate和memory_entries的字典
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.memory)
+        stats['lookups'] = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
+
+
+def cached_forward(cache, forward, input_tensor, namespace=''):
+    """
+    通过缓存计算一个批次的输出，只对未命中的行做前向传播
+
+    参数:
+        cache (LogitCache): 缓存
+        forward (callable): 对一个批次做前向传播并返回(B, C)输出的函数
+        input_tensor (torch.Tensor): 形状为(B, ...)的输入
+        namespace (str): 缓存键的命名空间
+
+    返回:
+        torch.Tensor: 形状为(B, C)的输出，与直接调用forward的行顺序一致
+    """
+    keys = hash_input_rows(input_tensor, namespace)
+    found = cache.get_many(keys)
+
+    # 同一批次内重复的未命中行只计算一次
+    missing = {}
+    for index, key in enumerate(keys):
+        if key not in found and key not in missing:
+            missing[key] = index
+    if missing:
+        indices = list(missing.values())
+        batch = input_tensor if len(indices) == len(keys) else input_tensor[indices]
+        output = forward(batch)
+        cache.put_many(list(missing), output)
+        if len(missing) == len(keys):
+            return output
+        found.update(zip(missing, output.detach().cpu().float()))
+    return torch.stack([found[key] for key in keys])
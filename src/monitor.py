@@ -0,0 +1,410 @@
+"""
+持续监控模块
+
+此模块把ImageClassifier作为长期运行的监控服务，周期性地对线上流量图像进行扰动测试：
+1. ReservoirSampler - 固定容量的蓄水池采样，从任意多的流量图像中等概率保留一个样本
+2. RollingWindow - 按时间分桶的滚动窗口，只保留窗口内固定数量的桶，统计各扰动的top-1翻转率和推理延迟
+3. RobustnessMonitor - 每隔interval秒取出本周期的采样样本，对原始图像和所有扰动图像做一次批量推理，
+   把结果记入滚动窗口和累计指标
+4. 通过本地HTTP端点（/metrics）以Prometheus文本格式导出指标
+5. 评估中的意外异常不会终止后台线程，只计入robustness_eval_errors_total；
+   每张图像的随机扰动按图像内容哈希设定种子（与分布式扫描一致），不同图像得到不同的噪声
+
+所有状态的大小都与运行时长无关：采样池、滚动窗口的桶数和延迟直方图的桶数都是固定的。
+"""
+
+import bisect
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+
+from .errors import ImageLoadError
+from .perturbations import PERTURBATIONS, SEVERITIES, apply_perturbation
+from .result_store import hash_image_file
+from .sweep_queue import task_seed
+
+# 延迟直方图的桶上界（秒），与Prometheus客户端库的默认值一致
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 默认监控的扰动：(扰动名称, 严重程度)
+DEFAULT_PERTURBATIONS = [('gaussian_noise', 3), ('brightness', 3), ('contrast', 3), ('gaussian_blur', 3)]
+
+
+def check_perturbation(name, severity):
+    """
+    检查监控的扰动是否受支持
+
+    异常:
+        ValueError: 当扰动名称或严重程度不受支持时抛出
+    """
+    if name not in PERTURBATIONS:
+        raise ValueError(f"不支持的扰动: {name}。支持的扰动: {list(PERTURBATIONS)}")
+    if severity not in SEVERITIES:
+        raise ValueError(f"不支持的严重程度: {severity}。支持的严重程度: {SEVERITIES}")
+
+
+class ReservoirSampler:
+    """固定容量的蓄水池采样（Algorithm R），每个提交的样本被保留的概率相同"""
+
+    def __init__(self, capacity, seed=None):
+        """
+        参数:
+            capacity (int): 最多保留的样本数量
+            seed (int): 随机种子
+        """
+        if capacity < 1:
+            raise ValueError(f"采样容量必须为正整数: {capacity}")
+        self.capacity = capacity
+        self.random = random.Random(seed)
+        self.items = []
+        self.seen = 0
+
+    def offer(self, item):
+        """提交一个样本"""
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(item)
+        else:
+            index = self.random.randrange(self.seen)
+            if index < self.capacity:
+                self.items[index] = item
+
+    def drain(self):
+        """取出当前所有样本并开始新的采样周期"""
+        items, self.items, self.seen = self.items, [], 0
+        return items
+
+
+class RollingWindow:
+    """
+    按时间分桶的滚动窗口
+
+    每个桶记录各扰动的评估数和翻转数，以及延迟直方图；超出窗口的桶被丢弃，桶数不超过
+    window_seconds / bucket_seconds + 1。
+    """
+
+    def __init__(self, window_seconds=3600, bucket_seconds=60, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.latency_buckets = tuple(latency_buckets)
+        self.buckets = deque()
+
+    def _expire(self, now):
+        while self.buckets and self.buckets[0]['start'] <= now - self.window_seconds - self.bucket_seconds:
+            self.buckets.popleft()
+
+    def _current(self, now):
+        start = now - now % self.bucket_seconds
+        if not self.buckets or self.buckets[-1]['start'] != start:
+            self.buckets.append({
+                'start': start,
+                'flips': {},
+                'latency_counts': [0] * (len(self.latency_buckets) + 1),
+                'latency_sum': 0.0,
+            })
+        return self.buckets[-1]
+
+    def record_flips(self, perturbation, evaluated, flipped, now):
+        """记录某个扰动的评估数和top-1翻转数"""
+        self._expire(now)
+        counts = self._current(now)['flips'].setdefault(perturbation, [0, 0])
+        counts[0] += evaluated
+        counts[1] += flipped
+
+    def record_latency(self, seconds, now):
+        """记录一次推理延迟"""
+        self._expire(now)
+        bucket = self._current(now)
+        bucket['latency_counts'][bisect.bisect_left(self.latency_buckets, seconds)] += 1
+        bucket['latency_sum'] += seconds
+
+    def snapshot(self, now):
+        """
+        汇总窗口内的统计
+
+        返回:
+            dict: 包含flip_rates（扰动 -> (评估数, 翻转数, 翻转率)）、latency_counts（各桶计数，
+                  最后一个为超出所有上界的计数）、latency_count和latency_sum
+        """
+        self._expire(now)
+        flips = {}
+        latency_counts = [0] * (len(self.latency_buckets) + 1)
+        latency_sum = 0.0
+        for bucket in self.buckets:
+            if bucket['start'] <= now - self.window_seconds:
+                continue
+            for perturbation, (evaluated, flipped) in bucket['flips'].items():
+                totals = flips.setdefault(perturbation, [0, 0])
+                totals[0] += evaluated
+                totals[1] += flipped
+            latency_counts = [a + b for a, b in zip(latency_counts, bucket['latency_counts'])]
+            latency_sum += bucket['latency_sum']
+        return {
+            'flip_rates': {p: (e, f, f / e if e else 0.0) for p, (e, f) in flips.items()},
+            'latency_counts': latency_counts,
+            'latency_count': sum(latency_counts),
+            'latency_sum': latency_sum,
+        }
+
+    def latency_quantile(self, quantile, now):
+        """根据窗口内的直方图估计延迟分位数（返回所在桶的上界），没有数据时返回None"""
+        snapshot = self.snapshot(now)
+        if snapshot['latency_count'] == 0:
+            return None
+        target = quantile * snapshot['latency_count']
+        cumulative = 0
+        for upper, count in zip(self.latency_buckets + (float('inf'),), snapshot['latency_counts']):
+            cumulative += count
+            if cumulative >= target:
+                return upper
+        return float('inf')
+
+
+class RobustnessMonitor:
+    """周期性地对采样的流量图像进行扰动测试，并维护滚动窗口指标"""
+
+    def __init__(self, classifier, perturbations=None, sample_size=64, interval=60.0, window_seconds=3600,
+                 bucket_seconds=60, latency_buckets=DEFAULT_LATENCY_BUCKETS, seed=None, clock=time.time):
+        """
+        参数:
+            classifier (ImageClassifier): 用于推理的分类器
+            perturbations (list): (扰动名称, 严重程度)元组列表，默认为DEFAULT_PERTURBATIONS
+            sample_size (int): 每个周期最多评估的图像数量（蓄水池容量）
+            interval (float): 两次评估之间的间隔（秒）
+            window_seconds (float): 滚动窗口长度（秒）
+            bucket_seconds (float): 滚动窗口的桶宽（秒）
+            latency_buckets (tuple): 延迟直方图的桶上界（秒）
+            seed (int): 采样的随机种子
+            clock (callable): 返回当前时间（秒）的函数，测试时可以替换
+
+        异常:
+            ValueError: 当扰动名称或严重程度不受支持时抛出
+        """
+        self.classifier = classifier
+        self.perturbations = list(perturbations or DEFAULT_PERTURBATIONS)
+        for name, severity in self.perturbations:
+            check_perturbation(name, severity)
+        self.interval = interval
+        self.clock = clock
+        self.sampler = ReservoirSampler(sample_size, seed=seed)
+        self.window = RollingWindow(window_seconds, bucket_seconds, latency_buckets)
+        self.lock = threading.Lock()
+        self.totals = {
+            'images_submitted': 0,
+            'images_evaluated': 0,
+            'images_failed': 0,
+            'errors': 0,
+            'jobs': 0,
+            'flips': {self._label(name, severity): 0 for name, severity in self.perturbations},
+            'latency_counts': [0] * (len(self.window.latency_buckets) + 1),
+            'latency_sum': 0.0,
+        }
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(name, severity):
+        return f"{name}:{severity}"
+
+    def _record_error(self, error):
+        """记录一次评估中的意外异常"""
+        with self.lock:
+            self.totals['errors'] += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def submit(self, image_path):
+        """提交一张线上流量图像，是否被评估由蓄水池采样决定"""
+        with self.lock:
+            self.totals['images_submitted'] += 1
+            self.sampler.offer(image_path)
+
+    def run_once(self):
+        """
+        评估本周期采样到的所有图像
+
+        每张图像的原始版本和所有扰动版本拼成一个批次，只做一次前向传播。
+        无法加载的图像计入images_failed，扰动或推理中的其他异常计入errors，都不会中断本周期。
+
+        返回:
+            int: 成功评估的图像数量
+        """
+        with self.lock:
+            samples = self.sampler.drain()
+
+        evaluated = 0
+        for image_path in samples:
+            try:
+                input_tensor = self.classifier.normalize(self.classifier.load_and_preprocess_image(image_path))
+            except (FileNotFoundError, ImageLoadError):
+                with self.lock:
+                    self.totals['images_failed'] += 1
+                continue
+
+            try:
+                image_hash = hash_image_file(image_path)
+                batch = torch.cat([input_tensor] + [
+                    apply_perturbation(input_tensor, name, severity, self.classifier.mean, self.classifier.std,
+                                       seed=task_seed(image_hash, name, severity))
+                    for name, severity in self.perturbations
+                ])
+                start = time.perf_counter()
+                predictions = self.classifier.run_inference(batch).argmax(dim=1)
+                latency = time.perf_counter() - start
+            except Exception as e:
+                self._record_error(e)
+                continue
+            flipped = (predictions[1:] != predictions[0]).tolist()
+
+            now = self.clock()
+            with self.lock:
+                evaluated += 1
+                self.totals['images_evaluated'] += 1
+                for (name, severity), flip in zip(self.perturbations, flipped):
+                    label = self._label(name, severity)
+                    self.totals['flips'][label] += int(flip)
+                    self.window.record_flips(label, 1, int(flip), now)
+                self.window.record_latency(latency, now)
+                self.totals['latency_counts'][bisect.bisect_left(self.window.latency_buckets, latency)] += 1
+                self.totals['latency_sum'] += latency
+
+        with self.lock:
+            self.totals['jobs'] += 1
+        return evaluated
+
+    def start(self):
+        """在后台线程中每隔interval秒运行一次评估"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    # 任何异常都不能终止监控线程，否则指标会静默停止更新
+                    self._record_error(e)
+
+        self._thread = threading.Thread(target=loop, name='robustness-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台评估线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def metrics_text(self):
+        """
+        以Prometheus文本格式导出指标
+
+        返回:
+            str: 指标文本
+        """
+        now = self.clock()
+        with self.lock:
+            totals = {key: (dict(value) if isinstance(value, dict) else
+                            list(value) if isinstance(value, list) else value)
+                      for key, value in self.totals.items()}
+            snapshot = self.window.snapshot(now)
+            p50 = self.window.latency_quantile(0.5, now)
+            p95 = self.window.latency_quantile(0.95, now)
+            pending = len(self.sampler.items)
+        window_label = f'window="{self.window.window_seconds:g}s"'
+
+        lines = [
+            "# HELP robustness_images_submitted_total 提交给监控的流量图像数量",
+            "# TYPE robustness_images_submitted_total counter",
+            f"robustness_images_submitted_total {totals['images_submitted']}",
+            "# HELP robustness_images_evaluated_total 完成扰动测试的图像数量",
+            "# TYPE robustness_images_evaluated_total counter",
+            f"robustness_images_evaluated_total {totals['images_evaluated']}",
+            "# HELP robustness_images_failed_total 无法加载的图像数量",
+            "# TYPE robustness_images_failed_total counter",
+            f"robustness_images_failed_total {totals['images_failed']}",
+            "# HELP robustness_eval_errors_total 评估中发生意外异常的次数",
+            "# TYPE robustness_eval_errors_total counter",
+            f"robustness_eval_errors_total {totals['errors']}",
+            "# HELP robustness_jobs_total 已完成的评估周期数",
+            "# TYPE robustness_jobs_total counter",
+            f"robustness_jobs_total {totals['jobs']}",
+            "# HELP robustness_sample_pending 等待下一个周期评估的采样图像数量",
+            "# TYPE robustness_sample_pending gauge",
+            f"robustness_sample_pending {pending}",
+            "# HELP robustness_flips_total 扰动后top-1发生翻转的次数",
+            "# TYPE robustness_flips_total counter",
+        ]
+        lines += [f'robustness_flips_total{{perturbation="{label}"}} {count}'
+                  for label, count in totals['flips'].items()]
+
+        lines += [
+            "# HELP robustness_flip_rate 滚动窗口内扰动后top-1翻转的比例",
+            "# TYPE robustness_flip_rate gauge",
+        ]
+        lines += [f'robustness_flip_rate{{perturbation="{label}",{window_label}}} {rate:.6f}'
+                  for label, (_, _, rate) in sorted(snapshot['flip_rates'].items())]
+
+        lines += [
+            "# HELP robustness_inference_latency_seconds 每张图像（含全部扰动）的批量推理延迟",
+            "# TYPE robustness_inference_latency_seconds histogram",
+        ]
+        cumulative = 0
+        for upper, count in zip(self.window.latency_buckets, totals['latency_counts']):
+            cumulative += count
+            lines.append(f'robustness_inference_latency_seconds_bucket{{le="{upper:g}"}} {cumulative}')
+        count = sum(totals['latency_counts'])
+        lines += [
+            f'robustness_inference_latency_seconds_bucket{{le="+Inf"}} {count}',
+            f"robustness_inference_latency_seconds_sum {totals['latency_sum']:.6f}",
+            f"robustness_inference_latency_seconds_count {count}",
+            "# HELP robustness_window_latency_seconds 滚动窗口内推理延迟的分位数（所在直方图桶的上界）",
+            "# TYPE robustness_window_latency_seconds gauge",
+        ]
+        for quantile, value in (('0.5', p50), ('0.95', p95)):
+            if value is not None:
+                lines.append(f'robustness_window_latency_seconds{{quantile="{quantile}",{window_label}}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host='127.0.0.1', port=9108):
+        """
+        在后台线程中启动HTTP指标端点
+
+        参数:
+            host (str): 监听地址
+            port (int): 监听端口，为0时自动选择空闲端口
+
+        返回:
+            ThreadingHTTPServer: HTTP服务器，server_address为实际监听的地址，调用shutdown()停止
+        """
+        monitor = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = monitor.metrics_text().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path == '/healthz':
+                    body = b'ok\n'
+                    content_type = 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        return server
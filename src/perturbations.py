@@ -0,0 +1,91 @@
+"""
+图像扰动模块
+
+此模块提供用于鲁棒性扫描的常见图像扰动，每种扰动分为1~5级严重程度：
+1. gaussian_noise - 高斯噪声
+2. brightness - 亮度增加
+3. contrast - 对比度降低
+4. gaussian_blur - 高斯模糊
+
+扰动在像素空间（[0, 1]）中作用于预处理后的批量张量，随机扰动使用显式的随机种子，
+保证同一个扫描任务在任何主机、任何进程中都得到相同的结果。
+"""
+
+import torch
+import torch.nn.functional as F
+
+# 严重程度范围
+SEVERITIES = [1, 2, 3, 4, 5]
+
+# 各扰动在1~5级严重程度下的参数
+_NOISE_STD = [0.04, 0.06, 0.08, 0.09, 0.10]
+_BRIGHTNESS_DELTA = [0.1, 0.2, 0.3, 0.4, 0.5]
+_CONTRAST_FACTOR = [0.4, 0.3, 0.2, 0.1, 0.05]
+_BLUR_SIGMA = [1.0, 2.0, 3.0, 4.0, 6.0]
+
+
+def _gaussian_noise(pixels, severity, generator):
+    noise = torch.randn(pixels.shape, generator=generator, dtype=pixels.dtype)
+    return pixels + noise * _NOISE_STD[severity - 1]
+
+
+def _brightness(pixels, severity, generator):
+    return pixels + _BRIGHTNESS_DELTA[severity - 1]
+
+
+def _contrast(pixels, severity, generator):
+    mean = pixels.mean(dim=(1, 2, 3), keepdim=True)
+    return (pixels - mean) * _CONTRAST_FACTOR[severity - 1] + mean
+
+
+def _gaussian_blur(pixels, severity, generator):
+    sigma = _BLUR_SIGMA[severity - 1]
+    radius = int(3 * sigma)
+    offsets = torch.arange(-radius, radius + 1, dtype=pixels.dtype)
+    kernel = torch.exp(-offsets ** 2 / (2 * sigma ** 2))
+    kernel = (kernel / kernel.sum()).repeat(pixels.shape[1], 1, 1, 1)
+    # 可分离卷积：先水平再竖直，使用反射填充避免边缘变暗
+    channels = pixels.shape[1]
+    blurred = F.conv2d(F.pad(pixels, (radius, radius, 0, 0), mode='reflect'),
+                       kernel.view(channels, 1, 1, -1), groups=channels)
+    return F.conv2d(F.pad(blurred, (0, 0, radius, radius), mode='reflect'),
+                    kernel.view(channels, 1, -1, 1), groups=channels)
+
+
+PERTURBATIONS = {
+    'gaussian_noise': _gaussian_noise,
+    'brightness': _brightness,
+    'contrast': _contrast,
+    'gaussian_blur': _gaussian_blur,
+}
+
+
+def apply_perturbation(input_tensor, name, severity, mean, std, seed=0):
+    """
+    对预处理后的批量张量施加扰动
+
+    参数:
+        input_tensor (torch.Tensor): 标准化后的图像张量，形状为(B, 3, H, W)
+        name (str): 扰动名称，见PERTURBATIONS；'identity'表示不施加扰动
+        severity (int): 严重程度，1~5
+        mean (torch.Tensor): 标准化均值，形状为(1, 3, 1, 1)
+        std (torch.Tensor): 标准化标准差，形状为(1, 3, 1, 1)
+        seed (int): 随机扰动使用的随机种子
+
+    返回:
+        torch.Tensor: 扰动后的标准化张量，形状与输入相同
+
+    异常:
+        ValueError: 当扰动名称或严重程度不受支持时抛出
+    """
+    if name == 'identity':
+        return input_tensor
+    if name not in PERTURBATIONS:
+        raise ValueError(f"不支持的扰动: {name}。支持的扰动: {['identity'] + list(PERTURBATIONS)}")
+    if severity not in SEVERITIES:
+        raise ValueError(f"不支持的严重程度: {severity}。支持的严重程度: {SEVERITIES}")
+
+    generator = torch.Generator().manual_seed(seed)
+    pixels = input_tensor * std + mean
+    pixels = PERTURBATIONS[name](pixels, severity, generator).clamp(0, 1)
+    return (pixels - mean) / std
@@ -0,0 +1,267 @@
+"""
+结果存储模块
+
+此模块把每次运行的预测结果保存到一个嵌入式SQLite数据库中，用于跨运行的回归比较：
+1. runs 表记录每次运行的模型名称和模型版本（权重指纹，见ImageClassifier.model_fingerprint）
+2. predictions 表以 (run_id, image_hash, perturbation, severity) 为主键，使用WITHOUT ROWID
+   聚簇存储，同一次运行的结果在磁盘上连续存放；每行冗余保存所属运行的模型版本，
+   并在 (image_hash, model_version, perturbation, severity) 上建立索引，
+   按图像和模型版本查询结果（lookup）时不需要扫描运行表或整张预测表
+3. 批量写入使用单个事务中的executemany
+4. compare_runs 通过主键连接两次运行的结果，只返回top-1发生变化的行；
+   每行只需一次主键查找，行数达到数千万时查询时间仍然只取决于两次运行本身的规模
+
+图像以文件内容的哈希标识，同一张图像换了路径或文件名仍然可以比较。
+"""
+
+import hashlib
+import sqlite3
+import time
+import uuid
+
+import torch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    model_version TEXT,
+    created_at REAL NOT NULL,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS images (
+    image_hash TEXT PRIMARY KEY,
+    path TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS predictions (
+    run_id TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    perturbation TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    top1 INTEGER NOT NULL,
+    probability REAL NOT NULL,
+    model_version TEXT,
+    PRIMARY KEY (run_id, image_hash, perturbation, severity)
+) WITHOUT ROWID;
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_predictions_version
+    ON predictions (image_hash, model_version, perturbation, severity);
+"""
+
+# 图像哈希的字节数
+IMAGE_HASH_DIGEST_SIZE = 16
+
+
+def hash_image_file(path):
+    """计算图像文件内容的哈希，作为图像在结果存储中的标识"""
+    digest = hashlib.blake2b(digest_size=IMAGE_HASH_DIGEST_SIZE)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """基于SQLite的预测结果存储"""
+
+    def __init__(self, db_path):
+        """
+        参数:
+            db_path (str): SQLite数据库文件路径，不存在时自动创建
+        """
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self.conn.executescript(_INDEXES)
+
+    def _migrate(self):
+        """为旧版本的数据库补充predictions.model_version列，并从运行表回填"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(predictions)")]
+        if 'model_version' in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE predictions ADD COLUMN model_version TEXT")
+            self.conn.execute(
+                "UPDATE predictions SET model_version = "
+                "(SELECT model_version FROM runs WHERE runs.run_id = predictions.run_id)"
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def create_run(self, model_name, model_version=None, run_id=None, note=None):
+        """
+        登记一次运行
+
+        参数:
+            model_name (str): 模型名称
+            model_version (str): 模型版本，通常为ImageClassifier.model_fingerprint()
+            run_id (str): 运行ID，默认自动生成
+            note (str): 备注
+
+        返回:
+            str: 运行ID
+        """
+        run_id = run_id or uuid.uuid4().hex[:12]
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, model_name, model_version, created_at, note) VALUES (?, ?, ?, ?, ?)",
+                (run_id, model_name, model_version, time.time(), note),
+            )
+        return run_id
+
+    def list_runs(self):
+        """
+        返回所有运行，按创建时间排序
+
+        返回:
+            list: 包含run_id、model_name、model_version、created_at、note和num_predictions的字典列表
+        """
+        rows = self.conn.execute(
+            "SELECT run_id, model_name, model_version, created_at, note FROM runs ORDER BY created_at"
+        ).fetchall()
+        keys = ['run_id', 'model_name', 'model_version', 'created_at', 'note']
+        runs = [dict(zip(keys, row)) for row in rows]
+        for run in runs:
+            run['num_predictions'] = self.conn.execute(
+                "SELECT COUNT(*) FROM predictions WHERE run_id = ?", (run['run_id'],)
+            ).fetchone()[0]
+        return runs
+
+    def add_images(self, images):
+        """
+        记录图像哈希对应的路径，便于在比较结果中显示
+
+        参数:
+            images (iterable): (image_hash, path)元组
+        """
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO images (image_hash, path) VALUES (?, ?)", images)
+
+    def add_predictions(self, run_id, rows):
+        """
+        批量写入预测结果，同一主键的结果会被覆盖
+
+        参数:
+            run_id (str): 运行ID
+            rows (iterable): (image_hash, perturbation, severity, top1, probability)元组
+
+        返回:
+            int: 写入的行数
+
+        异常:
+            ValueError: 当运行不存在时抛出
+        """
+        run = self.conn.execute("SELECT model_version FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            raise ValueError(f"运行不存在: {run_id}")
+        with self.conn:
+            cursor = self.conn.executemany(
+                "INSERT OR REPLACE INTO predictions "
+                "(run_id, image_hash, perturbation, severity, top1, probability, model_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *row, run[0]) for row in rows),
+            )
+        return cursor.rowcount
+
+    def lookup(self, image_hash, model_version, perturbation=None, severity=None):
+        """
+        按图像和模型版本查询预测结果，通过(image_hash, model_version, perturbation, severity)索引定位
+
+        参数:
+            image_hash (str): 图像内容哈希
+            model_version (str): 模型版本
+            perturbation (str): 扰动名称，为None时返回所有扰动
+            severity (int): 严重程度，为None时返回所有严重程度
+
+        返回:
+            list: 字典列表，包含run_id、perturbation、severity、top1和probability，按扰动、严重程度排序
+        """
+        query = ("SELECT run_id, perturbation, severity, top1, probability FROM predictions "
+                 "WHERE image_hash = ? AND model_version = ?")
+        params = [image_hash, model_version]
+        if perturbation is not None:
+            query += " AND perturbation = ?"
+            params.append(perturbation)
+        if severity is not None:
+            query += " AND severity = ?"
+            params.append(severity)
+        query += " ORDER BY perturbation, severity, run_id"
+        keys = ['run_id', 'perturbation', 'severity', 'top1', 'probability']
+        return [dict(zip(keys, row)) for row in self.conn.execute(query, params)]
+
+    def add_outputs(self, run_id, image_hashes, output, perturbation='identity', severity=0):
+        """
+        把一个批次的模型输出写入结果存储
+
+        参数:
+            run_id (str): 运行ID
+            image_hashes (list): 长度为B的图像哈希列表
+            output (torch.Tensor): 形状为(B, C)的模型输出
+            perturbation (str): 扰动名称
+            severity (int): 严重程度
+
+        返回:
+            int: 写入的行数
+        """
+        probabilities, top1 = torch.softmax(output, dim=1).max(dim=1)
+        return self.add_predictions(run_id, zip(image_hashes, [perturbation] * len(image_hashes),
+                                                [severity] * len(image_hashes), top1.tolist(),
+                                                probabilities.tolist()))
+
+    def compare_runs(self, base_run, new_run, limit=None):
+        """
+        查询两次运行之间top-1预测发生变化的结果
+
+        参数:
+            base_run (str): 基准运行ID
+            new_run (str): 新运行ID
+            limit (int): 最多返回的行数，为None时返回全部
+
+        返回:
+            list: 字典列表，包含image_hash、path、perturbation、severity、base_top1、base_probability、
+                  new_top1和new_probability，按图像、扰动、严重程度排序
+        """
+        query = (
+            "SELECT a.image_hash, i.path, a.perturbation, a.severity, a.top1, a.probability, b.top1, b.probability "
+            "FROM predictions a "
+            "JOIN predictions b ON b.run_id = ? AND b.image_hash = a.image_hash "
+            "AND b.perturbation = a.perturbation AND b.severity = a.severity "
+            "LEFT JOIN images i ON i.image_hash = a.image_hash "
+            "WHERE a.run_id = ? AND a.top1 != b.top1 "
+            "ORDER BY a.image_hash, a.perturbation, a.severity"
+        )
+        params = [new_run, base_run]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        keys = ['image_hash', 'path', 'perturbation', 'severity',
+                'base_top1', 'base_probability', 'new_top1', 'new_probability']
+        return [dict(zip(keys, row)) for row in self.conn.execute(query, params)]
+
+    def summarize_changes(self, base_run, new_run):
+        """
+        按扰动和严重程度汇总两次运行之间的top-1变化
+
+        返回:
+            list: 字典列表，包含perturbation、severity、num_compared、num_changed和change_rate
+        """
+        rows = self.conn.execute(
+            "SELECT a.perturbation, a.severity, COUNT(*), SUM(a.top1 != b.top1) "
+            "FROM predictions a "
+            "JOIN predictions b ON b.run_id = ? AND b.image_hash = a.image_hash "
+            "AND b.perturbation = a.perturbation AND b.severity = a.severity "
+            "WHERE a.run_id = ? "
+            "GROUP BY a.perturbation, a.severity ORDER BY a.perturbation, a.severity",
+            (new_run, base_run),
+        ).fetchall()
+        return [
+            {'perturbation': perturbation, 'severity': severity, 'num_compared': compared,
+             'num_changed': changed, 'change_rate': changed / compared}
+            for perturbation, severity, compared, changed in rows
+        ]
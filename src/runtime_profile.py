@@ -0,0 +1,266 @@
+"""
+运行时配置自动调优模块
+
+此模块用于为当前机器寻找最合适的CPU推理配置：
+1. 扫描（进程数 × intra-op线程数 × 批次大小）的组合，在合成输入上运行run_inference
+2. 分别按吞吐量和延迟选出最佳配置
+3. 将结果保存为机器配置文件（machine profile），ImageClassifier启动时自动加载并应用
+"""
+
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import statistics
+import time
+from pathlib import Path
+
+import torch
+
+# 默认的机器配置文件路径，可通过环境变量覆盖
+PROFILE_ENV_VAR = 'AI_MODEL_TESTER_PROFILE'
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser('~'), '.ai_model_tester', 'machine_profile.json')
+
+# 支持的优化目标
+SUPPORTED_OBJECTIVES = ['throughput', 'latency']
+
+
+def get_profile_path():
+    """获取机器配置文件路径，环境变量优先"""
+    return os.environ.get(PROFILE_ENV_VAR, DEFAULT_PROFILE_PATH)
+
+
+def save_profile(profile, path=None):
+    """
+    保存机器配置文件
+
+    参数:
+        profile (dict): 由tune_runtime生成的配置
+        path (str): 保存路径，默认为get_profile_path()
+
+    返回:
+        str: 实际保存的路径
+    """
+    path = path or get_profile_path()
+    Path(path).parent.mkdir(exist_ok=True, parents=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_profile(path=None):
+    """
+    加载机器配置文件
+
+    配置文件不存在、无法解析或不是在当前机器上生成时返回None。
+
+    参数:
+        path (str): 配置文件路径，默认为get_profile_path()
+
+    返回:
+        dict: 配置字典，或None
+    """
+    path = path or get_profile_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 其他机器上的调优结果不适用于本机
+    if profile.get('hostname') != socket.gethostname() or profile.get('cpu_count') != os.cpu_count():
+        return None
+    return profile
+
+
+def apply_profile(profile, objective='throughput'):
+    """
+    将配置中指定目标的最佳设置应用到当前进程
+
+    参数:
+        profile (dict): 机器配置
+        objective (str): 优化目标，'throughput'或'latency'
+
+    返回:
+        dict: 已应用的配置项（num_processes、num_threads、interop_threads、batch_size等）
+
+    异常:
+        ValueError: 当优化目标不受支持或配置中不包含该目标时抛出
+    """
+    if objective not in SUPPORTED_OBJECTIVES:
+        raise ValueError(f"不支持的优化目标: {objective}。支持的目标: {SUPPORTED_OBJECTIVES}")
+    if objective not in profile.get('objectives', {}):
+        raise ValueError(f"机器配置中不包含优化目标: {objective}")
+
+    config = profile['objectives'][objective]
+    torch.set_num_threads(config['num_threads'])
+    try:
+        torch.set_num_interop_threads(config['interop_threads'])
+    except RuntimeError:
+        # interop线程数只能在任何并行工作开始之前设置一次
+        pass
+    return config
+
+
+def _benchmark_worker(model_name, num_threads, interop_threads, batch_size,
+                      warmup, iterations, barrier, results):
+    """在子进程中按指定配置运行推理基准测试"""
+    from .inference_runner import ImageClassifier
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(interop_threads)
+
+    # 不加载已有的机器配置，避免影响调优本身
+    classifier = ImageClassifier(model_name=model_name, runtime_profile=None)
+    inputs = torch.randn((batch_size, 3, 224, 224), generator=torch.Generator().manual_seed(0))
+    for _ in range(warmup):
+        classifier.run_inference(inputs)
+
+    # 等待所有进程准备就绪后同时开始计时
+    barrier.wait()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        batch_start = time.perf_counter()
+        classifier.run_inference(inputs)
+        latencies.append(time.perf_counter() - batch_start)
+    results.put({'elapsed': time.perf_counter() - start, 'latencies': latencies})
+
+
+def benchmark_config(num_processes, num_threads, batch_size, model_name='resnet18',
+                     interop_threads=1, warmup=2, iterations=10, poll_interval=0.5):
+    """
+    以指定进程数、线程数和批次大小运行一次基准测试
+
+    参数:
+        num_processes (int): 同时运行的推理进程数
+        num_threads (int): 每个进程的intra-op线程数
+        batch_size (int): 每次前向传播的图像数量
+        model_name (str): 模型名称
+        interop_threads (int): 每个进程的inter-op线程数
+        warmup (int): 计时前的预热次数
+        iterations (int): 每个进程计时的前向传播次数
+        poll_interval (float): 等待结果时检查子进程状态的间隔（秒）
+
+    返回:
+        dict: 包含配置参数、images_per_sec（所有进程合计吞吐量）和
+              latency_ms（批次延迟中位数，毫秒）的字典
+
+    异常:
+        RuntimeError: 当基准测试子进程异常退出（例如内存不足或后端崩溃）时抛出
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(num_processes)
+    result_queue = context.Queue()
+    processes = [
+        context.Process(target=_benchmark_worker,
+                        args=(model_name, num_threads, interop_threads, batch_size,
+                              warmup, iterations, barrier, result_queue))
+        for _ in range(num_processes)
+    ]
+    for process in processes:
+        process.start()
+    results = []
+    try:
+        while len(results) < num_processes:
+            try:
+                results.append(result_queue.get(timeout=poll_interval))
+            except queue.Empty:
+                # 子进程崩溃时其他进程会一直等在barrier上，抛出异常而不是永远等待
+                crashed = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+                if crashed:
+                    raise RuntimeError(f"基准测试进程异常退出，退出码: {crashed}")
+    finally:
+        for process in processes:
+            if process.is_alive() and len(results) < num_processes:
+                process.terminate()
+            process.join()
+
+    wall_time = max(result['elapsed'] for result in results)
+    latencies = [latency for result in results for latency in result['latencies']]
+    total_images = num_processes * batch_size * iterations
+
+    return {
+        'num_processes': num_processes,
+        'num_threads': num_threads,
+        'interop_threads': interop_threads,
+        'batch_size': batch_size,
+        'images_per_sec': total_images / wall_time,
+        'latency_ms': statistics.median(latencies) * 1000,
+    }
+
+
+def select_best(results):
+    """
+    从基准测试结果中分别选出吞吐量最高和延迟最低的配置
+
+    参数:
+        results (list): benchmark_config返回值的列表
+
+    返回:
+        dict: {'throughput': 配置, 'latency': 配置}
+    """
+    return {
+        'throughput': max(results, key=lambda r: (r['images_per_sec'], -r['latency_ms'])),
+        'latency': min(results, key=lambda r: (r['latency_ms'], -r['images_per_sec'])),
+    }
+
+
+def tune_runtime(process_counts=None, thread_counts=None, batch_sizes=(1, 8, 32),
+                 model_name='resnet18', warmup=2, iterations=10, verbose=True):
+    """
+    扫描（进程数 × 线程数 × 批次大小）组合，生成机器配置
+
+    跳过进程数 × 线程数超过CPU核心数的组合，避免过度订阅。
+
+    参数:
+        process_counts (list): 要扫描的进程数，默认为1到CPU核心数之间的2的幂
+        thread_counts (list): 要扫描的线程数，默认同上
+        batch_sizes (list): 要扫描的批次大小
+        model_name (str): 模型名称
+        warmup (int): 每个配置的预热次数
+        iterations (int): 每个配置的计时次数
+        verbose (bool): 是否打印每个配置的结果
+
+    返回:
+        dict: 机器配置，包含hostname、cpu_count、objectives（最佳配置）和results（所有结果）
+    """
+    cpu_count = os.cpu_count() or 1
+    powers_of_two = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpu_count]
+    process_counts = process_counts or powers_of_two
+    thread_counts = thread_counts or powers_of_two
+
+    results = []
+    for num_processes in process_counts:
+        for num_threads in thread_counts:
+            if num_processes * num_threads > cpu_count:
+                continue
+            for batch_size in batch_sizes:
+                try:
+                    result = benchmark_config(num_processes, num_threads, batch_size, model_name=model_name,
+                                              warmup=warmup, iterations=iterations)
+                except RuntimeError as e:
+                    # 某个配置崩溃（例如批次过大导致内存不足）时跳过，继续扫描其他配置
+                    if verbose:
+                        print(f"进程数 {num_processes}，线程数 {num_threads}，批次大小 {batch_size}: 跳过（{e}）")
+                    continue
+                results.append(result)
+                if verbose:
+                    print(f"进程数 {num_processes}，线程数 {num_threads}，批次大小 {batch_size}: "
+                          f"{result['images_per_sec']:.1f} 图像/秒，延迟 {result['latency_ms']:.1f} ms")
+
+    if not results:
+        raise ValueError("没有可运行的配置组合，请检查进程数和线程数是否超过CPU核心数")
+
+    return {
+        'hostname': socket.gethostname(),
+        'cpu_count': cpu_count,
+        'torch_version': torch.__version__,
+        'model_name': model_name,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'objectives': select_best(results),
+        'results': results,
+    }
@@ -0,0 +1,133 @@
+"""
+显著性图模块
+
+此模块用于解释扰动为什么改变了预测：
+1. 遮挡敏感度（occlusion sensitivity）- 用滑动窗口遮挡图像的各个区域，观察目标类别概率的下降。
+   所有遮挡位置的掩码一次性生成，输入图像通过expand得到不复制数据的步长为0的视图，
+   再按batch_size分块批量前向传播，而不是每个遮挡位置调用一次推理
+2. Grad-CAM - 利用最后一个卷积块的激活值及其梯度生成类别激活图，只需一次前向和一次反向传播
+"""
+
+import torch
+import torch.nn.functional as F
+
+
+def occlusion_masks(height, width, window=32, stride=16):
+    """
+    生成所有滑动窗口位置的遮挡掩码
+
+    参数:
+        height (int): 图像高度
+        width (int): 图像宽度
+        window (int): 遮挡窗口边长
+        stride (int): 窗口滑动步长
+
+    返回:
+        torch.Tensor: 布尔掩码，形状为(M, 1, height, width)，M为窗口位置数量，True表示被遮挡
+    """
+    if window < 1 or stride < 1:
+        raise ValueError(f"窗口边长和步长必须为正整数: window={window}, stride={stride}")
+    window = min(window, height, width)
+
+    def covered(size):
+        # 每个窗口起点覆盖的行（或列），最后一个窗口对齐到边缘，保证覆盖整幅图像
+        starts = list(range(0, size - window + 1, stride))
+        if starts[-1] != size - window:
+            starts.append(size - window)
+        positions = torch.arange(size)
+        starts = torch.tensor(starts).unsqueeze(1)
+        return (positions >= starts) & (positions < starts + window)
+
+    rows = covered(height)
+    cols = covered(width)
+    masks = rows[:, None, :, None] & cols[None, :, None, :]
+    return masks.reshape(-1, 1, height, width)
+
+
+def occlusion_sensitivity(model, input_tensor, target=None, window=32, stride=16,
+                          baseline=0.0, batch_size=64):
+    """
+    计算单张图像的遮挡敏感度图
+
+    参数:
+        model (torch.nn.Module): 处于评估模式的分类模型
+        input_tensor (torch.Tensor): 预处理后的图像张量，形状为(1, 3, H, W)
+        target (int): 目标类别，默认为模型对原图的top-1预测
+        window (int): 遮挡窗口边长
+        stride (int): 窗口滑动步长
+        baseline (float): 遮挡区域填充的值（标准化空间中0即ImageNet均值颜色）
+        batch_size (int): 每次前向传播的遮挡图像数量
+
+    返回:
+        tuple: (形状为(H, W)的敏感度图, 目标类别)。敏感度为遮挡覆盖该像素时目标类别概率下降的平均值
+    """
+    if input_tensor.shape[0] != 1:
+        raise ValueError(f"遮挡敏感度一次只处理一张图像，输入形状为{tuple(input_tensor.shape)}")
+
+    _, channels, height, width = input_tensor.shape
+    masks = occlusion_masks(height, width, window=window, stride=stride)
+    num_masks = masks.shape[0]
+
+    with torch.no_grad():
+        original_probs = F.softmax(model(input_tensor), dim=1)
+        if target is None:
+            target = int(original_probs.argmax(dim=1))
+        original_score = original_probs[0, target]
+
+        # 步长为0的视图，所有遮挡位置共享同一份图像数据
+        expanded = input_tensor.expand(num_masks, channels, height, width)
+        fill = torch.tensor(baseline, dtype=input_tensor.dtype)
+
+        drops = []
+        for start in range(0, num_masks, batch_size):
+            occluded = torch.where(masks[start:start + batch_size], fill, expanded[start:start + batch_size])
+            probs = F.softmax(model(occluded), dim=1)
+            drops.append(original_score - probs[:, target])
+        drops = torch.cat(drops)
+
+    # 每个像素的敏感度为覆盖它的所有窗口的概率下降平均值
+    masks = masks.squeeze(1).to(drops.dtype)
+    heatmap = torch.einsum('m,mhw->hw', drops, masks) / masks.sum(dim=0).clamp(min=1)
+    return heatmap, target
+
+
+def grad_cam(model, layer, input_tensor, target=None):
+    """
+    计算Grad-CAM类别激活图
+
+    参数:
+        model (torch.nn.Module): 处于评估模式的分类模型
+        layer (torch.nn.Module): 用于计算激活图的卷积层（对ResNet通常为layer4）
+        input_tensor (torch.Tensor): 预处理后的图像张量，形状为(B, 3, H, W)
+        target (int 或 torch.Tensor): 目标类别，可以是所有图像共用的整数或形状为(B,)的张量，
+                                      默认为每张图像的top-1预测
+
+    返回:
+        tuple: (形状为(B, H, W)、取值归一化到[0, 1]的激活图, 形状为(B,)的目标类别张量)
+    """
+    activations = []
+    handle = layer.register_forward_hook(lambda module, inputs, output: activations.append(output))
+    try:
+        # 模型参数已冻结，对输入开启梯度后中间激活值才会记录计算图
+        with torch.enable_grad():
+            inputs = input_tensor.detach().requires_grad_(True)
+            logits = model(inputs)
+            if target is None:
+                target = logits.argmax(dim=1)
+            target = torch.as_tensor(target, dtype=torch.long).expand(logits.shape[0])
+            score = logits.gather(1, target.unsqueeze(1)).sum()
+            activation = activations[0]
+            grads, = torch.autograd.grad(score, activation)
+    finally:
+        handle.remove()
+
+    with torch.no_grad():
+        weights = grads.mean(dim=(2, 3), keepdim=True)
+        cam = F.relu((weights * activation).sum(dim=1, keepdim=True))
+        cam = F.interpolate(cam, size=input_tensor.shape[2:], mode='bilinear', align_corners=False).squeeze(1)
+        # 每张图像单独归一化到[0, 1]
+        flat = cam.flatten(1)
+        minimum = flat.min(dim=1).values.view(-1, 1, 1)
+        maximum = flat.max(dim=1).values.view(-1, 1, 1)
+        cam = (cam - minimum) / (maximum - minimum).clamp(min=1e-12)
+    return cam, target
@@ -0,0 +1,70 @@
+"""
+信息量排序模块
+
+此模块在推理之后对预测结果按信息量排序，只把最值得人工查看的样本交给可视化和报告：
+1. margin - top-1与top-2概率之差越小越靠前（边界样本）
+2. entropy - 预测分布的熵越大越靠前（模型不确定）
+3. flip - 相对参考输出（通常是原始图像）top-1发生翻转的样本最靠前，其次按参考类别概率的下降幅度排序
+"""
+
+import torch
+import torch.nn.functional as F
+
+# 支持的排序依据
+SUPPORTED_CRITERIA = ['margin', 'entropy', 'flip']
+
+
+def informativeness_scores(logits, criterion='margin', reference_logits=None):
+    """
+    计算每个样本的信息量得分，得分越高越值得查看
+
+    参数:
+        logits (torch.Tensor): 批量模型输出，形状为(N, C)
+        criterion (str): 排序依据，'margin'、'entropy'或'flip'
+        reference_logits (torch.Tensor): 参考输出，形状为(N, C)或(1, C)，criterion为'flip'时必须提供
+
+    返回:
+        torch.Tensor: 形状为(N,)的得分
+
+    异常:
+        ValueError: 当排序依据不受支持或缺少参考输出时抛出
+    """
+    if criterion not in SUPPORTED_CRITERIA:
+        raise ValueError(f"不支持的排序依据: {criterion}。支持的依据: {SUPPORTED_CRITERIA}")
+
+    probabilities = F.softmax(logits, dim=1)
+
+    if criterion == 'margin':
+        top2 = probabilities.topk(2, dim=1).values
+        return -(top2[:, 0] - top2[:, 1])
+
+    if criterion == 'entropy':
+        return -(probabilities * F.log_softmax(logits, dim=1)).sum(dim=1)
+
+    if reference_logits is None:
+        raise ValueError("排序依据为'flip'时必须提供reference_logits")
+    reference_probabilities = F.softmax(reference_logits, dim=1).expand_as(probabilities)
+    reference_top1 = reference_probabilities.argmax(dim=1, keepdim=True)
+    flipped = (probabilities.argmax(dim=1, keepdim=True) != reference_top1).squeeze(1).float()
+    # 参考类别概率的下降幅度在[-1, 1]之间，翻转的样本额外加2，保证排在最前
+    probability_drop = (reference_probabilities.gather(1, reference_top1)
+                        - probabilities.gather(1, reference_top1)).squeeze(1)
+    return flipped * 2 + probability_drop
+
+
+def select_informative(logits, top_n, criterion='margin', reference_logits=None):
+    """
+    选出信息量最高的top_n个样本
+
+    参数:
+        logits (torch.Tensor): 批量模型输出，形状为(N, C)
+        top_n (int): 选出的样本数量，超过N时返回全部样本
+        criterion (str): 排序依据，见informativeness_scores
+        reference_logits (torch.Tensor): 参考输出，criterion为'flip'时必须提供
+
+    返回:
+        list: 按得分从高到低排列的(样本索引, 得分)元组列表
+    """
+    scores = informativeness_scores(logits, criterion=criterion, reference_logits=reference_logits)
+    top_scores, top_indices = scores.topk(min(top_n, scores.shape[0]))
+    return list(zip(top_indices.tolist(), top_scores.tolist()))
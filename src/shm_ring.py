@@ -0,0 +1,242 @@
+"""
+共享内存批次环形缓冲区模块
+
+此模块用于多进程解码时在解码进程和推理进程之间零拷贝地传递图像：
+1. 推理进程创建一块共享内存，划分为num_slots个批次槽位，每个槽位可存放batch_size张
+   (3, 224, 224)的uint8图像（每张约150 KB，是float32张量的四分之一）
+2. 解码进程从空闲队列领取槽位，把解码、缩放、裁剪后的uint8像素直接写入槽位，
+   然后只通过队列发送槽位编号和路径列表，不序列化任何像素数据
+3. 推理进程把槽位内存的uint8视图直接交给run_inference（标准化已融合在模型的第一个卷积层中），
+   随后把槽位放回空闲队列重复使用
+4. 所有槽位都在使用中时，解码进程在领取槽位时阻塞，形成背压，内存占用固定
+"""
+
+import math
+import multiprocessing
+import queue
+
+import numpy as np
+import torch
+from multiprocessing import shared_memory
+
+from .batch_runner import _quarantine_entry, default_batch_size, validate_image_file
+from .errors import ImageLoadError, UnsupportedImageFormatError, CorruptImageError
+from .inference_runner import check_pixel_budget, open_image_within_budget, DEFAULT_MAX_PIXELS, RESIZE_SIZE
+
+# 模型输入的图像边长
+IMAGE_SIZE = 224
+
+
+class SharedBatchRing:
+    """
+    划分为多个批次槽位的共享内存
+
+    推理进程创建缓冲区（拥有者，负责释放），解码进程通过spec()返回的描述信息连接到同一块内存。
+    """
+
+    def __init__(self, num_slots, batch_size, image_size=IMAGE_SIZE, name=None):
+        """
+        参数:
+            num_slots (int): 槽位数量
+            batch_size (int): 每个槽位可存放的图像数量
+            image_size (int): 图像边长
+            name (str): 已有共享内存的名称，为None时创建新的共享内存
+        """
+        self.num_slots = num_slots
+        self.batch_size = batch_size
+        self.image_size = image_size
+        self.shape = (num_slots, batch_size, 3, image_size, image_size)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=math.prod(self.shape))
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, spec):
+        """根据spec()的描述信息连接到已有的共享内存"""
+        return cls(spec['num_slots'], spec['batch_size'], spec['image_size'], name=spec['name'])
+
+    def spec(self):
+        """返回可在进程之间传递的描述信息"""
+        return {
+            'name': self.shm.name,
+            'num_slots': self.num_slots,
+            'batch_size': self.batch_size,
+            'image_size': self.image_size,
+        }
+
+    def slot(self, index):
+        """返回槽位的numpy视图，形状为(batch_size, 3, image_size, image_size)，不复制数据"""
+        return self.array[index]
+
+    def close(self):
+        """断开共享内存；拥有者同时释放共享内存。调用前需要释放所有指向缓冲区的视图"""
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _decode_pixels(image_path, max_pixels, transform):
+    """
+    在像素预算内解码图像，返回缩放裁剪后形状为(3, H, W)的uint8像素
+
+    与ImageClassifier._load_image一样把各种失败统一转换为ImageLoadError的子类，
+    隔离记录中的错误类型与BatchRunner一致。
+    """
+    from PIL import UnidentifiedImageError
+
+    try:
+        image, _ = open_image_within_budget(image_path, max_pixels)
+        return np.asarray(transform(image)).transpose(2, 0, 1)
+    except ImageLoadError:
+        raise
+    except UnidentifiedImageError as e:
+        raise UnsupportedImageFormatError(f"无法识别图像'{image_path}'的格式: {str(e)}")
+    except Exception as e:
+        raise CorruptImageError(f"处理图像'{image_path}'时发生错误: {str(e)}")
+
+
+def _decode_worker(spec, tasks, free_slots, filled_slots, max_pixels):
+    """解码进程：领取空闲槽位，把一个批次的图像解码后直接写入共享内存"""
+    import torchvision.transforms as transforms
+
+    ring = SharedBatchRing.attach(spec)
+    transform = transforms.Compose([transforms.Resize(RESIZE_SIZE), transforms.CenterCrop(spec['image_size'])])
+    try:
+        while True:
+            paths = tasks.get()
+            if paths is None:
+                break
+
+            # 所有槽位都在使用中时在这里阻塞，解码进程不会超前推理进程太多
+            slot = free_slots.get()
+            view = ring.slot(slot)
+            valid = []
+            errors = []
+            for image_path in paths:
+                # 与BatchRunner相同：先检查魔数和文件头，再解码
+                try:
+                    validate_image_file(image_path, max_pixels)
+                except (ImageLoadError, OSError) as e:
+                    errors.append(_quarantine_entry(image_path, 'validate', e))
+                    continue
+                try:
+                    # 成功解码的图像依次存放在槽位开头，推理进程只需取前len(valid)行
+                    view[len(valid)] = _decode_pixels(image_path, max_pixels, transform)
+                    valid.append(image_path)
+                except ImageLoadError as e:
+                    errors.append(_quarantine_entry(image_path, 'decode', e))
+            view = None
+            filled_slots.put((slot, valid, errors))
+    finally:
+        ring.close()
+
+
+class SharedMemoryRunner:
+    """
+    使用多个解码进程和共享内存环形缓冲区的批量推理
+
+    接口与BatchRunner一致：iter_batches逐批返回结果，run返回所有结果和隔离记录。
+    """
+
+    def __init__(self, classifier, batch_size=None, num_workers=2, num_slots=None, max_pixels=None,
+                 poll_interval=0.5):
+        """
+        参数:
+            classifier (ImageClassifier): 用于推理的分类器
+            batch_size (int): 批次大小，也是每个槽位的容量，默认取分类器机器配置中的批次大小
+            num_workers (int): 解码进程数量
+            num_slots (int): 槽位数量，默认为解码进程数量的两倍
+            max_pixels (int): 解码图像的像素预算，默认与分类器相同
+            poll_interval (float): 等待解码结果时检查解码进程状态的间隔（秒）
+        """
+        self.classifier = classifier
+        self.batch_size = default_batch_size(classifier) if batch_size is None else batch_size
+        self.num_workers = num_workers
+        self.num_slots = num_slots or 2 * num_workers
+        if max_pixels is None:
+            max_pixels = getattr(classifier, 'max_pixels', DEFAULT_MAX_PIXELS)
+        self.max_pixels = check_pixel_budget(max_pixels)
+        self.poll_interval = poll_interval
+        self.quarantine = []
+
+    def _next_filled(self, filled_slots, workers):
+        """等待下一个已填充的槽位，解码进程异常退出时抛出异常而不是永远等待"""
+        while True:
+            try:
+                return filled_slots.get(timeout=self.poll_interval)
+            except queue.Empty:
+                crashed = [w for w in workers if w.exitcode not in (None, 0)]
+                if crashed:
+                    raise RuntimeError(f"解码进程异常退出，退出码: {[w.exitcode for w in crashed]}")
+
+    def iter_batches(self, image_paths):
+        """
+        逐批解码并推理
+
+        参数:
+            image_paths (list): 图像路径列表
+
+        返回:
+            generator: 每次产生(路径列表, 形状为(B, 1000)的输出张量)，批次按解码完成的顺序返回
+        """
+        self.quarantine = []
+        batches = [list(image_paths[i:i + self.batch_size]) for i in range(0, len(image_paths), self.batch_size)]
+        if not batches:
+            return
+
+        context = multiprocessing.get_context('spawn')
+        tasks, free_slots, filled_slots = context.Queue(), context.Queue(), context.Queue()
+        ring = SharedBatchRing(self.num_slots, self.batch_size)
+        for slot in range(self.num_slots):
+            free_slots.put(slot)
+        for paths in batches:
+            tasks.put(paths)
+        workers = []
+        for _ in range(min(self.num_workers, len(batches))):
+            tasks.put(None)
+            workers.append(context.Process(
+                target=_decode_worker, args=(ring.spec(), tasks, free_slots, filled_slots, self.max_pixels),
+                daemon=True,
+            ))
+        for worker in workers:
+            worker.start()
+
+        try:
+            for _ in batches:
+                slot, valid, errors = self._next_filled(filled_slots, workers)
+                self.quarantine.extend(errors)
+                if valid:
+                    # torch.from_numpy直接共享槽位内存，uint8像素不经过单独的标准化步骤直接送入模型
+                    pixels = torch.from_numpy(ring.slot(slot)[:len(valid)])
+                    output = self.classifier.run_inference(pixels)
+                    pixels = None
+                    yield valid, output
+                free_slots.put(slot)
+            for worker in workers:
+                worker.join()
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            ring.close()
+
+    def run(self, image_paths):
+        """
+        对一批文件运行推理
+
+        参数:
+            image_paths (list): 图像路径列表
+
+        返回:
+            dict: 包含outputs（图像路径 -> 形状为(1000,)的输出张量）、quarantine（隔离记录列表）
+                  和num_batches（运行的批次数量）的字典
+        """
+        outputs = {}
+        num_batches = 0
+        for paths, batch_output in self.iter_batches(image_paths):
+            num_batches += 1
+            for image_path, row in zip(paths, batch_output):
+                outputs[image_path] = row
+        return {'outputs': outputs, 'quarantine': list(self.quarantine), 'num_batches': num_batches}
@@ -0,0 +1,251 @@
+"""
+长时间运行（soak）稳定性测试模块
+
+此模块在长时间重复运行推理流程的同时定期采样进程资源，并判断是否存在内存泄漏或吞吐量衰减：
+1. read_process_stats - 从/proc/self读取常驻内存（RSS）和打开的文件描述符数量，
+   并统计存活的张量数量和CUDA分配器的占用
+2. SoakMonitor - 每隔interval秒记录一次采样以及这段时间的吞吐量（图像/秒），
+   预热阶段（内存池和缓存填充）的采样不参与分析
+3. linear_trend - 对采样做最小二乘线性回归，返回斜率及其t统计量
+4. 只有同时满足两个条件才判定为失败：趋势在统计上显著（|t|超过阈值），且按斜率推算的
+   整个分析区间内的变化量超过实际容许量。前者排除噪声，后者排除显著但微不足道的漂移
+"""
+
+import gc
+import math
+import os
+import time
+import warnings
+
+import torch
+
+# 判定趋势显著的t统计量阈值。相邻采样之间存在自相关，名义p值偏乐观，因此取较保守的阈值
+DEFAULT_T_THRESHOLD = 3.0
+
+# 各内存指标在分析区间内的最大容许增长量
+DEFAULT_GROWTH_TOLERANCES = {
+    'rss_bytes': 32 * 1024 * 1024,
+    'num_fds': 4,
+    'live_tensors': 64,
+    'cuda_allocated_bytes': 16 * 1024 * 1024,
+}
+
+# 吞吐量在分析区间内的最大容许相对下降
+DEFAULT_MAX_THROUGHPUT_DECAY = 0.1
+
+# 进行趋势分析所需的最少采样数量
+MIN_SAMPLES = 5
+
+
+def _count_live_tensors():
+    """统计Python垃圾回收器跟踪的存活张量数量"""
+    count = 0
+    # 对部分已弃用的模块级对象做类型检查会触发FutureWarning
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for obj in gc.get_objects():
+            try:
+                if torch.is_tensor(obj):
+                    count += 1
+            except Exception:
+                # 部分对象（例如已失效的弱引用代理）在类型检查时会抛出异常
+                continue
+    return count
+
+
+def read_process_stats(count_tensors=True):
+    """
+    采样当前进程的资源占用
+
+    参数:
+        count_tensors (bool): 是否统计存活张量数量（需要遍历所有被跟踪的对象，对象很多时较慢）
+
+    返回:
+        dict: 包含rss_bytes、num_fds、live_tensors和cuda_allocated_bytes的字典，
+              当前平台无法获取的指标为None
+    """
+    stats = {'rss_bytes': None, 'num_fds': None, 'live_tensors': None, 'cuda_allocated_bytes': None}
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss_bytes'] = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    try:
+        stats['num_fds'] = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        pass
+    if count_tensors:
+        stats['live_tensors'] = _count_live_tensors()
+    if torch.cuda.is_available():
+        stats['cuda_allocated_bytes'] = torch.cuda.memory_allocated()
+    return stats
+
+
+def linear_trend(xs, ys):
+    """
+    最小二乘线性回归
+
+    参数:
+        xs (list): 自变量（例如采样时间）
+        ys (list): 因变量
+
+    返回:
+        dict: 包含slope（斜率）、stderr（斜率的标准误差）和t（斜率的t统计量）的字典。
+              残差为零时，斜率非零则t为±inf，斜率为零则t为0
+    """
+    n = len(xs)
+    if n < 3:
+        raise ValueError(f"线性回归至少需要3个点，实际为{n}个")
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        raise ValueError("自变量的取值全部相同，无法回归")
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    intercept = mean_y - slope * mean_x
+    residual = sum((y - intercept - slope * x) ** 2 for x, y in zip(xs, ys))
+    stderr = math.sqrt(residual / (n - 2) / sxx)
+    if stderr > 0:
+        t = slope / stderr
+    else:
+        t = math.copysign(math.inf, slope) if slope else 0.0
+    return {'slope': slope, 'stderr': stderr, 't': t}
+
+
+class SoakMonitor:
+    """
+    定期采样资源占用和吞吐量，并分析长期趋势
+
+    调用方在每完成一批工作后调用record(处理的图像数量)，距离上次采样超过interval秒时自动采样。
+    """
+
+    def __init__(self, interval=30.0, warmup=60.0, probe=read_process_stats, clock=time.monotonic):
+        """
+        参数:
+            interval (float): 采样间隔（秒）
+            warmup (float): 预热时长（秒），这段时间内的采样不参与趋势分析
+            probe (callable): 返回资源占用字典的函数，默认为read_process_stats
+            clock (callable): 返回当前时间（秒）的函数
+        """
+        self.interval = interval
+        self.warmup = warmup
+        self.probe = probe
+        self.clock = clock
+        self.start_time = clock()
+        self.last_sample_time = self.start_time
+        self.images_since_sample = 0
+        self.total_images = 0
+        self.samples = []
+
+    def record(self, num_images):
+        """
+        记录完成的图像数量，到达采样间隔时采样
+
+        返回:
+            dict: 本次产生的采样，没有采样时为None
+        """
+        self.images_since_sample += num_images
+        self.total_images += num_images
+        now = self.clock()
+        if now - self.last_sample_time < self.interval:
+            return None
+        return self.sample(now)
+
+    def sample(self, now=None):
+        """立即采样一次"""
+        now = self.clock() if now is None else now
+        elapsed = now - self.last_sample_time
+        sample = dict(self.probe())
+        sample['time'] = now - self.start_time
+        sample['images_per_sec'] = self.images_since_sample / elapsed if elapsed > 0 else None
+        self.samples.append(sample)
+        self.last_sample_time = now
+        self.images_since_sample = 0
+        return sample
+
+    def analyze(self, t_threshold=DEFAULT_T_THRESHOLD, growth_tolerances=None,
+                max_throughput_decay=DEFAULT_MAX_THROUGHPUT_DECAY):
+        """
+        分析预热之后的采样趋势
+
+        参数:
+            t_threshold (float): 判定趋势显著的t统计量阈值
+            growth_tolerances (dict): 指标名称 -> 分析区间内的最大容许增长量，默认为DEFAULT_GROWTH_TOLERANCES
+            max_throughput_decay (float): 吞吐量在分析区间内的最大容许相对下降
+
+        返回:
+            dict: 包含passed（是否通过）、failures（失败原因列表）、num_samples（参与分析的采样数）、
+                  span（分析区间时长，秒）和trends（指标名称 -> 趋势及推算变化量）的字典
+        """
+        tolerances = dict(DEFAULT_GROWTH_TOLERANCES)
+        tolerances.update(growth_tolerances or {})
+        samples = [s for s in self.samples if s['time'] >= self.warmup]
+        result = {'passed': True, 'failures': [], 'num_samples': len(samples), 'span': 0.0, 'trends': {}}
+        if len(samples) < MIN_SAMPLES:
+            result['failures'].append(f"预热后的采样只有{len(samples)}个，至少需要{MIN_SAMPLES}个，无法判断趋势")
+            result['passed'] = False
+            return result
+        span = samples[-1]['time'] - samples[0]['time']
+        result['span'] = span
+
+        def trend(metric):
+            points = [(s['time'], s[metric]) for s in samples if s.get(metric) is not None]
+            if len(points) < MIN_SAMPLES:
+                return None
+            fit = linear_trend([x for x, _ in points], [y for _, y in points])
+            fit['change'] = fit['slope'] * span
+            fit['mean'] = sum(y for _, y in points) / len(points)
+            result['trends'][metric] = fit
+            return fit
+
+        for metric, tolerance in tolerances.items():
+            fit = trend(metric)
+            if fit is not None and fit['t'] > t_threshold and fit['change'] > tolerance:
+                result['failures'].append(
+                    f"{metric}持续增长：{span:.0f}秒内增长{fit['change']:.0f}（容许{tolerance}），t={fit['t']:.1f}"
+                )
+
+        fit = trend('images_per_sec')
+        if fit is not None and fit['mean'] > 0:
+            fit['decay'] = -fit['change'] / fit['mean']
+            if fit['t'] < -t_threshold and fit['decay'] > max_throughput_decay:
+                result['failures'].append(
+                    f"吞吐量持续下降：{span:.0f}秒内下降{fit['decay']:.1%}（容许{max_throughput_decay:.0%}），t={fit['t']:.1f}"
+                )
+
+        result['passed'] = not result['failures']
+        return result
+
+
+def run_soak(step, duration, interval=30.0, warmup=60.0, probe=read_process_stats, clock=time.monotonic,
+             on_sample=None, **analyze_kwargs):
+    """
+    重复执行step直到duration秒后，返回采样和趋势分析结果
+
+    参数:
+        step (callable): 执行一批工作并返回处理的图像数量的函数
+        duration (float): 总运行时长（秒）
+        interval (float): 采样间隔（秒）
+        warmup (float): 预热时长（秒）
+        probe (callable): 资源采样函数
+        clock (callable): 时钟函数
+        on_sample (callable): 每次采样后以采样字典为参数调用，例如用于打印进度
+        **analyze_kwargs: 传给SoakMonitor.analyze的阈值参数
+
+    返回:
+        dict: analyze()的结果，另外包含samples（所有采样）和total_images（处理的图像总数）
+    """
+    monitor = SoakMonitor(interval=interval, warmup=warmup, probe=probe, clock=clock)
+    monitor.sample()
+    deadline = monitor.start_time + duration
+    while clock() < deadline:
+        sample = monitor.record(step())
+        if sample is not None and on_sample is not None:
+            on_sample(sample)
+    result = monitor.analyze(**analyze_kwargs)
+    result['samples'] = monitor.samples
+    result['total_images'] = monitor.total_images
+    return result
@@ -0,0 +1,418 @@
+"""
+分布式扫描协调模块
+
+此模块把（图像 × 扰动 × 严重程度 × 模型）的鲁棒性扫描拆分成任务，存放在一个SQLite工作队列中：
+1. create_sweep 写入所有任务，重复执行只会补充缺失的任务，不会重复已有任务
+2. 工作进程通过 acquire_lease 一次领取一批任务（租约），租约在 lease_timeout 秒后过期
+3. 工作进程运行 ImageClassifier 后通过 commit_results 提交结果，只有仍持有租约的进程才能提交
+4. 过期的租约（例如工作进程崩溃）会被重新分配给其他工作进程；已提交的任务不会重做，
+   因此任何时候中断后重新启动工作进程即可从断点继续
+
+队列就是一个SQLite文件，所有领取和提交操作都在 BEGIN IMMEDIATE 事务中完成。
+默认使用WAL日志模式，只适用于同一台主机上的工作进程：WAL依赖通过内存映射共享的-shm文件，
+在网络文件系统上无法正确同步，租约可能被重复领取。多台主机通过共享文件系统使用同一个队列时
+必须使用journal_mode='DELETE'（只依赖文件锁），共享文件系统需要支持可靠的POSIX文件锁，
+且各主机的时钟应大致同步（租约过期时间使用墙上时间）。
+"""
+
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import torch
+
+from .inference_runner import SUPPORTED_MODELS
+from .perturbations import PERTURBATIONS, SEVERITIES, apply_perturbation
+from .result_store import hash_image_file
+
+# 任务状态
+TASK_STATUSES = ['pending', 'leased', 'done', 'failed']
+
+# 支持的SQLite日志模式：'WAL'只适用于单台主机，'DELETE'适用于多台主机共享的网络文件系统
+SUPPORTED_JOURNAL_MODES = ['WAL', 'DELETE']
+
+# 默认租约时长（秒）和每个租约的最大任务数
+DEFAULT_LEASE_TIMEOUT = 300.0
+DEFAULT_LEASE_SIZE = 32
+
+# 任务被领取超过该次数仍未完成时标记为失败，避免一个导致工作进程崩溃的任务被无限重试
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    image TEXT NOT NULL,
+    perturbation TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_id TEXT,
+    worker TEXT,
+    expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    top1 INTEGER,
+    probability REAL,
+    error TEXT,
+    finished_at REAL,
+    UNIQUE (image, perturbation, severity, model)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, expires_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (lease_id);
+"""
+
+# 可领取的任务：待处理，或租约已过期
+_AVAILABLE = "(status = 'pending' OR (status = 'leased' AND expires_at < ?))"
+
+
+def task_seed(image_hash, perturbation, severity):
+    """
+    根据图像内容和扰动生成随机种子
+
+    种子只取决于图像文件的内容哈希（result_store.hash_image_file），与路径无关，
+    因此同一张图像无论位于哪台主机的哪个路径，在扫描和compare_runs.py中都得到相同的扰动。
+    """
+    return zlib.crc32(f"{image_hash}|{perturbation}|{severity}".encode('utf-8'))
+
+
+class SweepQueue:
+    """
+    基于SQLite的扫描任务队列
+
+    每个工作进程（包括同一台主机上的多个进程）应各自创建一个SweepQueue实例。
+    """
+
+    def __init__(self, db_path, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 clock=time.time, journal_mode='WAL'):
+        """
+        参数:
+            db_path (str): SQLite数据库文件路径，不存在时自动创建
+            lease_timeout (float): 租约时长（秒）
+            max_attempts (int): 单个任务最多被领取的次数
+            clock (callable): 返回当前时间（秒）的函数，测试时可以替换
+            journal_mode (str): SQLite日志模式，见SUPPORTED_JOURNAL_MODES；多台主机共享队列时使用'DELETE'
+
+        异常:
+            ValueError: 当日志模式不受支持时抛出
+        """
+        if journal_mode not in SUPPORTED_JOURNAL_MODES:
+            raise ValueError(f"不支持的日志模式: {journal_mode}。支持的模式: {SUPPORTED_JOURNAL_MODES}")
+        self.db_path = str(db_path)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.clock = clock
+        # isolation_level=None时由本类显式管理事务；timeout为等待其他进程释放写锁的时间
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """立即获取写锁的事务，保证领取和提交在多个进程之间是原子的"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def create_sweep(self, images, perturbations, severities=SEVERITIES, models=('resnet18',)):
+        """
+        写入扫描任务，已存在的任务会被忽略，因此可以重复执行
+
+        'identity'扰动（原始图像）只生成严重程度为0的一个任务。
+
+        参数:
+            images (list): 图像路径列表
+            perturbations (list): 扰动名称列表，见src.perturbations.PERTURBATIONS
+            severities (list): 严重程度列表
+            models (list): 模型名称列表
+
+        返回:
+            int: 新增的任务数量
+
+        异常:
+            ValueError: 当扰动名称、严重程度或模型不受支持时抛出
+        """
+        for model in models:
+            if model not in SUPPORTED_MODELS:
+                raise ValueError(f"不支持的模型: {model}。支持的模型: {SUPPORTED_MODELS}")
+        for name in perturbations:
+            if name != 'identity' and name not in PERTURBATIONS:
+                raise ValueError(f"不支持的扰动: {name}。支持的扰动: {['identity'] + list(PERTURBATIONS)}")
+        for severity in severities:
+            if severity not in SEVERITIES:
+                raise ValueError(f"不支持的严重程度: {severity}。支持的严重程度: {SEVERITIES}")
+
+        rows = []
+        for model in models:
+            for image in images:
+                for name in perturbations:
+                    for severity in ([0] if name == 'identity' else severities):
+                        rows.append((str(image), name, severity, model))
+
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (image, perturbation, severity, model) VALUES (?, ?, ?, ?)", rows
+            )
+            return conn.total_changes - before
+
+    def acquire_lease(self, worker_id, max_tasks=DEFAULT_LEASE_SIZE):
+        """
+        领取一批任务
+
+        一个租约内的任务属于同一个模型，并按图像排列，方便工作进程对同一张图像只解码一次。
+        已被领取max_attempts次的过期任务会被标记为失败而不再分配。
+
+        参数:
+            worker_id (str): 工作进程标识
+            max_tasks (int): 租约中的最大任务数
+
+        返回:
+            dict: 包含lease_id、model、expires_at和tasks的租约；没有可领取的任务时返回None
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired too many times', lease_id = NULL "
+                "WHERE status = 'leased' AND expires_at < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = conn.execute(
+                f"SELECT model FROM tasks WHERE {_AVAILABLE} ORDER BY task_id LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            model = row[0]
+            tasks = conn.execute(
+                f"SELECT task_id, image, perturbation, severity FROM tasks "
+                f"WHERE model = ? AND {_AVAILABLE} ORDER BY image, task_id LIMIT ?",
+                (model, now, max_tasks),
+            ).fetchall()
+
+            lease_id = uuid.uuid4().hex
+            expires_at = now + self.lease_timeout
+            conn.executemany(
+                "UPDATE tasks SET status = 'leased', lease_id = ?, worker = ?, expires_at = ?, "
+                "attempts = attempts + 1 WHERE task_id = ?",
+                [(lease_id, worker_id, expires_at, task[0]) for task in tasks],
+            )
+
+        return {
+            'lease_id': lease_id,
+            'model': model,
+            'expires_at': expires_at,
+            'tasks': [
+                {'task_id': task_id, 'image': image, 'perturbation': perturbation, 'severity': severity}
+                for task_id, image, perturbation, severity in tasks
+            ],
+        }
+
+    def renew_lease(self, lease_id):
+        """
+        延长租约，长时间处理一个租约的工作进程应定期调用
+
+        返回:
+            bool: 租约是否仍由调用者持有（已被重新分配时返回False）
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET expires_at = ? WHERE lease_id = ? AND status = 'leased'",
+                (self.clock() + self.lease_timeout, lease_id),
+            )
+            return cursor.rowcount > 0
+
+    def commit_results(self, lease_id, results):
+        """
+        提交租约中任务的结果
+
+        只有仍属于该租约的任务会被更新：租约过期后被其他工作进程重新领取的任务，
+        原工作进程提交的结果会被丢弃。
+
+        参数:
+            lease_id (str): 租约ID
+            results (list): 结果字典列表，每个字典包含task_id，以及top1和probability（成功时）
+                            或error（失败时）
+
+        返回:
+            int: 实际提交的任务数量
+        """
+        now = self.clock()
+        committed = 0
+        with self._transaction() as conn:
+            for result in results:
+                status = 'failed' if result.get('error') else 'done'
+                cursor = conn.execute(
+                    "UPDATE tasks SET status = ?, top1 = ?, probability = ?, error = ?, finished_at = ?, "
+                    "expires_at = NULL WHERE task_id = ? AND lease_id = ? AND status = 'leased'",
+                    (status, result.get('top1'), result.get('probability'), result.get('error'), now,
+                     result['task_id'], lease_id),
+                )
+                committed += cursor.rowcount
+        return committed
+
+    def progress(self):
+        """
+        返回扫描进度
+
+        返回:
+            dict: 各状态的任务数量，以及total和expired（租约已过期、等待重新分配的任务数）
+        """
+        counts = dict.fromkeys(TASK_STATUSES, 0)
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        counts['total'] = sum(counts[status] for status in TASK_STATUSES)
+        counts['expired'] = self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND expires_at < ?", (self.clock(),)
+        ).fetchone()[0]
+        return counts
+
+    def results(self):
+        """
+        返回所有已完成任务的结果
+
+        返回:
+            list: 结果字典列表，包含image、perturbation、severity、model、top1、probability和worker
+        """
+        rows = self.conn.execute(
+            "SELECT image, perturbation, severity, model, top1, probability, worker FROM tasks "
+            "WHERE status = 'done' ORDER BY task_id"
+        ).fetchall()
+        keys = ['image', 'perturbation', 'severity', 'model', 'top1', 'probability', 'worker']
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def process_lease(classifier, lease, renew=None):
+    """
+    在当前进程中运行一个租约的所有任务
+
+    同一张图像只解码一次，该图像的所有扰动拼成一个批次进行推理。
+    解码或推理中的任何异常都只记为该图像各任务的错误，工作进程不会在持有租约时崩溃。
+
+    参数:
+        classifier (ImageClassifier): 与租约模型对应的分类器
+        lease (dict): acquire_lease返回的租约
+        renew (callable): 每处理完一张图像调用一次，返回False表示租约已丢失，此时停止处理
+
+    返回:
+        list: 可以传给commit_results的结果字典列表
+    """
+    groups = {}
+    for task in lease['tasks']:
+        groups.setdefault(task['image'], []).append(task)
+
+    results = []
+    for image, tasks in groups.items():
+        try:
+            input_tensor = classifier.load_and_preprocess_image(image)
+            image_hash = hash_image_file(image)
+            batch = torch.cat([
+                apply_perturbation(input_tensor, task['perturbation'], task['severity'], classifier.mean,
+                                   classifier.std, seed=task_seed(image_hash, task['perturbation'], task['severity']))
+                for task in tasks
+            ])
+            probabilities = torch.softmax(classifier.run_inference(batch), dim=1)
+        except Exception as e:
+            results += [{'task_id': task['task_id'], 'error': f"{type(e).__name__}: {e}"} for task in tasks]
+        else:
+            top_probs, top_classes = probabilities.max(dim=1)
+            results += [
+                {'task_id': task['task_id'], 'top1': int(top1), 'probability': float(prob)}
+                for task, top1, prob in zip(tasks, top_classes, top_probs)
+            ]
+
+        if renew is not None and not renew():
+            break
+    return results
+
+
+def run_worker(db_path, worker_id=None, max_tasks=DEFAULT_LEASE_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+               max_leases=None, wait=True, poll_interval=1.0, cache_path=None, journal_mode='WAL',
+               runtime_profile=None):
+    """
+    运行一个工作进程：循环领取租约、推理并提交结果，直到扫描完成
+
+    参数:
+        db_path (str): 队列数据库路径
+        worker_id (str): 工作进程标识，默认为"主机名:进程号"
+        max_tasks (int): 每个租约的最大任务数
+        lease_timeout (float): 租约时长（秒）
+        max_leases (int): 最多处理的租约数量，为None时不限制
+        wait (bool): 没有可领取的任务但仍有其他工作进程持有租约时，是否等待这些租约完成或过期
+        poll_interval (float): 等待时的轮询间隔（秒）
+        cache_path (str): logits缓存的磁盘存储路径，多个工作进程和多次扫描可以共享，
+                          重复的扰动输入不再重复推理；为None时不启用缓存
+        journal_mode (str): 队列和缓存数据库的SQLite日志模式，多台主机共享时使用'DELETE'
+        runtime_profile: 传给ImageClassifier的机器配置（线程数等），为None时不应用
+
+    返回:
+        int: 本工作进程提交的任务数量
+    """
+    from .inference_runner import ImageClassifier
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    queue = SweepQueue(db_path, lease_timeout=lease_timeout, journal_mode=journal_mode)
+    classifiers = {}
+    committed = 0
+    leases = 0
+    try:
+        while max_leases is None or leases < max_leases:
+            lease = queue.acquire_lease(worker_id, max_tasks=max_tasks)
+            if lease is None:
+                if wait and queue.progress()['leased'] > 0:
+                    time.sleep(poll_interval)
+                    continue
+                break
+
+            leases += 1
+            model = lease['model']
+            try:
+                if model not in classifiers:
+                    classifiers[model] = ImageClassifier(model_name=model, runtime_profile=runtime_profile)
+                    if cache_path is not None:
+                        classifiers[model].enable_cache(path=cache_path, journal_mode=journal_mode)
+            except ValueError as e:
+                # 队列中的模型无法加载时把任务记为失败，而不是带着租约退出
+                results = [{'task_id': task['task_id'], 'error': f"{type(e).__name__}: {e}"}
+                           for task in lease['tasks']]
+            else:
+                results = process_lease(classifiers[model], lease,
+                                        renew=lambda: queue.renew_lease(lease['lease_id']))
+            committed += queue.commit_results(lease['lease_id'], results)
+    finally:
+        queue.close()
+        for classifier in classifiers.values():
+            classifier.disable_cache()
+    return committed
+
+
+def run_local_workers(db_path, num_workers=2, **worker_kwargs):
+    """
+    在本机启动多个工作进程处理同一个队列
+
+    参数:
+        db_path (str): 队列数据库路径
+        num_workers (int): 工作进程数量
+        **worker_kwargs: 传给run_worker的其他参数
+
+    返回:
+        list: 每个工作进程提交的任务数量
+    """
+    context = multiprocessing.get_context('spawn')
+    hostname = socket.gethostname()
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(run_worker, db_path, worker_id=f"{hostname}:local{i}", **worker_kwargs)
+            for i in range(num_workers)
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,126 @@
+"""
+测试时增强（TTA）模块
+
+此模块为每张图像生成多个视图，一次前向传播后在张量上合并各视图的输出：
+1. 视图模式：'center'（中心裁剪）、'flip'（中心裁剪及其水平翻转）、
+   'five_crop'（中心和四个角）、'ten_crop'（五个裁剪及其水平翻转）
+2. 多尺度：每个尺度先把图像短边缩放到 round(256 × scale)，再在缩放后的图像上生成裁剪视图
+3. 一个批次中所有图像的所有视图通过切片生成，只在最后拼接成一个(B × V, 3, 224, 224)的张量，
+   整个批次只做一次前向传播
+4. 合并方式：'mean'对各视图的logits取平均；'vote'统计各视图top-1的票数比例
+"""
+
+import torch
+
+# 支持的视图模式和合并方式
+SUPPORTED_TTA_MODES = ['center', 'flip', 'five_crop', 'ten_crop']
+SUPPORTED_REDUCTIONS = ['mean', 'vote']
+
+
+def num_views(mode, scales=(1.0,)):
+    """返回每张图像的视图数量"""
+    if mode not in SUPPORTED_TTA_MODES:
+        raise ValueError(f"不支持的TTA模式: {mode}。支持的模式: {SUPPORTED_TTA_MODES}")
+    per_scale = {'center': 1, 'flip': 2, 'five_crop': 5, 'ten_crop': 10}[mode]
+    return per_scale * len(scales)
+
+
+def crop_views(image, mode, crop_size=224):
+    """
+    在一张缩放后的图像上生成裁剪视图
+
+    参数:
+        image (torch.Tensor): 形状为(3, H, W)的图像张量，H和W都不小于crop_size
+        mode (str): 视图模式，见SUPPORTED_TTA_MODES
+        crop_size (int): 裁剪尺寸
+
+    返回:
+        list: 视图张量列表，第一个视图总是中心裁剪；除翻转外都是不复制数据的切片
+    """
+    if mode not in SUPPORTED_TTA_MODES:
+        raise ValueError(f"不支持的TTA模式: {mode}。支持的模式: {SUPPORTED_TTA_MODES}")
+    height, width = image.shape[1:]
+    if height < crop_size or width < crop_size:
+        raise ValueError(f"图像尺寸{height}x{width}小于裁剪尺寸{crop_size}")
+
+    top = int(round((height - crop_size) / 2.0))
+    left = int(round((width - crop_size) / 2.0))
+    offsets = [(top, left)]
+    if mode in ('five_crop', 'ten_crop'):
+        offsets += [(0, 0), (0, width - crop_size), (height - crop_size, 0), (height - crop_size, width - crop_size)]
+
+    views = [image[:, y:y + crop_size, x:x + crop_size] for y, x in offsets]
+    if mode in ('flip', 'ten_crop'):
+        views += [view.flip(-1) for view in views]
+    return views
+
+
+def reduce_views(logits, views_per_image, reduction='mean'):
+    """
+    在张量上合并每张图像各视图的输出
+
+    参数:
+        logits (torch.Tensor): 形状为(B × V, C)的模型输出，同一张图像的视图相邻
+        views_per_image (int): 每张图像的视图数量V
+        reduction (str): 'mean' - 返回各视图logits的平均值；
+                         'vote' - 返回各类别获得的top-1票数比例（票数相同时类别索引小的优先）
+
+    返回:
+        torch.Tensor: 形状为(B, C)的合并结果
+    """
+    if reduction not in SUPPORTED_REDUCTIONS:
+        raise ValueError(f"不支持的合并方式: {reduction}。支持的方式: {SUPPORTED_REDUCTIONS}")
+    logits = logits.view(-1, views_per_image, logits.shape[-1])
+    if reduction == 'mean':
+        return logits.mean(dim=1)
+    votes = torch.zeros(logits.shape[0], logits.shape[2], dtype=logits.dtype)
+    votes.scatter_add_(1, logits.argmax(dim=2), torch.ones(logits.shape[:2], dtype=logits.dtype))
+    return votes / views_per_image
+
+
+def tta_robustness(classifier, image_paths, perturbations, mode='ten_crop', scales=(1.0,), reduction='mean'):
+    """
+    比较单视图推理和TTA在扰动下的top-1翻转率
+
+    每种方法的翻转都相对于该方法自己在原始图像上的预测计算。扰动作用于每个视图。
+
+    参数:
+        classifier (ImageClassifier): 分类器
+        image_paths (list): 图像路径列表
+        perturbations (list): (扰动名称, 严重程度)元组列表
+        mode (str): TTA视图模式
+        scales (tuple): TTA尺度
+        reduction (str): TTA合并方式
+
+    返回:
+        dict: 扰动标签'名称:严重程度' -> {'single_flip_rate', 'tta_flip_rate'}
+    """
+    from .perturbations import apply_perturbation
+
+    single = classifier.normalize(torch.cat([classifier.load_and_preprocess_image(p) for p in image_paths]))
+    views = []
+    for path in image_paths:
+        views += classifier.load_tta_views(path, mode=mode, scales=scales, as_list=True)
+    views = classifier.normalize(torch.stack(views))
+    views_per_image = num_views(mode, scales)
+
+    def predict(perturbation):
+        single_input, views_input = single, views
+        if perturbation is not None:
+            name, severity = perturbation
+            single_input = apply_perturbation(single, name, severity, classifier.mean, classifier.std)
+            views_input = apply_perturbation(views, name, severity, classifier.mean, classifier.std)
+        # 单视图和所有TTA视图拼成一个批次
+        logits = classifier.run_inference(torch.cat([single_input, views_input]))
+        single_logits, view_logits = logits[:len(image_paths)], logits[len(image_paths):]
+        return single_logits.argmax(dim=1), reduce_views(view_logits, views_per_image, reduction).argmax(dim=1)
+
+    clean_single, clean_tta = predict(None)
+    results = {}
+    for name, severity in perturbations:
+        single_predictions, tta_predictions = predict((name, severity))
+        results[f"{name}:{severity}"] = {
+            'single_flip_rate': (single_predictions != clean_single).float().mean().item(),
+            'tta_flip_rate': (tta_predictions != clean_tta).float().mean().item(),
+        }
+    return results
@@ -0,0 +1,71 @@
+"""
+对抗扰动测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _to_pixels(classifier, tensor):
+    """将标准化张量转换回像素空间"""
+    return tensor * classifier.std + classifier.mean
+
+
+class TestAdversarial:
+    """对抗扰动测试类"""
+
+    def test_model_parameters_frozen(self, classifier):
+        """测试模型参数已冻结，不会计算参数梯度"""
+        assert all(not p.requires_grad for p in classifier.model.parameters()), "模型参数未被冻结"
+
+    def test_fgsm_linf_budget(self, classifier, processed_test_image):
+        """测试FGSM在L∞预算下的扰动幅度"""
+        batch = processed_test_image.repeat(2, 1, 1, 1)
+        epsilon = 4 / 255
+        adversarial = classifier.generate_adversarial_examples(batch, method='fgsm', epsilon=epsilon)
+
+        assert adversarial.shape == batch.shape, f"对抗样本形状错误: {adversarial.shape}"
+        pixel_diff = (_to_pixels(classifier, adversarial) - _to_pixels(classifier, batch)).abs()
+        assert pixel_diff.max() <= epsilon + 1e-5, f"扰动超出L∞预算: {pixel_diff.max()}"
+        assert pixel_diff.max() > 0, "FGSM没有产生任何扰动"
+        assert all(not p.requires_grad for p in classifier.model.parameters()), "攻击后模型参数被解冻"
+
+    def test_pgd_l2_budget(self, classifier, processed_test_image):
+        """测试PGD在L2预算下的扰动幅度"""
+        batch = processed_test_image.repeat(2, 1, 1, 1)
+        epsilon = 0.5
+        generator = torch.Generator().manual_seed(0)
+        adversarial = classifier.generate_adversarial_examples(
+            batch, method='pgd', norm='l2', epsilon=epsilon, steps=2, generator=generator
+        )
+
+        delta = _to_pixels(classifier, adversarial) - _to_pixels(classifier, batch)
+        norms = delta.flatten(1).norm(p=2, dim=1)
+        assert (norms <= epsilon + 1e-4).all(), f"扰动超出L2预算: {norms}"
+
+    def test_chunking_does_not_change_result(self, classifier, processed_test_image):
+        """测试分块大小不影响FGSM的结果"""
+        batch = processed_test_image.repeat(3, 1, 1, 1)
+        full = classifier.generate_adversarial_examples(batch, chunk_size=3)
+        chunked = classifier.generate_adversarial_examples(batch, chunk_size=1)
+        # 梯度接近0的像素可能因浮点误差改变符号，只允许极少数元素不同
+        mismatch = (~torch.isclose(full, chunked, atol=1e-5)).float().mean()
+        assert mismatch < 1e-3, f"分块计算的对抗样本与整批计算结果不一致，差异比例: {mismatch}"
+
+    def test_robustness_report(self, classifier, processed_test_image):
+        """测试鲁棒准确率评估结果的格式"""
+        batch = processed_test_image.repeat(2, 1, 1, 1)
+        report = classifier.evaluate_adversarial_robustness(batch, method='fgsm', epsilon=2 / 255)
+
+        assert report['num_samples'] == 2
+        assert report['clean_accuracy'] == 1.0, "未提供标签时干净准确率应为1"
+        assert 0.0 <= report['robust_accuracy'] <= 1.0
+        assert report['adversarial_predictions'].shape == torch.Size([2])
+
+    def test_invalid_attack_method(self, classifier, processed_test_image):
+        """测试不支持的攻击方法"""
+        with pytest.raises(ValueError):
+            classifier.generate_adversarial_examples(processed_test_image, method='cw')
@@ -0,0 +1,60 @@
+"""
+批次不变性检查测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.batch_invariance import run_batched, check_batch_invariance, torch_num_threads
+
+
+@pytest.fixture
+def mixed_batch(classifier, test_image_path, edge_case_image_path):
+    """提供由测试图像和边缘情况图像组成的3张图像批次"""
+    return torch.cat([
+        classifier.load_and_preprocess_image(test_image_path),
+        classifier.load_and_preprocess_image(edge_case_image_path),
+        classifier.load_and_preprocess_image(test_image_path).flip(-1),
+    ], dim=0)
+
+
+class TestBatchInvariance:
+    """批次不变性检查测试类"""
+
+    def test_torch_num_threads_restores_setting(self):
+        """测试线程数上下文管理器会恢复原来的设置"""
+        previous = torch.get_num_threads()
+        with torch_num_threads(1):
+            assert torch.get_num_threads() == 1
+        assert torch.get_num_threads() == previous
+
+    def test_padded_remainder_output_shape(self, classifier, processed_test_image):
+        """测试补齐余数批次后丢弃补齐部分的输出"""
+        inputs = processed_test_image.repeat(3, 1, 1, 1)
+        output = run_batched(classifier, inputs, batch_size=2, pad_remainder=True)
+        assert output.shape == torch.Size([3, 1000]), f"输出形状错误: {output.shape}"
+
+    def test_batched_forward_matches_single(self, classifier, mixed_batch):
+        """测试真正的批量前向传播与逐张推理结果一致"""
+        report = check_batch_invariance(classifier, mixed_batch, batch_sizes=[1, 2, 3], atol=1e-3)
+
+        # 批次大小2有余数，应包含补齐与不补齐两种运行
+        assert len(report['runs']) == 4
+        for run in report['runs']:
+            assert len(run['per_image_drift']) == 3
+            assert run['top1_disagreements'] == [], \
+                f"批次大小{run['batch_size']}(padded={run['padded']})改变了top-1预测"
+        assert report['invariant'], f"批量推理数值漂移超出容差: {[r['max_drift'] for r in report['runs']]}"
+
+    def test_logit_cache_bypassed(self, classifier, mixed_batch):
+        """测试检查期间不经过logits缓存，结束后恢复分类器原来的缓存"""
+        cache = classifier.enable_cache()
+        try:
+            report = check_batch_invariance(classifier, mixed_batch, batch_sizes=[2], atol=1e-3)
+            assert cache.get_stats()['lookups'] == 0, "批次不变性检查使用了缓存的结果"
+            assert classifier.cache is cache
+            assert len(report['runs']) == 2
+        finally:
+            classifier.disable_cache()
@@ -0,0 +1,139 @@
+"""
+错误隔离批量推理测试
+"""
+
+import pytest
+import shutil
+import time
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.batch_runner import BatchRunner, sniff_image_format, validate_image_file
+from src.errors import UnsupportedImageFormatError, CorruptImageError
+
+
+@pytest.fixture
+def mixed_files(tmp_path):
+    """提供混合了正常图像、非图像文件、截断图像和不存在文件的路径列表"""
+    truncated_path = str(tmp_path / 'truncated.jpg')
+    with open('data/cat.jpg', 'rb') as f:
+        data = f.read()
+    with open(truncated_path, 'wb') as f:
+        f.write(data[:len(data) // 10])
+
+    fake_png_path = str(tmp_path / 'fake.png')
+    shutil.copy('data/dummy.txt', fake_png_path)
+
+    return {
+        'good': ['data/cat.jpg', 'data/black.jpg', 'data/white.jpg', 'data/noise.jpg'],
+        'bad': ['data/dummy.txt', fake_png_path, truncated_path, str(tmp_path / 'missing.jpg')],
+    }
+
+
+class TestBatchRunner:
+    """错误隔离批量推理测试类"""
+
+    def test_sniff_image_format(self):
+        """测试根据魔数识别图像格式"""
+        assert sniff_image_format('data/cat.jpg') == 'JPEG'
+        assert sniff_image_format('data/dummy.txt') is None
+
+    def test_validate_non_image_file(self):
+        """测试非图像文件被识别为不受支持的格式"""
+        with pytest.raises(UnsupportedImageFormatError):
+            validate_image_file('data/dummy.txt')
+
+    def test_non_image_file_raises_typed_error(self, classifier):
+        """测试直接加载非图像文件时抛出具体的异常类型"""
+        with pytest.raises(UnsupportedImageFormatError):
+            classifier.load_and_preprocess_image('data/dummy.txt')
+
+    def test_bad_files_quarantined_and_batches_full(self, classifier, mixed_files):
+        """测试坏文件被隔离，正常图像仍被打包成完整批次"""
+        runner = BatchRunner(classifier, batch_size=2, num_workers=2)
+        result = runner.run(mixed_files['good'] + mixed_files['bad'])
+
+        assert sorted(result['outputs']) == sorted(mixed_files['good'])
+        assert result['num_batches'] == 2, "4张正常图像应被打包成2个完整批次"
+        for output in result['outputs'].values():
+            assert output.shape == (1000,)
+
+        errors = {entry['path']: entry['error_type'] for entry in result['quarantine']}
+        assert sorted(errors) == sorted(mixed_files['bad'])
+        assert errors['data/dummy.txt'] == 'UnsupportedImageFormatError'
+        assert errors[mixed_files['bad'][1]] == 'UnsupportedImageFormatError'
+        assert errors[mixed_files['bad'][2]] == CorruptImageError.__name__
+        assert errors[mixed_files['bad'][3]] == 'FileNotFoundError'
+
+    def test_slow_decode_times_out(self, classifier, monkeypatch):
+        """测试解码超时的文件被隔离，且不会阻塞其他文件"""
+        original_loader = classifier.load_and_preprocess_image
+
+        def slow_loader(image_path, max_pixels=None):
+            if image_path == 'data/noise.jpg':
+                time.sleep(2)
+            return original_loader(image_path, max_pixels=max_pixels)
+
+        monkeypatch.setattr(classifier, 'load_and_preprocess_image', slow_loader)
+        runner = BatchRunner(classifier, batch_size=2, num_workers=2, decode_timeout=0.5)
+
+        start = time.monotonic()
+        result = runner.run(['data/cat.jpg', 'data/noise.jpg', 'data/black.jpg'])
+        assert time.monotonic() - start < 2, "超时的解码阻塞了流水线"
+
+        assert sorted(result['outputs']) == ['data/black.jpg', 'data/cat.jpg']
+        assert [entry['error_type'] for entry in result['quarantine']] == ['DecodeTimeoutError']
+
+    def test_all_workers_stuck(self, classifier, monkeypatch):
+        """测试所有解码线程都卡住时，剩余文件判定为超时而不是无限等待"""
+        import threading
+        release = threading.Event()
+        original_loader = classifier.load_and_preprocess_image
+
+        def hanging_loader(image_path, max_pixels=None):
+            if image_path == 'data/noise.jpg':
+                release.wait(30)
+            return original_loader(image_path, max_pixels=max_pixels)
+
+        monkeypatch.setattr(classifier, 'load_and_preprocess_image', hanging_loader)
+        runner = BatchRunner(classifier, batch_size=2, num_workers=1, decode_timeout=0.3)
+        try:
+            start = time.monotonic()
+            result = runner.run(['data/noise.jpg', 'data/cat.jpg', 'data/black.jpg'])
+            assert time.monotonic() - start < 5, "所有线程卡住后流水线没有结束"
+        finally:
+            release.set()
+
+        assert result['outputs'] == {}
+        assert sorted(entry['path'] for entry in result['quarantine']) == \
+            ['data/black.jpg', 'data/cat.jpg', 'data/noise.jpg']
+        assert {entry['error_type'] for entry in result['quarantine']} == {'DecodeTimeoutError'}
+
+    def test_mpo_accepted_as_jpeg(self, tmp_path):
+        """测试多图JPEG（MPO）不会因为文件头格式与魔数不一致而被判定为损坏"""
+        from PIL import Image
+        path = str(tmp_path / 'camera.jpg')
+        frames = [Image.new('RGB', (64, 64), color) for color in ('red', 'blue')]
+        frames[0].save(path, format='MPO', save_all=True, append_images=frames[1:])
+        with Image.open(path) as image:
+            assert image.format == 'MPO'
+        assert validate_image_file(path)['format'] == 'JPEG'
+
+    def test_decode_stats_counted_across_threads(self, monkeypatch):
+        """测试多个解码线程并发更新分类器的统计信息时不会丢失计数"""
+        import src.inference_runner as inference_runner
+        # 使用单独的分类器：其他测试中超时的解码线程可能仍在更新共享分类器的统计
+        classifier = inference_runner.ImageClassifier()
+        real_open = inference_runner.open_image_within_budget
+
+        def slow_open(*args, **kwargs):
+            # 放大读改写之间的时间窗口，没有锁时并发更新会互相覆盖
+            result = real_open(*args, **kwargs)
+            time.sleep(0.001)
+            return result
+
+        monkeypatch.setattr(inference_runner, 'open_image_within_budget', slow_open)
+        paths = ['data/black.jpg', 'data/white.jpg'] * 16
+        result = BatchRunner(classifier, batch_size=8, num_workers=8).run(paths)
+        assert len(result['outputs']) == 2
+        assert classifier.get_stats()['images_loaded'] == len(paths)
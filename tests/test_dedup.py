@@ -0,0 +1,111 @@
+"""
+感知哈希去重测试
+"""
+
+import pytest
+import numpy as np
+import os
+import sys
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dedup import perceptual_hash, DedupIndex, fan_out
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """两个目录中不同尺寸的纯色图像和噪声图像，与生成脚本的输出相同"""
+    (tmp_path / 'test_images').mkdir()
+    rng = np.random.default_rng(0)
+    for directory, size in [(tmp_path, 224), (tmp_path / 'test_images', 300)]:
+        Image.new('RGB', (size, size), color='black').save(directory / 'black.jpg')
+        Image.new('RGB', (size, size), color='white').save(directory / 'white.jpg')
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(directory / 'noise.jpg')
+    (tmp_path / 'test_images' / 'dummy.txt').write_text("不是图像")
+    return tmp_path
+
+
+class TestDedup:
+    """感知哈希去重测试类"""
+
+    def test_hash_separates_colours_and_merges_sizes(self, image_dir):
+        """测试纯黑和纯白图像不会被合并，不同尺寸的纯黑图像会被合并"""
+        black = perceptual_hash(str(image_dir / 'black.jpg'))
+        assert black != perceptual_hash(str(image_dir / 'white.jpg'))
+        assert black == perceptual_hash(str(image_dir / 'test_images' / 'black.jpg'))
+        assert perceptual_hash(str(image_dir / 'noise.jpg')) != perceptual_hash(str(image_dir / 'test_images' / 'noise.jpg'))
+
+    def test_group_and_fan_out(self, image_dir):
+        """测试分组后只有规范图像需要推理，结果分发给所有别名，无法解码的文件单独成组"""
+        index = DedupIndex(str(image_dir))
+        paths = sorted(str(p) for p in image_dir.rglob('*') if p.is_file())
+        groups = index.group(paths)
+        # 7个文件：两张黑图、两张白图各合并为一组，两张噪声图和dummy.txt各自成组
+        assert len(groups) == 5
+        assert sorted(len(members) for members in groups.values()) == [1, 1, 1, 2, 2]
+
+        outputs = {canonical: i for i, canonical in enumerate(groups)}
+        results = fan_out(outputs, groups)
+        assert set(results) == set(paths)
+        assert results[str(image_dir / 'black.jpg')] == results[str(image_dir / 'test_images' / 'black.jpg')]
+        # 推理时被隔离的规范文件不会出现在结果中
+        dummy = str(image_dir / 'test_images' / 'dummy.txt')
+        del outputs[dummy]
+        assert dummy not in fan_out(outputs, groups)
+
+    def test_manifest_round_trip_and_invalidation(self, image_dir):
+        """测试清单保存后可以重新加载，文件改变后旧记录失效，别名改由下一个文件代表"""
+        manifest_path = str(image_dir / 'dedup_manifest.json')
+        index = DedupIndex.load(manifest_path)
+        black, alias = str(image_dir / 'black.jpg'), str(image_dir / 'test_images' / 'black.jpg')
+        index.add(black)
+        assert index.add(alias) == os.path.normpath(black)
+        index.save(manifest_path)
+
+        index = DedupIndex.load(manifest_path)
+        assert index.canonical_for(alias) == os.path.normpath(black)
+
+        # 把规范文件改写为白色图像：它的记录失效，原来的别名成为新的规范文件
+        Image.new('RGB', (64, 64), color='white').save(black)
+        os.utime(black, ns=(0, 0))
+        assert index.canonical_for(black) is None
+        assert index.add(black) == os.path.normpath(black)
+        assert index.canonical_for(alias) == os.path.normpath(alias)
+        assert index.add(str(image_dir / 'white.jpg')) == os.path.normpath(black)
+
+    def test_alias_regrouped_when_canonical_changes(self, tmp_path):
+        """测试别名未变而规范文件被改写或删除时，别名不再返回过期的规范文件"""
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            Image.new('RGB', (64, 64), color='black').save(tmp_path / name)
+        a, b, c = (str(tmp_path / name) for name in ('a.jpg', 'b.jpg', 'c.jpg'))
+        index = DedupIndex(str(tmp_path))
+        assert index.group([a, b, c]) == {os.path.normpath(a): [a, b, c]}
+
+        # 规范文件被改写为白色图像：别名交给下一个别名，a重新哈希后单独成组
+        Image.new('RGB', (64, 64), color='white').save(a)
+        os.utime(a, ns=(0, 0))
+        assert index.canonical_for(b) is None
+        assert index.group([b]) == {os.path.normpath(b): [b]}
+        assert index.group([c, a]) == {os.path.normpath(b): [c], os.path.normpath(a): [a]}
+
+        # 新的规范文件被删除：剩下的别名成为规范文件
+        os.remove(b)
+        assert index.group([c]) == {os.path.normpath(c): [c]}
+
+    @pytest.mark.parametrize('order', [('b.jpg', 'a.jpg'), ('a.jpg', 'b.jpg')])
+    def test_alias_joins_new_canonical_after_rewrite(self, tmp_path, order):
+        """测试规范文件被改写、同一哈希已有新的规范文件后，旧别名加入新的规范文件（直接调用add，不经过group）"""
+        for name in ('a.jpg', 'b.jpg'):
+            Image.new('RGB', (64, 64), color='black').save(tmp_path / name)
+        index = DedupIndex(str(tmp_path))
+        index.add(str(tmp_path / 'a.jpg'))
+        assert index.add(str(tmp_path / 'b.jpg')) == os.path.normpath(str(tmp_path / 'a.jpg'))
+
+        Image.new('RGB', (64, 64), color='white').save(tmp_path / 'a.jpg')
+        os.utime(tmp_path / 'a.jpg', ns=(0, 0))
+        Image.new('RGB', (64, 64), color='black').save(tmp_path / 'c.jpg')
+        assert index.add(str(tmp_path / 'c.jpg')) == os.path.normpath(str(tmp_path / 'c.jpg'))
+
+        expected = {'a.jpg': 'a.jpg', 'b.jpg': 'c.jpg'}
+        for name in order:
+            assert index.add(str(tmp_path / name)) == os.path.normpath(str(tmp_path / expected[name]))
+        assert index.entries['b.jpg']['canonical'] == 'c.jpg'
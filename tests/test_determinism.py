@@ -0,0 +1,61 @@
+"""
+确定性审计测试
+"""
+
+import pytest
+import numpy as np
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.determinism import hash_rows, make_config, compare_runs, audit_determinism
+
+
+class TestDeterminismAudit:
+    """确定性审计测试类"""
+
+    def test_hash_rows_compact_and_stable(self):
+        """测试每行哈希紧凑且对相同数据稳定"""
+        output = torch.randn(3, 1000)
+        hashes = hash_rows(output)
+        assert len(hashes) == 3
+        assert all(len(h) == 16 for h in hashes), "哈希长度应为8字节"
+        assert hashes == hash_rows(output.clone()), "相同输出的哈希不同"
+        assert len(set(hashes)) == 3, "不同行的哈希发生冲突"
+
+    def test_compare_runs_reports_diverged_rows(self):
+        """测试比较结果能准确定位不一致的图像"""
+        outputs = np.random.rand(4, 10).astype(np.float32)
+        changed = outputs.copy()
+        changed[2, 5] += 0.5
+        reference = {'config': make_config(name='ref'), 'hashes': hash_rows(outputs), 'outputs': outputs}
+        candidate = {'config': make_config(name='cand'), 'hashes': hash_rows(changed), 'outputs': changed}
+
+        result = compare_runs(reference, candidate, image_ids=['a', 'b', 'c', 'd'])
+        assert not result['deterministic']
+        assert [row['image'] for row in result['diverged']] == ['c']
+        assert result['max_abs_diff'] == pytest.approx(0.5, abs=1e-6)
+
+    def test_invalid_backend(self):
+        """测试不支持的后端"""
+        with pytest.raises(ValueError):
+            make_config(backend='cuda_graphs')
+
+    def test_audit_across_processes(self, processed_test_image):
+        """测试在独立进程中以不同批次大小运行审计"""
+        inputs = processed_test_image.repeat(2, 1, 1, 1)
+        configs = [make_config(batch_size=1), make_config(batch_size=1, name='restart')]
+        report = audit_determinism(inputs, configs, max_workers=2)
+
+        assert report['num_images'] == 2
+        assert len(report['reference_hashes']) == 2
+        assert report['deterministic'], f"进程重启后输出不一致: {report['results']}"
+
+    def test_each_config_gets_fresh_process(self, processed_test_image, tmp_path):
+        """测试只有一个并行进程时，每个配置仍在新的进程中运行，子进程只返回哈希"""
+        from src.determinism import _run_isolated
+        configs = [make_config(backend='deterministic', name='det'), make_config(name='plain')]
+        runs = _run_isolated(processed_test_image, configs, 'resnet18', 1, str(tmp_path))
+        assert runs[0]['pid'] != runs[1]['pid']
+        assert all('outputs' not in run and os.path.exists(run['output_path']) for run in runs)
+        assert runs[0]['hashes'] == runs[1]['hashes']
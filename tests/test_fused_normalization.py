@@ -0,0 +1,78 @@
+"""
+uint8预处理与标准化融合测试
+"""
+
+import pytest
+import torch
+import torch.nn.functional as F
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.inference_runner import ImageClassifier
+
+
+@pytest.fixture(scope="module")
+def uint8_classifier():
+    """提供一个uint8预处理模式的分类器"""
+    return ImageClassifier(runtime_profile=None, preprocessing='uint8')
+
+
+class TestFusedNormalization:
+    """uint8预处理与标准化融合测试类"""
+
+    def test_fused_conv_matches_normalized_conv(self, classifier):
+        """测试融合后的第一个卷积层在图像边缘和内部都与先标准化再卷积一致"""
+        pixels = torch.randint(0, 256, (2, 3, 224, 224), dtype=torch.uint8)
+        conv = classifier.model.conv1
+        expected = F.conv2d(classifier.normalize(pixels), conv.weight, conv.bias, conv.stride, conv.padding)
+        fused = conv(pixels)
+        assert (fused - expected).abs().max() < 1e-4, "融合卷积与标准化后卷积的结果不一致"
+
+    def test_uint8_pipeline_matches_float(self, classifier, uint8_classifier, test_image_path):
+        """测试uint8预处理模式的输出与float模式一致，且张量只有四分之一大小"""
+        float_input = classifier.load_and_preprocess_image(test_image_path)
+        uint8_input = uint8_classifier.load_and_preprocess_image(test_image_path)
+
+        assert uint8_input.dtype == torch.uint8 and uint8_input.shape == float_input.shape
+        assert uint8_input.element_size() * 4 == float_input.element_size()
+        assert torch.allclose(uint8_classifier.normalize(uint8_input), float_input, atol=1e-6)
+
+        expected = classifier.run_inference(float_input)
+        output = uint8_classifier.run_inference(uint8_input)
+        assert torch.allclose(output, expected, atol=1e-4), f"最大误差: {(output - expected).abs().max()}"
+
+    def test_state_dict_unchanged(self, uint8_classifier):
+        """测试融合不改变state_dict，模型指纹与预处理模式无关"""
+        keys = list(uint8_classifier.model.state_dict())
+        assert 'conv1.weight' in keys
+        assert not any('pixel_weight' in key or 'normalized_mean' in key for key in keys)
+
+    def test_unsupported_preprocessing(self):
+        """测试不支持的预处理模式"""
+        with pytest.raises(ValueError):
+            ImageClassifier(runtime_profile=None, preprocessing='fp16')
+
+    def test_follows_weight_changes(self, test_image_path):
+        """测试load_state_dict或原地修改权重后，uint8路径与float路径仍然一致"""
+        float_classifier = ImageClassifier(runtime_profile=None)
+        uint8_classifier = ImageClassifier(runtime_profile=None, preprocessing='uint8')
+        float_input = float_classifier.load_and_preprocess_image(test_image_path)
+        uint8_input = uint8_classifier.load_and_preprocess_image(test_image_path)
+        # 先运行一次，使融合参数和偏置图被缓存
+        uint8_classifier.run_inference(uint8_input)
+
+        torch.manual_seed(0)
+        state = {key: value + 0.05 * torch.randn_like(value) if key.startswith('conv1') else value
+                 for key, value in float_classifier.model.state_dict().items()}
+        float_classifier.model.load_state_dict(state)
+        uint8_classifier.model.load_state_dict(state)
+        expected = float_classifier.run_inference(float_input)
+        output = uint8_classifier.run_inference(uint8_input)
+        assert torch.allclose(output, expected, atol=1e-4), f"load_state_dict后最大误差: {(output - expected).abs().max()}"
+
+        with torch.no_grad():
+            for classifier in (float_classifier, uint8_classifier):
+                classifier.model.conv1.weight.mul_(0.5)
+        expected = float_classifier.run_inference(float_input)
+        output = uint8_classifier.run_inference(uint8_input)
+        assert torch.allclose(output, expected, atol=1e-4), f"原地修改权重后最大误差: {(output - expected).abs().max()}"
@@ -0,0 +1,68 @@
+"""
+导入耗时预算测试
+
+使用python -X importtime测量各入口点的导入开销，确保torchvision、matplotlib、PIL等
+较重的依赖不会在导入时被加载，并且除torch本身外的导入时间保持在预算之内。
+"""
+
+import pytest
+import subprocess
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 除torch外，每个入口点允许的累计导入时间（毫秒）
+IMPORT_BUDGET_MS = 500
+
+# 入口点 -> 导入时不允许加载的模块
+ENTRY_POINTS = {
+    'src.inference_runner': ['torchvision', 'matplotlib', 'PIL'],
+    'quick_test': ['torchvision', 'matplotlib', 'PIL'],
+    'scripts.visualize_predictions': ['torch', 'torchvision', 'matplotlib', 'PIL'],
+    'scripts.visualize_all': ['torch', 'torchvision', 'matplotlib', 'PIL'],
+    'scripts.run_demo': ['torch', 'torchvision', 'matplotlib', 'PIL', 'pytest'],
+    'scripts.generate_test_report': ['torch', 'torchvision', 'matplotlib', 'PIL', 'pytest'],
+}
+
+
+def measure_import_time(module_name):
+    """
+    在新的解释器中导入模块并解析-X importtime的输出
+
+    返回:
+        dict: 模块名 -> 累计导入时间（微秒）
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, f"导入{module_name}失败: {result.stderr[-500:]}"
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # 格式: "import time: self [us] | cumulative | imported package"
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+class TestImportTime:
+    """导入耗时预算测试类"""
+
+    @pytest.mark.parametrize('module_name', sorted(ENTRY_POINTS))
+    def test_heavy_dependencies_not_imported(self, module_name):
+        """测试入口点导入时不会加载较重的依赖"""
+        cumulative = measure_import_time(module_name)
+        loaded = [name for name in ENTRY_POINTS[module_name] if name in cumulative]
+        assert not loaded, f"导入{module_name}时加载了: {loaded}"
+
+    @pytest.mark.parametrize('module_name', sorted(ENTRY_POINTS))
+    def test_import_time_budget(self, module_name):
+        """测试入口点除torch外的导入时间在预算之内"""
+        cumulative = measure_import_time(module_name)
+        own_time_ms = (cumulative[module_name] - cumulative.get('torch', 0)) / 1000
+        assert own_time_ms <= IMPORT_BUDGET_MS, \
+            f"导入{module_name}耗时{own_time_ms:.0f}ms，超出预算{IMPORT_BUDGET_MS}ms"
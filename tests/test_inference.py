@@ -8,6 +8,9 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.inference_runner import ImageClassifier
+from src.errors import ImageTooLargeError
+from src.batch_invariance import logit_cache_bypassed
+from src.shm_ring import SharedMemoryRunner
 from PIL import Image
 
 class TestImageClassifier:
@@ -82,6 +85,44 @@ class TestImageClassifier:
         output = classifier.run_inference(input_tensor)
         assert output is not None, "大图像的推理结果为空"
     
+    def test_large_image_reduced_within_budget(self, classifier, temp_images):
+        """测试超出像素预算的JPEG图像在解码时被缩小"""
+        # 4000x3000的JPEG图像超出100万像素的预算
+        input_tensor = classifier.load_and_preprocess_image(temp_images['large'], max_pixels=1_000_000)
+        assert input_tensor.shape == torch.Size([1, 3, 224, 224]), \
+            f"输入张量形状错误: {input_tensor.shape}，预期: [1, 3, 224, 224]"
+        
+        stats = classifier.get_stats()
+        last_image = stats['last_image']
+        assert last_image['original_size'] == (4000, 3000)
+        assert last_image['reduced'], "超出预算的图像没有在解码时缩小"
+        assert last_image['decoded_size'][0] * last_image['decoded_size'][1] <= 1_000_000, \
+            f"解码后的图像仍超出预算: {last_image['decoded_size']}"
+        assert min(last_image['decoded_size']) >= 256, "解码后的图像短边小于预处理尺寸"
+        assert last_image['decoded_bytes'] == last_image['decoded_size'][0] * last_image['decoded_size'][1] * 3
+    
+    def test_oversized_image_without_decoder_reduction(self, classifier, tmp_path):
+        """测试无法在解码时缩小的格式超出预算时被拒绝"""
+        png_path = str(tmp_path / 'large.png')
+        Image.new('RGB', (2000, 1500), color='red').save(png_path)
+        
+        with pytest.raises(ImageTooLargeError):
+            classifier.load_and_preprocess_image(png_path, max_pixels=1_000_000)
+        
+        # 在预算内时正常加载
+        input_tensor = classifier.load_and_preprocess_image(png_path, max_pixels=4_000_000)
+        assert input_tensor.shape == torch.Size([1, 3, 224, 224])
+        assert not classifier.get_stats()['last_image']['reduced']
+    
+    def test_invalid_pixel_budget(self, classifier, test_image_path):
+        """测试显式传入的像素预算0不会被当作默认值，非正数的预算直接报错"""
+        with pytest.raises(ValueError):
+            classifier.load_and_preprocess_image(test_image_path, max_pixels=0)
+        with pytest.raises(ValueError):
+            SharedMemoryRunner(classifier, max_pixels=0)
+        with pytest.raises(ValueError):
+            ImageClassifier(runtime_profile=None, max_pixels=-1)
+    
     def test_inference_determinism(self, classifier, test_image_path):
         """测试模型推理的确定性（相同输入应产生相同输出）"""
         # 第一次加载和预处理图像
@@ -123,7 +164,7 @@ class TestImageClassifier:
         assert torch.equal(output1, output2), "重新加载模型后对相同输入产生了不同的输出"
     
     def test_batch_invariance(self, classifier, processed_test_image):
-        """测试模型对批次大小变化的鲁棒性"""
+        """测试一次真正的批量前向传播与单张推理结果一致（完整的检查见test_batch_invariance.py）"""
         # 单张图像推理
         single_output = classifier.run_inference(processed_test_image)
         
@@ -134,23 +175,20 @@ class TestImageClassifier:
         assert batch_tensor.shape == torch.Size([2, 3, 224, 224]), \
             f"批次张量形状错误: {batch_tensor.shape}，预期: [2, 3, 224, 224]"
         
-        # 批次推理 - 使用相同的API
-        outputs = []
-        for i in range(batch_tensor.shape[0]):
-            # 分别对每个图像使用相同的run_inference方法
-            output = classifier.run_inference(batch_tensor[i:i+1])
-            outputs.append(output)
-        
-        batch_output = torch.cat(outputs, dim=0)
+        # 批次推理 - 两张图像在同一次前向传播中计算，不经过logits缓存
+        with logit_cache_bypassed(classifier):
+            batch_output = classifier.run_inference(batch_tensor)
         
         # 验证批次输出形状
         assert batch_output.shape == torch.Size([2, 1000]), \
             f"批次输出形状错误: {batch_output.shape}，预期: [2, 1000]"
         
-        # 验证批次中的第一个输出与单张图像的输出相同
-        assert torch.equal(single_output, batch_output[0:1]), \
-            "批次中的第一个输出与单张图像的输出不同"
+        # 验证批次中的输出与单张图像的输出在浮点误差内一致，且top-1预测相同
+        assert torch.allclose(single_output, batch_output[0:1], atol=1e-4), \
+            f"批次中的第一个输出与单张图像的输出不同，最大误差: {(single_output - batch_output[0:1]).abs().max()}"
+        assert torch.equal(batch_output.argmax(dim=1), single_output.argmax(dim=1).repeat(2)), \
+            "批量推理改变了top-1预测"
         
         # 验证批次中的两个输出相同（因为输入了相同的图像）
-        assert torch.equal(batch_output[0:1], batch_output[1:2]), \
+        assert torch.allclose(batch_output[0:1], batch_output[1:2], atol=1e-5), \
             "批次中的两个输出不同，尽管输入了相同的图像" 
\ No newline at end of file
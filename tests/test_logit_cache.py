@@ -0,0 +1,91 @@
+"""
+logits缓存测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logit_cache import LogitCache, cached_forward, hash_input_rows
+
+
+@pytest.fixture
+def cached_classifier(classifier):
+    """启用内存缓存的共享分类器，测试结束后关闭缓存"""
+    classifier.enable_cache()
+    yield classifier
+    classifier.disable_cache()
+
+
+class TestLogitCache:
+    """logits缓存测试类"""
+
+    def test_cached_inference_matches(self, cached_classifier, processed_test_image):
+        """测试缓存命中的结果与直接推理一致，命中率记入get_stats"""
+        batch = torch.cat([processed_test_image, processed_test_image.flip(-1)])
+        first = cached_classifier.run_inference(batch)
+        second = cached_classifier.run_inference(batch)
+        assert torch.equal(first, second)
+        stats = cached_classifier.get_stats()['logit_cache']
+        assert (stats['misses'], stats['memory_hits'], stats['hit_rate']) == (2, 2, 0.5)
+
+        cached_classifier.disable_cache()
+        assert torch.allclose(cached_classifier.run_inference(batch), first, atol=1e-4)
+        assert cached_classifier.get_stats()['logit_cache'] is None
+
+    def test_only_misses_are_forwarded(self):
+        """测试只有未命中的行组成新的批次，同一批次内重复的行只计算一次"""
+        batches = []
+
+        def forward(batch):
+            batches.append(len(batch))
+            return batch.flatten(1)[:, :4] * 2
+
+        cache = LogitCache(capacity=16)
+        inputs = torch.arange(5 * 12, dtype=torch.float32).view(5, 3, 2, 2)
+        cached_forward(cache, forward, inputs[:2])
+        output = cached_forward(cache, forward, torch.cat([inputs, inputs[4:]]))
+        assert batches == [2, 3]
+        assert torch.equal(output, torch.cat([inputs, inputs[4:]]).flatten(1)[:, :4] * 2)
+
+    def test_disk_store_and_namespace(self, classifier, processed_test_image, tmp_path):
+        """测试磁盘存储跨缓存实例复用，计算后端变化后不会命中旧结果"""
+        path = str(tmp_path / 'logits.db')
+        classifier.enable_cache(path=path)
+        expected = classifier.run_inference(processed_test_image)
+        # 新的缓存实例内存为空，只能从磁盘命中
+        classifier.enable_cache(path=path)
+        try:
+            assert torch.equal(classifier.run_inference(processed_test_image), expected)
+            assert classifier.get_stats()['logit_cache']['disk_hits'] == 1
+            with torch.backends.mkldnn.flags(enabled=False):
+                classifier.run_inference(processed_test_image)
+            assert classifier.get_stats()['logit_cache']['misses'] == 1
+        finally:
+            classifier.disable_cache()
+
+    def test_lru_eviction(self):
+        """测试内存LRU只保留最近使用的条目"""
+        cache = LogitCache(capacity=2)
+        keys = hash_input_rows(torch.arange(3, dtype=torch.float32).view(3, 1))
+        cache.put_many(keys[:2], torch.zeros(2, 4))
+        cache.get_many(keys[:1])
+        cache.put_many(keys[2:], torch.ones(1, 4))
+        assert list(cache.memory) == [keys[0], keys[2]]
+
+    def test_weight_changes_miss(self, cached_classifier, processed_test_image):
+        """测试原地修改权重后缓存不会返回旧的结果，恢复权重后重新命中"""
+        before = cached_classifier.run_inference(processed_test_image)
+        weight = cached_classifier.model.fc.weight
+        with torch.no_grad():
+            weight.mul_(0.5)
+        try:
+            changed = cached_classifier.run_inference(processed_test_image)
+            assert not torch.equal(changed, before), "修改权重后仍然返回了缓存的旧结果"
+            assert cached_classifier.get_stats()['logit_cache']['misses'] == 2
+        finally:
+            with torch.no_grad():
+                weight.mul_(2)
+        assert torch.equal(cached_classifier.run_inference(processed_test_image), before)
+        assert cached_classifier.get_stats()['logit_cache']['memory_hits'] == 1
@@ -0,0 +1,112 @@
+"""
+持续监控测试
+"""
+
+import pytest
+import time
+import urllib.request
+import os
+import sys
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import src.monitor as monitor_module
+from src.monitor import ReservoirSampler, RollingWindow, RobustnessMonitor
+
+
+class FakeClock:
+    """可以手动拨动的时钟"""
+
+    def __init__(self):
+        self.now = 10_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMonitor:
+    """持续监控测试类"""
+
+    def test_reservoir_is_bounded_and_uniform(self):
+        """测试蓄水池容量固定，且每个样本被保留的概率大致相同"""
+        kept_first_half = 0
+        for seed in range(200):
+            sampler = ReservoirSampler(10, seed=seed)
+            for item in range(1000):
+                sampler.offer(item)
+            assert len(sampler.items) == 10 and sampler.seen == 1000
+            kept_first_half += sum(item < 500 for item in sampler.drain())
+        assert 0.4 < kept_first_half / 2000 < 0.6, "采样偏向某一部分样本"
+        assert sampler.items == [] and sampler.seen == 0
+
+    def test_rolling_window_expires_old_buckets(self):
+        """测试滚动窗口只统计窗口内的数据，且桶数不随时间增长"""
+        window = RollingWindow(window_seconds=300, bucket_seconds=60)
+        for minute in range(100):
+            window.record_flips('brightness:3', 10, minute % 2, now=minute * 60.0)
+            window.record_latency(0.02, now=minute * 60.0)
+        now = 99 * 60.0 + 1
+        snapshot = window.snapshot(now)
+        assert len(window.buckets) <= 300 / 60 + 1
+        evaluated, flipped, rate = snapshot['flip_rates']['brightness:3']
+        assert evaluated == 50 and flipped == 3 and rate == pytest.approx(0.06)
+        assert window.latency_quantile(0.5, now) == 0.025
+
+    def test_monitor_job_and_metrics_endpoint(self, classifier, test_image_path):
+        """测试一次评估周期更新指标，并通过HTTP端点以文本格式导出"""
+        clock = FakeClock()
+        monitor = RobustnessMonitor(classifier, perturbations=[('brightness', 1), ('contrast', 5)],
+                                    sample_size=2, clock=clock, seed=0)
+        for _ in range(5):
+            monitor.submit(test_image_path)
+        monitor.submit('data/missing.jpg')
+        monitor.run_once()
+
+        server = monitor.serve(port=0)
+        try:
+            host, port = server.server_address[:2]
+            text = urllib.request.urlopen(f"http://{host}:{port}/metrics").read().decode('utf-8')
+        finally:
+            server.shutdown()
+
+        assert 'robustness_images_submitted_total 6' in text
+        assert monitor.totals['images_evaluated'] + monitor.totals['images_failed'] == 2
+        assert 'robustness_flip_rate{perturbation="contrast:5",window="3600s"}' in text
+        assert 'robustness_inference_latency_seconds_bucket{le="+Inf"}' in text
+
+    def test_monitor_validates_and_survives_errors(self, classifier, monkeypatch):
+        """测试不支持的扰动在构造时报错，评估中的意外异常被计数而不会终止后台线程"""
+        with pytest.raises(ValueError):
+            RobustnessMonitor(classifier, perturbations=[('gaussian_nose', 3)])
+        with pytest.raises(ValueError):
+            RobustnessMonitor(classifier, perturbations=[('brightness', 9)])
+
+        monitor = RobustnessMonitor(classifier, perturbations=[('brightness', 1)], interval=0.01)
+        monkeypatch.setattr(monitor, 'run_once', lambda: 1 / 0)
+        monitor.start()
+        try:
+            deadline = time.monotonic() + 5
+            while monitor.totals['errors'] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert monitor._thread.is_alive()
+        finally:
+            monitor.stop()
+        assert monitor.totals['errors'] >= 2 and monitor.last_error.startswith('ZeroDivisionError')
+        assert f"robustness_eval_errors_total {monitor.totals['errors']}" in monitor.metrics_text()
+
+    def test_noise_seeded_per_image(self, classifier, test_image_path, tmp_path, monkeypatch):
+        """测试随机扰动按图像内容设定种子：不同图像得到不同的噪声，同一图像的噪声可以复现"""
+        other_path = str(tmp_path / 'other.jpg')
+        Image.new('RGB', (256, 256), color='gray').save(other_path)
+        seeds = []
+        real_apply = monitor_module.apply_perturbation
+
+        def apply(*args, seed=0, **kwargs):
+            seeds.append(seed)
+            return real_apply(*args, seed=seed, **kwargs)
+
+        monkeypatch.setattr(monitor_module, 'apply_perturbation', apply)
+        monitor = RobustnessMonitor(classifier, perturbations=[('gaussian_noise', 3)], sample_size=3)
+        for path in (test_image_path, other_path, test_image_path):
+            monitor.submit(path)
+        assert monitor.run_once() == 3
+        assert seeds[0] != seeds[1] and seeds[0] == seeds[2]
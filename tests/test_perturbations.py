@@ -0,0 +1,33 @@
+"""
+图像扰动测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.perturbations import PERTURBATIONS, apply_perturbation
+
+
+class TestPerturbations:
+    """图像扰动测试类"""
+
+    @pytest.mark.parametrize('name', list(PERTURBATIONS))
+    def test_perturbation_is_reproducible(self, classifier, processed_test_image, name):
+        """测试扰动保持形状和像素范围，且相同种子得到相同结果"""
+        first = apply_perturbation(processed_test_image, name, 3, classifier.mean, classifier.std, seed=7)
+        second = apply_perturbation(processed_test_image, name, 3, classifier.mean, classifier.std, seed=7)
+
+        assert first.shape == processed_test_image.shape
+        assert torch.equal(first, second), f"{name} 扰动不可复现"
+        pixels = first * classifier.std + classifier.mean
+        assert pixels.min() >= -1e-5 and pixels.max() <= 1 + 1e-5, f"{name} 扰动超出像素范围"
+        assert not torch.equal(first, processed_test_image), f"{name} 扰动没有改变图像"
+
+    def test_unsupported_perturbation(self, classifier, processed_test_image):
+        """测试不支持的扰动名称和严重程度"""
+        with pytest.raises(ValueError):
+            apply_perturbation(processed_test_image, 'fog', 1, classifier.mean, classifier.std)
+        with pytest.raises(ValueError):
+            apply_perturbation(processed_test_image, 'brightness', 6, classifier.mean, classifier.std)
@@ -0,0 +1,128 @@
+"""
+测试报告生成测试
+"""
+
+import pytest
+import json
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.generate_test_report import run_tests, render_reports, render_markdown
+
+
+SAMPLE_TESTS = '''
+import pytest
+
+def test_ok():
+    assert True
+
+def test_broken():
+    assert 1 == 2, "预期失败"
+
+@pytest.mark.skip(reason="示例跳过")
+def test_skipped():
+    pass
+
+@pytest.mark.xfail(reason="已知问题")
+def test_known_bug():
+    assert False
+
+@pytest.mark.xfail(reason="可能已修复")
+def test_maybe_fixed():
+    pass
+
+@pytest.fixture
+def broken_teardown():
+    yield
+    raise RuntimeError("清理失败")
+
+def test_fails_then_teardown_errors(broken_teardown):
+    assert 1 == 2, "调用阶段失败"
+'''
+
+
+@pytest.fixture
+def sample_results(tmp_path):
+    """提供一份结构化测试结果文件"""
+    results = {
+        'started_at': '2025-01-01T12:00:00',
+        'duration': 1.5,
+        'summary': {'passed': 1, 'failed': 1, 'error': 0, 'skipped': 0, 'total': 2},
+        'collection_errors': [],
+        'tests': [
+            {'nodeid': 'tests/test_a.py::test_ok', 'outcome': 'passed', 'duration': 0.5, 'message': ''},
+            {'nodeid': 'tests/test_a.py::test_bad', 'outcome': 'failed', 'duration': 1.0,
+             'message': 'AssertionError: <b>1 != 2</b>'},
+        ],
+    }
+    results_path = tmp_path / 'results_20250101_120000.json'
+    results_path.write_text(json.dumps(results), encoding='utf-8')
+    return results_path
+
+
+class TestReportGeneration:
+    """测试报告生成测试类"""
+
+    def test_single_run_collects_structured_results(self, tmp_path):
+        """测试运行一次即可得到结构化结果和JUnit XML"""
+        test_file = tmp_path / 'test_sample.py'
+        test_file.write_text(SAMPLE_TESTS, encoding='utf-8')
+        results_path = tmp_path / 'results.json'
+        junit_path = tmp_path / 'junit.xml'
+
+        results = run_tests(results_path, junit_path=junit_path,
+                            pytest_args=[str(test_file), '-p', 'no:cacheprovider', '-q'])
+
+        assert results['summary'] == {'passed': 1, 'failed': 2, 'error': 0, 'skipped': 1,
+                                      'xfailed': 1, 'xpassed': 1, 'total': 6, 'collection_errors': 0}
+        assert results['exit_code'] == 1
+        outcomes = {t['nodeid'].split('::')[-1]: t for t in results['tests']}
+        assert '预期失败' in outcomes['test_broken']['message']
+        assert outcomes['test_skipped']['message'] == '示例跳过'
+        assert outcomes['test_known_bug']['message'] == '已知问题'
+        # teardown的错误不覆盖call阶段的失败
+        assert '调用阶段失败' in outcomes['test_fails_then_teardown_errors']['message']
+        assert results_path.exists() and junit_path.exists()
+
+    def test_render_all_formats(self, sample_results):
+        """测试从同一份结果渲染所有格式的报告"""
+        reports = render_reports(sample_results)
+
+        assert sorted(reports) == ['html', 'md', 'txt']
+        for path, updated in reports.values():
+            assert updated
+            assert os.path.basename(path).startswith('test_report_20250101_120000')
+
+        html_text = open(reports['html'][0], encoding='utf-8').read()
+        assert '&lt;b&gt;1 != 2&lt;/b&gt;' in html_text, "HTML报告没有转义失败信息"
+        assert 'tests/test_a.py::test_bad FAILED' in open(reports['txt'][0], encoding='utf-8').read()
+
+    def test_incremental_render_skips_up_to_date_reports(self, sample_results):
+        """测试报告已是最新时不会重新渲染"""
+        render_reports(sample_results)
+        reports = render_reports(sample_results, formats=['md'])
+        assert reports == {'md': (reports['md'][0], False)}
+
+        reports = render_reports(sample_results, formats=['md'], force=True)
+        assert reports['md'][1]
+
+    def test_markdown_summary_table(self, sample_results):
+        """测试Markdown报告包含摘要表格"""
+        results = json.loads(sample_results.read_text(encoding='utf-8'))
+        markdown = render_markdown(results)
+        assert '| failed | 1 |' in markdown
+        assert '## 失败详情' in markdown
+
+    def test_collection_errors_fail_every_format(self, tmp_path):
+        """测试无法导入的测试模块在所有格式中显示为收集错误，报告状态为失败"""
+        (tmp_path / 'test_ok.py').write_text("def test_ok():\n    pass\n", encoding='utf-8')
+        (tmp_path / 'test_broken_import.py').write_text("import no_such_module\n", encoding='utf-8')
+        results_path = tmp_path / 'results_20250101_120000.json'
+        results = run_tests(results_path, pytest_args=[str(tmp_path), '-p', 'no:cacheprovider', '-q'])
+        # 有收集错误时pytest不会运行任何测试，只按收集到的测试统计的报告会显示为通过
+        assert results['summary']['total'] == 0 and results['summary']['collection_errors'] == 1
+
+        for fmt, (path, _) in render_reports(results_path).items():
+            text = open(path, encoding='utf-8').read()
+            assert 'test_broken_import.py' in text, f"{fmt}报告没有显示收集错误"
+            assert '失败 - 共 0 个测试' in text, f"{fmt}报告的状态没有计入收集错误"
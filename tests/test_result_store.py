@@ -0,0 +1,117 @@
+"""
+结果存储测试
+"""
+
+import pytest
+import copy
+import sqlite3
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.result_store import ResultStore, hash_image_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    """提供一个包含两次运行的结果存储"""
+    store = ResultStore(tmp_path / 'results.db')
+    store.create_run('resnet18', 'v1', run_id='base')
+    store.create_run('resnet18', 'v2', run_id='new')
+    store.add_predictions('base', [
+        ('img1', 'identity', 0, 281, 0.9),
+        ('img1', 'brightness', 3, 281, 0.7),
+        ('img2', 'identity', 0, 5, 0.6),
+    ])
+    store.add_predictions('new', [
+        ('img1', 'identity', 0, 281, 0.8),
+        ('img1', 'brightness', 3, 282, 0.5),
+        ('img2', 'identity', 0, 7, 0.4),
+        ('img3', 'identity', 0, 1, 0.9),   # 基准运行中没有，不参与比较
+    ])
+    yield store
+    store.close()
+
+
+class TestResultStore:
+    """结果存储测试类"""
+
+    def test_compare_runs_returns_only_changes(self, store):
+        """测试比较两次运行只返回top-1变化的结果"""
+        changes = store.compare_runs('base', 'new')
+        assert [(c['image_hash'], c['perturbation'], c['base_top1'], c['new_top1']) for c in changes] == [
+            ('img1', 'brightness', 281, 282),
+            ('img2', 'identity', 5, 7),
+        ]
+        assert len(store.compare_runs('base', 'new', limit=1)) == 1
+
+    def test_summarize_changes(self, store):
+        """测试按扰动和严重程度汇总变化率"""
+        summary = {(row['perturbation'], row['severity']): row for row in store.summarize_changes('base', 'new')}
+        assert summary[('identity', 0)]['num_compared'] == 2
+        assert summary[('identity', 0)]['change_rate'] == 0.5
+        assert summary[('brightness', 3)]['num_changed'] == 1
+
+    def test_reinsert_overwrites(self, store):
+        """测试重复写入同一主键会覆盖旧结果"""
+        store.add_predictions('new', [('img2', 'identity', 0, 5, 0.7)])
+        assert [c['image_hash'] for c in store.compare_runs('base', 'new')] == ['img1']
+        assert {run['run_id']: run['num_predictions'] for run in store.list_runs()} == {'base': 3, 'new': 4}
+
+    def test_compare_uses_primary_key_lookup(self, store):
+        """测试比较查询通过主键定位两次运行的结果，而不是全表扫描"""
+        plan = ' '.join(row[-1] for row in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM predictions a JOIN predictions b ON b.run_id = ? "
+            "AND b.image_hash = a.image_hash AND b.perturbation = a.perturbation AND b.severity = a.severity "
+            "WHERE a.run_id = ? AND a.top1 != b.top1", ('new', 'base')))
+        assert 'SCAN' not in plan, f"比较查询没有使用主键: {plan}"
+
+    def test_model_fingerprint(self, classifier, test_image_path, tmp_path):
+        """测试模型指纹稳定，且权重变化时指纹随之变化"""
+        fingerprint = classifier.model_fingerprint()
+        assert fingerprint.startswith('resnet18-') and fingerprint == classifier.model_fingerprint()
+
+        modified = copy.deepcopy(classifier)
+        modified._fingerprint = None
+        assert modified.model_fingerprint() == fingerprint
+        with torch.no_grad():
+            modified.model.fc.bias[0] += 1e-3
+        modified._fingerprint = None
+        assert modified.model_fingerprint() != fingerprint
+
+        # 图像哈希只取决于文件内容
+        copied = tmp_path / 'copy.jpg'
+        copied.write_bytes(open(test_image_path, 'rb').read())
+        assert hash_image_file(copied) == hash_image_file(test_image_path)
+
+    def test_lookup_by_image_and_model_version(self, store, tmp_path):
+        """测试按图像哈希和模型版本查询结果，查询使用索引，旧数据库打开时自动回填模型版本"""
+        assert [(r['run_id'], r['perturbation'], r['top1']) for r in store.lookup('img1', 'v2')] == [
+            ('new', 'brightness', 282), ('new', 'identity', 281)
+        ]
+        assert [r['top1'] for r in store.lookup('img1', 'v1', 'brightness', 3)] == [281]
+        assert store.lookup('img3', 'v1') == []
+        plan = ' '.join(row[-1] for row in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM predictions WHERE image_hash = ? AND model_version = ? "
+            "AND perturbation = ? AND severity = ?", ('img1', 'v1', 'identity', 0)))
+        assert 'idx_predictions_version' in plan, f"查询没有使用索引: {plan}"
+        with pytest.raises(ValueError):
+            store.add_predictions('missing', [('img1', 'identity', 0, 1, 0.5)])
+
+        # 没有model_version列的旧数据库
+        legacy_path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(legacy_path)
+        conn.executescript(
+            "CREATE TABLE runs (run_id TEXT PRIMARY KEY, model_name TEXT NOT NULL, model_version TEXT, "
+            "created_at REAL NOT NULL, note TEXT);"
+            "CREATE TABLE predictions (run_id TEXT NOT NULL, image_hash TEXT NOT NULL, perturbation TEXT NOT NULL, "
+            "severity INTEGER NOT NULL, top1 INTEGER NOT NULL, probability REAL NOT NULL, "
+            "PRIMARY KEY (run_id, image_hash, perturbation, severity)) WITHOUT ROWID;"
+            "INSERT INTO runs VALUES ('old', 'resnet18', 'v0', 0, NULL);"
+            "INSERT INTO predictions VALUES ('old', 'img1', 'identity', 0, 3, 0.5);"
+        )
+        conn.commit()
+        conn.close()
+        legacy = ResultStore(legacy_path)
+        assert [r['top1'] for r in legacy.lookup('img1', 'v0')] == [3]
+        legacy.close()
@@ -0,0 +1,116 @@
+"""
+运行时配置自动调优测试
+"""
+
+import pytest
+import torch
+import os
+import socket
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.batch_runner import BatchRunner, DEFAULT_BATCH_SIZE
+from src.inference_runner import ImageClassifier
+from src.shm_ring import SharedMemoryRunner
+from src.runtime_profile import (
+    save_profile, load_profile, apply_profile, select_best, tune_runtime
+)
+
+
+def _result(num_processes, num_threads, batch_size, images_per_sec, latency_ms):
+    """构造一条基准测试结果"""
+    return {
+        'num_processes': num_processes,
+        'num_threads': num_threads,
+        'interop_threads': 1,
+        'batch_size': batch_size,
+        'images_per_sec': images_per_sec,
+        'latency_ms': latency_ms,
+    }
+
+
+@pytest.fixture
+def restore_num_threads():
+    """测试结束后恢复PyTorch线程数"""
+    previous = torch.get_num_threads()
+    yield
+    torch.set_num_threads(previous)
+
+
+class TestRuntimeProfile:
+    """运行时配置测试类"""
+
+    def test_select_best(self):
+        """测试分别按吞吐量和延迟选择最佳配置"""
+        results = [_result(1, 1, 1, 20.0, 50.0), _result(1, 1, 32, 80.0, 400.0)]
+        best = select_best(results)
+        assert best['throughput']['batch_size'] == 32
+        assert best['latency']['batch_size'] == 1
+
+    def test_profile_roundtrip_and_apply(self, tmp_path, restore_num_threads):
+        """测试机器配置的保存、加载，以及分类器启动时应用配置"""
+        profile = tune_runtime(process_counts=[1], thread_counts=[1], batch_sizes=[1],
+                               warmup=0, iterations=1, verbose=False)
+        path = save_profile(profile, str(tmp_path / 'profile.json'))
+
+        loaded = load_profile(path)
+        assert loaded is not None, "未能加载本机生成的机器配置"
+        assert loaded['objectives']['throughput']['num_threads'] == 1
+
+        config = apply_profile(loaded, objective='latency')
+        assert config['batch_size'] == 1
+        assert torch.get_num_threads() == 1
+
+        classifier = ImageClassifier(runtime_profile=path)
+        assert classifier.runtime_config == loaded['objectives']['throughput'], "分类器启动时未应用机器配置"
+
+    def test_profile_from_other_machine_ignored(self, tmp_path):
+        """测试其他机器生成的配置不会被加载"""
+        profile = {'hostname': 'another-host', 'cpu_count': os.cpu_count(),
+                   'objectives': {'throughput': _result(1, 1, 1, 1.0, 1.0)}}
+        path = save_profile(profile, str(tmp_path / 'profile.json'))
+        assert load_profile(path) is None
+
+    def test_missing_profile(self, tmp_path):
+        """测试配置文件不存在时返回None"""
+        assert load_profile(str(tmp_path / 'missing.json')) is None
+
+    def test_invalid_objective(self):
+        """测试不支持的优化目标"""
+        with pytest.raises(ValueError):
+            apply_profile({'objectives': {}}, objective='energy')
+
+    def test_explicit_profile_path_checked(self, tmp_path):
+        """测试显式指定的配置文件不存在时抛出异常，不适用于本机时发出警告"""
+        with pytest.raises(FileNotFoundError):
+            ImageClassifier(runtime_profile=str(tmp_path / 'missing.json'))
+        profile = {'hostname': 'another-host', 'cpu_count': os.cpu_count(), 'objectives': {}}
+        path = save_profile(profile, str(tmp_path / 'profile.json'))
+        with pytest.warns(UserWarning):
+            classifier = ImageClassifier(runtime_profile=path)
+        assert classifier.runtime_config is None
+
+    def test_crashed_benchmark_raises(self):
+        """测试基准测试子进程崩溃时抛出异常而不是一直等待"""
+        from src.runtime_profile import benchmark_config
+        with pytest.raises(RuntimeError):
+            benchmark_config(1, 1, 1, model_name='no_such_model', warmup=0, iterations=1)
+
+    def test_profile_is_opt_in(self, tmp_path, monkeypatch, restore_num_threads):
+        """测试默认不读取本机的机器配置，显式启用后批量推理器使用配置中的批次大小"""
+        threads = 1 if torch.get_num_threads() > 1 else 2
+        profile = {'hostname': socket.gethostname(), 'cpu_count': os.cpu_count(),
+                   'objectives': {'throughput': _result(2, threads, 8, 1.0, 1.0)}}
+        monkeypatch.setenv('AI_MODEL_TESTER_PROFILE', save_profile(profile, str(tmp_path / 'profile.json')))
+        previous = torch.get_num_threads()
+
+        # 不支持的模型在应用配置之前就报错
+        with pytest.raises(ValueError):
+            ImageClassifier(model_name='no_such_model', runtime_profile='auto')
+        classifier = ImageClassifier()
+        assert classifier.runtime_config is None and torch.get_num_threads() == previous
+        assert BatchRunner(classifier).batch_size == DEFAULT_BATCH_SIZE
+
+        classifier = ImageClassifier(runtime_profile='auto')
+        assert torch.get_num_threads() == threads
+        assert BatchRunner(classifier).batch_size == 8
+        assert SharedMemoryRunner(classifier).batch_size == 8
@@ -0,0 +1,47 @@
+"""
+显著性图测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.saliency import occlusion_masks
+
+
+class TestSaliency:
+    """显著性图测试类"""
+
+    def test_occlusion_masks_cover_image(self):
+        """测试遮挡掩码覆盖整幅图像，最后一个窗口对齐到边缘"""
+        masks = occlusion_masks(10, 10, window=4, stride=3)
+        # 起点为0, 3, 6，每个方向3个窗口
+        assert masks.shape == (9, 1, 10, 10)
+        assert masks.squeeze(1).any(dim=0).all(), "存在未被任何窗口覆盖的像素"
+        assert (masks.flatten(1).sum(dim=1) == 16).all(), "窗口大小错误"
+
+    def test_occlusion_batched_matches_single(self, classifier, processed_test_image):
+        """测试分块批量遮挡与逐个遮挡的结果一致"""
+        batched, target = classifier.occlusion_sensitivity(processed_test_image, window=56, stride=56, batch_size=16)
+        single, _ = classifier.occlusion_sensitivity(processed_test_image, target=target, window=56, stride=56,
+                                                     batch_size=1)
+
+        assert batched.shape == processed_test_image.shape[2:], f"敏感度图形状错误: {batched.shape}"
+        assert torch.allclose(batched, single, atol=1e-5), "批量遮挡结果与逐个遮挡不一致"
+
+    def test_occlusion_rejects_batch(self, classifier, processed_test_image):
+        """测试遮挡敏感度拒绝多张图像的输入"""
+        with pytest.raises(ValueError):
+            classifier.occlusion_sensitivity(processed_test_image.repeat(2, 1, 1, 1))
+
+    def test_grad_cam_batch(self, classifier, processed_test_image):
+        """测试Grad-CAM批量输出的形状和取值范围，且不会遗留钩子"""
+        batch = processed_test_image.repeat(2, 1, 1, 1)
+        cam, target = classifier.grad_cam(batch)
+
+        assert cam.shape == (2, 224, 224), f"激活图形状错误: {cam.shape}"
+        assert cam.min() >= 0 and cam.max() <= 1, "激活图未归一化到[0, 1]"
+        assert target.tolist() == classifier.run_inference(batch).argmax(dim=1).tolist()
+        assert not classifier.model.layer4._forward_hooks, "Grad-CAM的前向钩子没有移除"
+        assert all(not p.requires_grad for p in classifier.model.parameters()), "模型参数被解冻"
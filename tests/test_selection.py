@@ -0,0 +1,54 @@
+"""
+信息量排序测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.selection import informativeness_scores, select_informative
+
+
+@pytest.fixture
+def sample_logits():
+    """提供3个样本的输出：高置信度、边界样本、均匀分布"""
+    return torch.tensor([
+        [10.0, 0.0, 0.0, 0.0],
+        [2.0, 1.9, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0],
+    ])
+
+
+class TestSelection:
+    """信息量排序测试类"""
+
+    def test_margin_ranks_borderline_first(self, sample_logits):
+        """测试margin排序把top-1与top-2最接近的样本排在前面"""
+        selected = select_informative(sample_logits, top_n=2, criterion='margin')
+        assert [index for index, _ in selected] == [2, 1]
+
+    def test_entropy_ranks_uncertain_first(self, sample_logits):
+        """测试entropy排序把最不确定的样本排在前面"""
+        scores = informativeness_scores(sample_logits, criterion='entropy')
+        assert scores.argmax() == 2 and scores.argmin() == 0
+
+    def test_flip_ranks_flipped_first(self):
+        """测试flip排序把相对参考输出翻转的样本排在前面"""
+        reference = torch.tensor([[5.0, 0.0, 0.0, 0.0]])
+        logits = torch.tensor([
+            [5.0, 0.0, 0.0, 0.0],   # 与参考相同
+            [0.0, 3.0, 0.0, 0.0],   # top-1翻转
+            [1.0, 0.5, 0.0, 0.0],   # 未翻转，但参考类别概率明显下降
+        ])
+        selected = select_informative(logits, top_n=3, criterion='flip', reference_logits=reference)
+        assert [index for index, _ in selected] == [1, 2, 0]
+
+    def test_flip_requires_reference(self, sample_logits):
+        """测试flip排序缺少参考输出时抛出异常"""
+        with pytest.raises(ValueError):
+            informativeness_scores(sample_logits, criterion='flip')
+
+    def test_top_n_larger_than_batch(self, sample_logits):
+        """测试top_n超过样本数时返回全部样本"""
+        assert len(select_informative(sample_logits, top_n=10)) == 3
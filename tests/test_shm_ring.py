@@ -0,0 +1,59 @@
+"""
+共享内存环形缓冲区测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.batch_runner import BatchRunner
+from src.shm_ring import SharedBatchRing, SharedMemoryRunner
+
+
+class TestSharedMemoryRing:
+    """共享内存环形缓冲区测试类"""
+
+    def test_attached_ring_shares_memory(self):
+        """测试通过spec连接的缓冲区与原缓冲区共享同一块内存"""
+        ring = SharedBatchRing(num_slots=2, batch_size=1, image_size=8)
+        attached = SharedBatchRing.attach(ring.spec())
+        try:
+            attached.slot(1)[0, 2, 3, 4] = 200
+            assert ring.slot(1)[0, 2, 3, 4] == 200
+            assert ring.slot(0).sum() == 0, "写入了错误的槽位"
+        finally:
+            attached.close()
+            ring.close()
+
+    def test_runner_matches_single_image_inference(self, classifier, test_image_path):
+        """测试共享内存流水线的输出与逐张推理一致，槽位被重复使用，坏文件被隔离"""
+        edge_case_path = 'data/noise.jpg'
+        if not os.path.exists(edge_case_path):
+            pytest.skip(f"测试图片不存在: {edge_case_path}")
+        paths = [test_image_path, edge_case_path, 'data/missing.jpg'] * 3
+        runner = SharedMemoryRunner(classifier, batch_size=2, num_workers=2, num_slots=2)
+        result = runner.run(paths)
+
+        # 9个路径分为5个批次（多于2个槽位），最后一个批次只有坏文件，不进行推理
+        assert result['num_batches'] == 4
+        assert [entry['error_type'] for entry in result['quarantine']] == ['FileNotFoundError'] * 3
+        for path in (test_image_path, edge_case_path):
+            expected = classifier.run_inference(classifier.load_and_preprocess_image(path))[0]
+            assert torch.allclose(result['outputs'][path], expected, atol=1e-4), f"{path} 的输出与逐张推理不一致"
+
+    def test_quarantine_matches_batch_runner(self, classifier, test_image_path, tmp_path):
+        """测试无法识别和被截断的文件与BatchRunner记录相同的错误类型"""
+        fake = tmp_path / 'fake.jpg'
+        fake.write_text("不是图像")
+        truncated = tmp_path / 'truncated.jpg'
+        with open(test_image_path, 'rb') as f:
+            truncated.write_bytes(f.read()[:os.path.getsize(test_image_path) // 2])
+        paths = [test_image_path, str(fake), str(truncated)]
+
+        result = SharedMemoryRunner(classifier, batch_size=2, num_workers=1).run(paths)
+        expected = BatchRunner(classifier, batch_size=2, num_workers=1).run(paths)
+        errors = {entry['path']: (entry['stage'], entry['error_type']) for entry in result['quarantine']}
+        assert errors == {entry['path']: (entry['stage'], entry['error_type']) for entry in expected['quarantine']}
+        assert errors[str(fake)] == ('validate', 'UnsupportedImageFormatError')
+        assert errors[str(truncated)] == ('decode', 'CorruptImageError')
@@ -0,0 +1,99 @@
+"""
+长时间运行稳定性测试模块的测试
+"""
+
+import pytest
+import os
+import sys
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.soak import linear_trend, read_process_stats, SoakMonitor, run_soak
+
+
+class FakeClock:
+    """每次调用前进固定时间的时钟"""
+
+    def __init__(self, step=1.0):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def simulated_probe(rss_slope=0.0, seed=0):
+    """RSS带噪声并按rss_slope（字节/次）线性增长的资源采样函数"""
+    rng = random.Random(seed)
+    state = {'calls': 0}
+
+    def probe():
+        state['calls'] += 1
+        rss = 500 * 2 ** 20 + rss_slope * state['calls'] + rng.gauss(0, 4 * 2 ** 20)
+        return {'rss_bytes': rss, 'num_fds': 8, 'live_tensors': 100, 'cuda_allocated_bytes': None}
+
+    return probe
+
+
+class TestSoak:
+    """soak测试工具的测试类"""
+
+    def test_linear_trend(self):
+        """测试回归斜率，以及无残差时t统计量的取值"""
+        fit = linear_trend([0, 1, 2, 3], [1, 3, 5, 7])
+        assert fit['slope'] == pytest.approx(2.0)
+        assert fit['t'] == float('inf')
+        assert linear_trend([0, 1, 2], [5, 5, 5])['t'] == 0.0
+        with pytest.raises(ValueError):
+            linear_trend([1, 1, 1], [1, 2, 3])
+
+    def test_read_process_stats(self):
+        """测试在Linux上可以读取RSS和文件描述符数量，打开文件后描述符数量增加"""
+        if not os.path.exists('/proc/self/status'):
+            pytest.skip("当前平台没有/proc文件系统")
+        before = read_process_stats()
+        assert before['rss_bytes'] > 0 and before['live_tensors'] >= 0
+        with open(__file__) as f:
+            assert read_process_stats(count_tensors=False)['num_fds'] == before['num_fds'] + 1
+
+    @pytest.mark.parametrize('rss_slope, passed', [(0.0, True), (2 * 2 ** 20, False)])
+    def test_memory_leak_detection(self, rss_slope, passed):
+        """测试带噪声的平稳RSS通过，每次采样增长2 MB的RSS被判定为泄漏"""
+        result = run_soak(lambda: 4, duration=600, interval=10, warmup=60, clock=FakeClock(1.0),
+                          probe=simulated_probe(rss_slope))
+        assert result['passed'] is passed
+        assert result['total_images'] > 0 and result['num_samples'] >= 50
+        assert any('rss_bytes' in failure for failure in result['failures']) is not passed
+
+    def test_throughput_decay_detection(self):
+        """测试每批耗时逐渐变长时判定为吞吐量衰减，预热阶段的采样不参与分析"""
+        clock = FakeClock()
+        calls = {'count': 0}
+
+        def step():
+            calls['count'] += 1
+            clock.step = 1.0 + calls['count'] / 200
+            return 4
+
+        result = run_soak(step, duration=1000, interval=20, warmup=100, clock=clock, probe=simulated_probe())
+        assert not result['passed']
+        assert result['trends']['images_per_sec']['decay'] > 0.1
+        assert all(sample['time'] >= 100 for sample in result['samples'][-result['num_samples']:])
+
+    def test_too_few_samples(self):
+        """测试预热后的采样不足时不能判定为通过"""
+        monitor = SoakMonitor(interval=10, warmup=60, probe=simulated_probe(), clock=FakeClock())
+        for _ in range(80):
+            monitor.record(1)
+        assert not monitor.analyze()['passed']
+
+    def test_visualize_prediction_closes_figure(self, classifier, test_image_path, tmp_path):
+        """测试可视化保存图片后关闭matplotlib图形"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from scripts.visualize_predictions import visualize_prediction
+
+        for _ in range(2):
+            assert os.path.exists(visualize_prediction(test_image_path, output_dir=str(tmp_path), classifier=classifier))
+        assert plt.get_fignums() == []
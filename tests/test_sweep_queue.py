@@ -0,0 +1,120 @@
+"""
+分布式扫描队列测试
+"""
+
+import pytest
+import os
+import shutil
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.sweep_queue import SweepQueue, process_lease, run_local_workers
+
+
+class FakeClock:
+    """可以手动拨动的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """提供一个使用假时钟、租约时长为10秒的队列"""
+    queue = SweepQueue(tmp_path / 'sweep.db', lease_timeout=10, clock=FakeClock())
+    yield queue
+    queue.close()
+
+
+class TestSweepQueue:
+    """分布式扫描队列测试类"""
+
+    def test_create_sweep_is_idempotent(self, queue):
+        """测试重复写入扫描只会补充缺失的任务"""
+        added = queue.create_sweep(['a.jpg', 'b.jpg'], ['identity', 'brightness'], severities=[1, 2])
+        # 每张图像: identity 1个 + brightness 2个
+        assert added == 6
+        assert queue.create_sweep(['a.jpg', 'b.jpg', 'c.jpg'], ['identity', 'brightness'], severities=[1, 2]) == 3
+        assert queue.progress()['total'] == 9
+
+    def test_expired_lease_is_reassigned(self, queue):
+        """测试过期租约被重新分配，原工作进程的迟到提交被丢弃"""
+        queue.create_sweep(['a.jpg'], ['identity'])
+        stale = queue.acquire_lease('worker-a')
+        assert queue.acquire_lease('worker-b') is None, "未过期的租约被重复分配"
+
+        queue.clock.now += 11
+        assert queue.progress()['expired'] == 1
+        fresh = queue.acquire_lease('worker-b')
+        assert [t['task_id'] for t in fresh['tasks']] == [t['task_id'] for t in stale['tasks']]
+
+        task_id = stale['tasks'][0]['task_id']
+        assert queue.commit_results(stale['lease_id'], [{'task_id': task_id, 'top1': 1, 'probability': 0.5}]) == 0
+        assert queue.commit_results(fresh['lease_id'], [{'task_id': task_id, 'top1': 2, 'probability': 0.9}]) == 1
+        assert queue.results()[0]['top1'] == 2 and queue.results()[0]['worker'] == 'worker-b'
+
+    def test_task_fails_after_max_attempts(self, queue):
+        """测试反复过期的任务最终被标记为失败，而不是无限重试"""
+        queue.create_sweep(['a.jpg'], ['identity'])
+        for _ in range(queue.max_attempts):
+            assert queue.acquire_lease('crashing-worker') is not None
+            queue.clock.now += 11
+        assert queue.acquire_lease('worker') is None
+        assert queue.progress()['failed'] == 1
+
+    def test_local_workers_resume_after_crash(self, tmp_path, test_image_path):
+        """测试多个本地工作进程完成扫描，并接管崩溃进程遗留的租约"""
+        db_path = tmp_path / 'sweep.db'
+        queue = SweepQueue(db_path, lease_timeout=1)
+        queue.create_sweep([test_image_path, 'data/missing.jpg'], ['identity', 'brightness'], severities=[1, 3])
+        # 模拟一个领取了任务后崩溃的工作进程
+        queue.acquire_lease('crashed-worker', max_tasks=2)
+
+        committed = run_local_workers(db_path, num_workers=2, max_tasks=2, lease_timeout=60, poll_interval=0.2)
+
+        progress = queue.progress()
+        assert sum(committed) == 6
+        assert progress['done'] == 3 and progress['failed'] == 3, f"扫描未完成: {progress}"
+        assert all(r['worker'] != 'crashed-worker' for r in queue.results())
+        queue.close()
+
+    def test_unexpected_errors_are_recorded_per_task(self, queue, classifier, test_image_path, monkeypatch):
+        """测试推理中的意外异常只记为该图像各任务的错误，其他图像照常完成"""
+        queue.create_sweep([test_image_path, 'other.jpg'], ['identity', 'brightness'], severities=[1])
+        lease = queue.acquire_lease('worker')
+        real_load = classifier.load_and_preprocess_image
+
+        def load(path):
+            if path == 'other.jpg':
+                raise RuntimeError("模拟的意外错误")
+            return real_load(path)
+
+        monkeypatch.setattr(classifier, 'load_and_preprocess_image', load)
+        results = process_lease(classifier, lease)
+        errors = [r for r in results if 'error' in r]
+        assert len(results) == 4 and len(errors) == 2
+        assert all(r['error'].startswith('RuntimeError') for r in errors)
+
+    def test_rejects_unknown_model_and_journal_mode(self, queue, tmp_path):
+        """测试不支持的模型在写入扫描时报错，多主机使用的DELETE日志模式可以正常领取租约"""
+        with pytest.raises(ValueError):
+            queue.create_sweep(['a.jpg'], ['identity'], models=['resnet50'])
+        with pytest.raises(ValueError):
+            SweepQueue(tmp_path / 'other.db', journal_mode='MEMORY')
+
+        shared = SweepQueue(tmp_path / 'shared.db', journal_mode='DELETE')
+        shared.create_sweep(['a.jpg'], ['identity'])
+        assert shared.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        assert shared.acquire_lease('worker') is not None
+        shared.close()
+
+    def test_seed_depends_on_content_not_path(self, queue, classifier, test_image_path, tmp_path):
+        """测试同一张图像位于不同路径时得到相同的随机扰动和结果"""
+        copy_path = str(tmp_path / 'copy.jpg')
+        shutil.copyfile(test_image_path, copy_path)
+        queue.create_sweep([test_image_path, copy_path], ['gaussian_noise'], severities=[5])
+        results = process_lease(classifier, queue.acquire_lease('worker'))
+        assert len(results) == 2 and 'error' not in results[0]
+        assert (results[0]['top1'], results[0]['probability']) == (results[1]['top1'], results[1]['probability'])
@@ -0,0 +1,53 @@
+"""
+测试时增强测试
+"""
+
+import pytest
+import torch
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.tta import num_views, reduce_views, tta_robustness
+
+
+class TestTTA:
+    """测试时增强测试类"""
+
+    def test_center_view_matches_preprocess(self, classifier, test_image_path, processed_test_image):
+        """测试单尺度中心视图与标准预处理完全一致"""
+        views = classifier.load_tta_views(test_image_path, mode='center')
+        assert torch.equal(views, processed_test_image)
+
+    def test_ten_crop_views(self, classifier, test_image_path):
+        """测试十裁剪的视图数量，以及翻转视图与原视图的对应关系"""
+        views = classifier.load_tta_views(test_image_path, mode='ten_crop', scales=(1.0, 1.25))
+        assert views.shape == (num_views('ten_crop', (1.0, 1.25)), 3, 224, 224) == (20, 3, 224, 224)
+        assert torch.equal(views[5], views[0].flip(-1))
+        with pytest.raises(ValueError):
+            classifier.load_tta_views(test_image_path, scales=(0.5,))
+
+    def test_run_tta_keeps_image_order(self, classifier, test_image_path):
+        """测试批量TTA的结果按图像顺序排列，'center'模式与普通推理一致"""
+        paths = [test_image_path, 'data/noise.jpg']
+        if not os.path.exists(paths[1]):
+            pytest.skip(f"测试图片不存在: {paths[1]}")
+        expected = classifier.run_inference(torch.cat([classifier.load_and_preprocess_image(p) for p in paths]))
+        assert torch.allclose(classifier.run_tta(paths, mode='center'), expected, atol=1e-5)
+        assert classifier.run_tta(paths, mode='five_crop').shape == (2, 1000)
+
+    def test_vote_reduction(self):
+        """测试投票合并返回各类别的票数比例"""
+        logits = torch.tensor([
+            [5.0, 0.0, 0.0], [0.0, 5.0, 0.0], [4.0, 0.0, 0.0],   # 图像1: 类别0两票，类别1一票
+            [0.0, 0.0, 1.0], [0.0, 0.0, 2.0], [0.0, 0.0, 3.0],   # 图像2: 类别2三票
+        ])
+        votes = reduce_views(logits, 3, reduction='vote')
+        assert torch.allclose(votes, torch.tensor([[2 / 3, 1 / 3, 0.0], [0.0, 0.0, 1.0]]))
+        assert torch.allclose(reduce_views(logits, 3)[1], torch.tensor([0.0, 0.0, 2.0]))
+
+    def test_tta_robustness_report(self, classifier, test_image_path):
+        """测试TTA鲁棒性比较返回每种扰动的翻转率"""
+        results = tta_robustness(classifier, [test_image_path], [('gaussian_noise', 5)], mode='flip')
+        rates = results['gaussian_noise:5']
+        assert set(rates) == {'single_flip_rate', 'tta_flip_rate'}
+        assert all(0.0 <= rate <= 1.0 for rate in rates.values())